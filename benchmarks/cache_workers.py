@@ -0,0 +1,84 @@
+"""Compare per-process and shared cache hit rates for N worker processes.
+
+Every worker resolves tenant ids drawn from the same skewed distribution
+through a memoized lookup, the way gunicorn workers resolve tenants with
+``get_enterprise_id_for_tenant``. A miss costs one simulated upstream call.
+
+    python -m benchmarks.cache_workers --workers 8 --lookups 2000
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from connector.cache import LRUCache, SQLiteCache, memoize
+
+
+def worker(args):
+    backend, path, seed, lookups, tenants, upstream_latency = args
+    if backend == 'sqlite':
+        cache = SQLiteCache('bench', maxsize=tenants, ttl=3600, path=path)
+    else:
+        cache = LRUCache('bench', maxsize=tenants, ttl=3600)
+
+    upstream_calls = [0]
+
+    @memoize(cache)
+    def lookup(tenant_id):
+        upstream_calls[0] += 1
+        time.sleep(upstream_latency)
+        return 'enterprise-{}'.format(tenant_id)
+
+    rnd = random.Random(seed)
+    started = time.time()
+    for _ in range(lookups):
+        # a few big tenants are polled much more often than the long tail
+        lookup(int(rnd.paretovariate(1.2)) % tenants)
+    return cache.hits, cache.misses, upstream_calls[0], time.time() - started
+
+
+def run(backend, workers, lookups, tenants, upstream_latency):
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'cache.sqlite')
+        if backend == 'sqlite':
+            # create the schema before the workers race for it
+            SQLiteCache('bench', path=path)
+        pool = multiprocessing.Pool(workers)
+        try:
+            results = pool.map(worker, [(backend, path, seed, lookups, tenants, upstream_latency)
+                                        for seed in range(workers)])
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        shutil.rmtree(directory)
+
+    hits = sum(r[0] for r in results)
+    misses = sum(r[1] for r in results)
+    return {'backend': backend,
+            'hit_rate': float(hits) / (hits + misses),
+            'upstream_calls': sum(r[2] for r in results),
+            'wall_time': max(r[3] for r in results)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--tenants', type=int, default=500)
+    parser.add_argument('--upstream-latency', type=float, default=0.005,
+                        help='seconds per simulated OA call')
+    args = parser.parse_args()
+
+    print('{:<8} {:>9} {:>15} {:>10}'.format('backend', 'hit rate', 'upstream calls', 'wall, s'))
+    for backend in ('memory', 'sqlite'):
+        r = run(backend, args.workers, args.lookups, args.tenants, args.upstream_latency)
+        print('{backend:<8} {hit_rate:>9.1%} {upstream_calls:>15} {wall_time:>10.2f}'.format(**r))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,304 @@
+"""Measure what the stages of a request and every route cost inside the connector.
+
+OA and Box are stubbed, so the numbers are the connector's own work. Every
+stage of a request (OAuth verification, the reseller, request logging,
+argument parsing, serializers and schemas, name helpers) runs on its own,
+every route of ``resource_routes`` runs end to end through the WSGI app with
+signed requests. Reported are operations per second and the peak memory
+allocated by one operation.
+
+``--save`` writes the results as JSON, ``--compare`` reads such a baseline
+and exits with status 1 when a benchmark got slower or allocates more than
+``--max-regression`` allows, which makes it usable before a deploy:
+
+    python -m benchmarks.hot_paths --save baseline.json
+    python -m benchmarks.hot_paths --compare baseline.json --max-regression 0.25
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from flask import Response, g, request
+from mock import patch
+from oauthlib import oauth1
+
+from connector.app import app
+from connector.client.client import Client, client_schema, dump_client, load_client
+from connector.client.reseller import Reseller
+from connector.client.user import User, dump_user, load_user, user_schema
+from connector.config import Config
+from connector.tenants import TenantStore
+from connector.utils import escape_domain_name, handler as log_handler, log_request, log_response
+from connector.v1 import resource_routes
+from connector.v1.resources import urlify
+from connector.v1.resources.tenant import parse_tenant_args
+from connector.v1.resources.user import TenantUsersBulk
+from connector.validator import verify_request
+
+timer = getattr(time, 'perf_counter', time.time)
+
+config = Config()
+
+ENTERPRISE = {'id': '100', 'name': 'Company-sub1', 'seats': 10, 'seats_used': 3,
+              'deal_status': 'live_deal', 'active_status': 'active',
+              'administered_by': {'id': '1', 'name': 'Admin', 'login': 'admin@example.com'}}
+USER = {'id': '7', 'name': 'User', 'login': 'user@example.com', 'status': 'active',
+        'space_amount': 1024, 'language': 'en', 'timezone': 'Europe/Berlin'}
+USER_PAGE = {'entries': [dict(USER, id=str(i)) for i in range(3)], 'total_count': 3}
+
+PATH_ARGS = {'app_id': 'app-1', 'tenant_id': 'tenant-1', 'oa_tenant_id': 'tenant-1',
+             'user_id': '7', 'oa_user_service_id': 'user-1', 'job_id': 'job-1'}
+
+TENANT_BODY = {'aps': {'id': 'tenant-1'}, 'oaSubscription': {'aps': {'id': 'sub-1'}},
+               'oaAccount': {'aps': {'id': 'acc-1'}}, config.users_resource: {'limit': 10}}
+BODIES = {
+    ('/app', 'POST'): {'aps': {'type': 'http://box.com/app/1.0', 'id': 'app-1'}},
+    ('/tenant', 'POST'): TENANT_BODY,
+    ('/tenant/<tenant_id>', 'PUT'): {config.users_resource: {'limit': 20}},
+    ('/tenant/<tenant_id>/users/bulk', 'POST'): {'users': ['user-1', 'user-2']},
+    ('/tenant/<tenant_id>/users/bulk', 'DELETE'): {'users': ['user-1', 'user-2']},
+    ('/user', 'POST'): {'tenant': {'aps': {'id': 'tenant-1'}}, 'user': {'aps': {'id': 'user-1'}}},
+}
+
+
+def oa_resource(resource_id):
+    return {'aps': {'id': resource_id}, 'tenantId': '100', 'companyName': 'Company',
+            'subscriptionId': 1, 'userId': '7', 'tenant': {'aps': {'id': 'tenant-1'}},
+            'email': 'user@example.com', 'fullName': 'User', 'isAccountAdmin': False}
+
+
+def oa_request(method, path, body=None, transaction=True, impersonate_as=None, retry_num=10):
+    path = path.lstrip('/')
+    if method.upper() != 'GET':
+        return {}
+    if 'admin-user' in path:
+        return [dict(oa_resource('admin-1'), email='admin@example.com', isAccountAdmin=True,
+                     telWork='123', addressPostal={'streetAddress': 'Street', 'locality': 'City',
+                                                   'region': 'Region', 'postalCode': '1',
+                                                   'countryName': 'Country'})]
+    if path == 'aps/2/application':
+        return {'user': {'type': 'http://box.com/user/1.0'}}
+    ids = re.search(r'in\(aps.id,\(([^)]*)\)\)', path)
+    if ids:
+        return [oa_resource(i) for i in ids.group(1).split(',')]
+    return oa_resource(path.rsplit('/', 1)[-1])
+
+
+class FakeBox(object):
+    """Answers the slumber calls of the Box models with canned responses."""
+
+    def __init__(self, path=()):
+        self.path = path
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return FakeBox(self.path + (name,))
+
+    def __call__(self, resource_id):
+        return FakeBox(self.path + (str(resource_id),))
+
+    def get(self, **params):
+        if self.path[-1] == 'users':
+            return USER_PAGE
+        if self.path == ('enterprises',):
+            return {'entries': [ENTERPRISE], 'total_count': 1}
+        return ENTERPRISE if self.path[0] == 'enterprises' else USER
+
+    def post(self, data):
+        return ENTERPRISE if self.path == ('enterprises',) else USER
+
+    def put(self, data=None):
+        return ENTERPRISE if self.path[0] == 'enterprises' else USER
+
+    def delete(self):
+        return None
+
+
+def measure(function, seconds):
+    function()  # warm up caches and lazy imports
+    runs = 0
+    started = timer()
+    while True:
+        function()
+        runs += 1
+        elapsed = timer() - started
+        if elapsed >= seconds:
+            break
+    result = {'ops_per_sec': runs / elapsed, 'alloc_kb': None}
+    if tracemalloc is not None:
+        tracemalloc.start()
+        function()
+        result['alloc_kb'] = tracemalloc.get_traced_memory()[1] / 1024.0
+        tracemalloc.stop()
+    return result
+
+
+def signed_context(method, path, body=None):
+    """Request context of an APS request signed like OA signs it."""
+    client = oauth1.Client(config.oauth_key, client_secret=config.oauth_signature)
+    url, headers, _ = client.sign('http://localhost' + path, method)
+    headers.update({'Aps-Instance-Id': 'instance-1', 'Aps-Controller-Uri': 'https://oa',
+                    'Content-Type': 'application/json'})
+    return url, headers, json.dumps(body) if body is not None else None
+
+
+def stages():
+    """Yield ``(name, context, function)`` for the stages of a request."""
+    client = Client(None, name='Company', users_limit=10, plan_code='generic_business',
+                    administered_by=User(name='Admin', login='admin@example.com'),
+                    enterprise_id='100')
+    user = User(client, name='User', login='user@example.com', space_amount=1024, status='active')
+    response = Response(json.dumps({'tenantId': '100'}), mimetype='application/json')
+
+    url, headers, _ = signed_context('GET', '/v1/tenant/tenant-1')
+    get_context = dict(base_url='http://localhost', path='/v1/tenant/tenant-1', headers=headers)
+    _, headers, body = signed_context('POST', '/v1/tenant', TENANT_BODY)
+    post_context = dict(path='/v1/tenant', method='POST', headers=headers, data=body)
+    _, headers, body = signed_context('POST', '/v1/tenant/tenant-1/users/bulk',
+                                      {'users': ['user-{}'.format(i) for i in range(100)]})
+    bulk_context = dict(path='/v1/tenant/tenant-1/users/bulk', method='POST', headers=headers,
+                        data=body)
+
+    def logged(function):
+        def run():
+            g.endpoint = 'tenant'
+            g.reseller_name = 'reseller'
+            g.enterprise_id = '100'
+            function()
+        return run
+
+    yield 'stage oauth_verify', get_context, lambda: verify_request(request)
+    yield 'stage reseller', None, lambda: Reseller(None).refresh()
+    yield 'stage log_request', post_context, logged(lambda: log_request(request))
+    yield 'stage log_response', post_context, logged(lambda: log_response(response))
+    yield 'stage reqparse tenant', post_context, parse_tenant_args
+    yield 'stage reqparse bulk 100 users', bulk_context, lambda: TenantUsersBulk().parse_args()
+    yield 'stage dump_client', None, lambda: dump_client(client)
+    yield 'stage load_client', None, lambda: load_client(ENTERPRISE)
+    yield 'stage dump_user', None, lambda: dump_user(user)
+    yield 'stage load_user', None, lambda: load_user(USER)
+    yield 'stage client_schema dump', None, lambda: client_schema.dump(client)
+    yield 'stage user_schema load', None, lambda: user_schema.load(USER)
+    yield 'stage escape_domain_name', None, lambda: escape_domain_name('My Company, Ltd.-sub12')
+    yield 'stage urlify', None, lambda: urlify('My Company, Ltd.-sub12')
+
+
+def routes():
+    """Yield ``(name, method, path, body)`` for every method of every route."""
+    for route, resource in sorted(resource_routes.items()):
+        path = '/v1' + re.sub(r'<(\w+)>', lambda m: PATH_ARGS[m.group(1)], route)
+        for method in sorted(resource.methods):
+            yield 'route {} {}'.format(method, route), method, path, BODIES.get((route, method))
+
+
+def run(seconds, name_filter=None):
+    results = {}
+    client = app.test_client()
+    for name, context, function in stages():
+        if name_filter and name_filter not in name:
+            continue
+        if context is None:
+            results[name] = measure(function, seconds)
+        else:
+            with app.test_request_context(**context):
+                results[name] = measure(function, seconds)
+        report(name, results[name])
+
+    for name, method, path, body in routes():
+        if name_filter and name_filter not in name:
+            continue
+        _, headers, data = signed_context(method, path, body)
+        status = []
+
+        def call():
+            response = client.open(path, method=method, headers=headers, data=data)
+            response.get_data()
+            status.append(response.status_code)
+
+        results[name] = measure(call, seconds)
+        results[name]['status'] = status[-1]
+        report(name, results[name])
+    return results
+
+
+def report(name, result):
+    alloc = ('{:10.1f}'.format(result['alloc_kb']) if result['alloc_kb'] is not None
+             else '       n/a')
+    line = '{:<48} {:>12.0f} {}'.format(name, result['ops_per_sec'], alloc)
+    if 'status' in result:
+        line += '  [{}]'.format(result['status'])
+    print(line)
+
+
+def compare(results, baseline, max_regression):
+    """Print the change against ``baseline``, return the names of regressed benchmarks."""
+    regressions = []
+    print('\n{:<48} {:>12} {:>10}'.format('compared to baseline', 'ops/sec', 'alloc'))
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            print('{:<48} {:>12} {:>10}'.format(name, 'new', 'new'))
+            continue
+        speed = result['ops_per_sec'] / base['ops_per_sec'] - 1
+        alloc = 0.0
+        if result['alloc_kb'] is not None and base.get('alloc_kb'):
+            alloc = result['alloc_kb'] / base['alloc_kb'] - 1
+        regressed = speed < -max_regression or alloc > max_regression
+        if regressed:
+            regressions.append(name)
+        print('{:<48} {:>+11.1%} {:>+9.1%}{}'.format(name, speed, alloc,
+                                                     '  REGRESSION' if regressed else ''))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--seconds', type=float, default=0.5, help='time spent per benchmark')
+    parser.add_argument('--filter', help='run only benchmarks containing this text')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file written by --save')
+    parser.add_argument('--max-regression', type=float, default=0.25,
+                        help='tolerated loss of ops/sec and growth of allocations (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    # records are dropped instead of written, formatting them is not a request cost
+    log_handler.target = logging.NullHandler()
+    logging.getLogger('connector').handlers = [logging.NullHandler()]
+
+    directory = tempfile.mkdtemp()
+    try:
+        with patch('connector.v1.resources.OA.send_request', side_effect=oa_request), \
+                patch('connector.client.reseller.box_api', return_value=FakeBox()), \
+                patch('connector.client.reseller.reseller_tokens') as tokens, \
+                patch('connector.v1.resources.tenant.tenant_store',
+                      TenantStore(os.path.join(directory, 'tenants.sqlite'))):
+            tokens.get.return_value = 'token'
+            print('{:<48} {:>12} {:>10}'.format('benchmark', 'ops/sec', 'alloc KiB'))
+            results = run(args.seconds, args.filter)
+    finally:
+        shutil.rmtree(directory)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
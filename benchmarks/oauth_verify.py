@@ -0,0 +1,58 @@
+"""Measure the per-request cost of authenticating an APS request.
+
+``two-pass`` repeats what ``before_request`` used to do: a new validator
+parsed the request for the client key, another one verified the signature
+and a new ``OAuth1`` signer was built for outgoing calls. ``single-pass``
+is the current ``verify_request`` plus the cached signer.
+
+    python -m benchmarks.oauth_verify --requests 5000
+"""
+import argparse
+import time
+from collections import namedtuple
+
+from oauthlib import oauth1
+from requests_oauthlib import OAuth1
+
+from connector.config import Config
+from connector.validator import RequestValidator, get_signer, verify_request
+
+Request = namedtuple('Request', ['url', 'method', 'data', 'headers'])
+
+
+def two_pass(request, config):
+    _, oauth_request = RequestValidator().endpoint.validate_request(
+        request.url, request.method, request.data, request.headers)
+    client_key = oauth_request.client_key if oauth_request else None
+    auth = OAuth1(client_key=client_key, client_secret=config.oauth_signature)
+    valid, _ = RequestValidator().endpoint.validate_request(
+        request.url, request.method, request.data, request.headers)
+    return valid, auth
+
+
+def single_pass(request, config):
+    result = verify_request(request)
+    return result.valid, get_signer(result.client_key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    config = Config()
+    client = oauth1.Client(config.oauth_key, client_secret=config.oauth_signature)
+    url, headers, _ = client.sign('http://connector/v1/tenant/123', 'GET')
+    request = Request(url, 'GET', b'', headers)
+
+    print('{:<12} {:>12}'.format('variant', 'us/request'))
+    for name, authenticate in (('two-pass', two_pass), ('single-pass', single_pass)):
+        started = time.time()
+        for _ in range(args.requests):
+            authenticate(request, config)
+        elapsed = time.time() - started
+        print('{:<12} {:>12.1f}'.format(name, elapsed / args.requests * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Compare the marshmallow schemas with the fast serializers of users and clients.
+
+``schema`` creates a schema per call like the models used to, ``cached``
+reuses a module-level schema and ``fast`` is what the models use now.
+
+    python -m benchmarks.serializers --objects 10000
+"""
+import argparse
+import time
+
+from connector.client.client import Client, ClientSchema, client_schema, dump_client, load_client
+from connector.client.user import User, UserSchema, dump_user, load_user, user_schema
+
+VARIANTS = {
+    'schema': (lambda user: UserSchema().dump(user).data,
+               lambda data: UserSchema().load(data).data,
+               lambda client: ClientSchema().dump(client).data,
+               lambda data: ClientSchema().load(data).data),
+    'cached': (lambda user: user_schema.dump(user).data,
+               lambda data: user_schema.load(data).data,
+               lambda client: client_schema.dump(client).data,
+               lambda data: client_schema.load(data).data),
+    'fast': (dump_user, load_user, dump_client, load_client),
+}
+
+
+def timed(function, items):
+    started = time.time()
+    for item in items:
+        function(item)
+    return time.time() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--objects', type=int, default=10000)
+    args = parser.parse_args()
+
+    client = Client(None, name='Company', users_limit=100, plan_code='generic_business',
+                    administered_by=User(name='Admin', login='admin@example.com'),
+                    enterprise_id='100')
+    users = [User(client, name='User {}'.format(i), login='user{}@example.com'.format(i),
+                  space_amount=1024, status='active') for i in range(args.objects)]
+    user_responses = [{'id': str(i), 'name': 'User {}'.format(i), 'space_amount': 1024,
+                       'login': 'user{}@example.com'.format(i), 'status': 'active',
+                       'language': 'en', 'timezone': 'Australia/Melbourne', 'phone': None,
+                       'enterprise': {'id': '100'}} for i in range(args.objects)]
+    clients = [Client(None, name='Company {}'.format(i), users_limit=100, plan_code='generic',
+                      administered_by={'name': 'Admin', 'login': 'admin@example.com'})
+               for i in range(args.objects)]
+    client_responses = [{'id': str(i), 'name': 'Company {}'.format(i), 'seats': 100,
+                         'seats_used': 10, 'deal_status': 'live_deal', 'active_status': 'active',
+                         'administered_by': {'id': '1', 'name': 'Admin',
+                                             'login': 'admin@example.com'}}
+                        for i in range(args.objects)]
+
+    print('{:<8} {:>12} {:>12} {:>12} {:>12}'.format(
+        'variant', 'user dump', 'user load', 'client dump', 'client load'))
+    for name in ('schema', 'cached', 'fast'):
+        user_dump, user_load, client_dump, client_load = VARIANTS[name]
+        print('{:<8} {:>11.3f}s {:>11.3f}s {:>11.3f}s {:>11.3f}s'.format(
+            name, timed(user_dump, users), timed(user_load, user_responses),
+            timed(client_dump, clients), timed(client_load, client_responses)))
+
+
+if __name__ == '__main__':
+    main()
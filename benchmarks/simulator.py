@@ -0,0 +1,513 @@
+"""Simulate the OA controller and the Box API for end-to-end load tests.
+
+One process serves the OA endpoints the connector calls (``aps/2/resources``
+with RQL, ``aps/2/application`` and ``aps/2/application/user``) and the Box
+token, enterprise and user endpoints, backed by in-memory data seeded with
+``--tenants`` subscriptions. Every upstream gets a latency distribution and
+fault rates: 5xx errors, 429 responses with ``Retry-After`` and bodies sent
+slowly in chunks.
+
+    python -m benchmarks.simulator --port 8100 --tenants 200 \\
+        --oa-latency lognormal:40,0.5 --box-latency lognormal:120,0.6 \\
+        --error-rate 0.01 --throttle-rate 0.02 --faults box
+
+Point the connector at it with ``"box_baseurl": "http://127.0.0.1:8100/2.0/"``
+and ``"box_oauth_baseurl": "http://127.0.0.1:8100/oauth2/"`` in its config,
+the load generator sends ``Aps-Controller-Uri: http://127.0.0.1:8100/``.
+Seeded ids are listed by ``GET /_simulator/seed``, counters by
+``GET /_simulator/stats``, fault settings of an upstream are changed during
+a run with ``PUT /_simulator/faults/<oa|box>``.
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+
+from flask import Flask, Response, abort, jsonify, request
+from werkzeug.serving import WSGIRequestHandler, run_simple
+
+ADMIN_TYPE = 'http://parallels.com/aps/types/pa/admin-user/1.0'
+ACCOUNT_TYPE = 'http://parallels.com/aps/types/pa/account/1.2'
+SUBSCRIPTION_TYPE = 'http://parallels.com/aps/types/pa/subscription/1.0'
+OA_USER_TYPE = 'http://parallels.com/aps/types/pa/service-user/1.0'
+TENANT_TYPE = 'http://box.com/box-connector/tenant/1.0'
+USER_TYPE = 'http://box.com/box-connector/user/1.0'
+
+
+def parse_latency(spec):
+    """Return a function sampling latencies in seconds from a spec in milliseconds.
+
+    ``fixed:MS``, ``uniform:LOW,HIGH``, ``exponential:MEAN`` or
+    ``lognormal:MEDIAN,SIGMA``, e.g. ``lognormal:40,0.5``.
+    """
+    kind, _, params = spec.partition(':')
+    try:
+        values = [float(v) for v in params.split(',')] if params else []
+        if kind == 'fixed' and len(values) == 1:
+            return lambda rnd: values[0] / 1000.0
+        if kind == 'uniform' and len(values) == 2:
+            return lambda rnd: rnd.uniform(*values) / 1000.0
+        if kind == 'exponential' and len(values) == 1:
+            return lambda rnd: rnd.expovariate(1.0 / values[0]) / 1000.0 if values[0] else 0.0
+        if kind == 'lognormal' and len(values) == 2:
+            return lambda rnd: rnd.lognormvariate(0, values[1]) * values[0] / 1000.0
+    except ValueError:
+        pass
+    raise ValueError('Unsupported latency distribution: {}'.format(spec))
+
+
+class Profile(object):
+    """Latency and faults of one simulated upstream."""
+
+    def __init__(self, name, latency='fixed:0', error_rate=0.0, throttle_rate=0.0,
+                 retry_after=1, slow_body_rate=0.0, slow_body_seconds=5.0, seed=None):
+        self.name = name
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self.update(latency=latency, error_rate=error_rate, throttle_rate=throttle_rate,
+                    retry_after=retry_after, slow_body_rate=slow_body_rate,
+                    slow_body_seconds=slow_body_seconds)
+
+    def update(self, **settings):
+        if 'latency' in settings:
+            self._sample = parse_latency(settings['latency'])
+        for name, value in settings.items():
+            setattr(self, name, value)
+
+    def settings(self):
+        return {k: getattr(self, k) for k in ('latency', 'error_rate', 'throttle_rate',
+                                              'retry_after', 'slow_body_rate',
+                                              'slow_body_seconds')}
+
+    def delay(self):
+        with self._lock:
+            return self._sample(self._rnd)
+
+    def roll(self, rate):
+        with self._lock:
+            return rate > 0 and self._rnd.random() < rate
+
+    def choice(self, values):
+        with self._lock:
+            return self._rnd.choice(values)
+
+
+class Store(object):
+    """OA resources and Box objects of the simulated installation."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.oa = {}
+        self.admins = {}
+        self.enterprises = {}
+        self.users = {}
+        self.tokens = {}
+        self._ids = itertools.count(10000)
+
+    def next_id(self):
+        return str(next(self._ids))
+
+    def add_resource(self, resource_type, resource_id, **fields):
+        resource = dict(fields, aps={'id': resource_id, 'type': resource_type})
+        self.oa[resource_id] = resource
+        return resource
+
+    def add_user(self, enterprise_id, login, name, **fields):
+        # without 'role', the UserSchema of the connector cannot load it
+        user = dict(fields, id=self.next_id(), type='user', login=login, name=name,
+                    status='active', language='en', timezone='Australia/Melbourne',
+                    space_amount=10737418240, enterprise={'id': enterprise_id,
+                                                          'type': 'enterprise'})
+        self.users[user['id']] = user
+        enterprise = self.enterprises[enterprise_id]
+        enterprise['seats_used'] = enterprise.get('seats_used', 0) + 1
+        return user
+
+    def add_enterprise(self, data):
+        enterprise = {'id': self.next_id(), 'type': 'enterprise', 'name': data.get('name'),
+                      'seats': data.get('seats', 10), 'seats_used': 0,
+                      'deal_status': data.get('deal_status', 'live_deal'),
+                      'active_status': data.get('active_status', 'active'),
+                      'plan_code': data.get('plan_code'),
+                      'billing_cycle': data.get('billing_cycle', 'monthly')}
+        self.enterprises[enterprise['id']] = enterprise
+        admin = data.get('administered_by') or {}
+        user = self.add_user(enterprise['id'], admin.get('login'), admin.get('name'),
+                             phone=admin.get('phone'))
+        enterprise['administered_by'] = {'id': user['id'], 'type': 'user',
+                                         'login': user['login'], 'name': user['name'],
+                                         'phone': user.get('phone')}
+        return enterprise
+
+    def add_subscription(self, prefix, number, users_limit):
+        """Add the account, subscription, admin and tenant resources of a subscription to OA."""
+        account = self.add_resource(ACCOUNT_TYPE, '{}account-{}'.format(prefix, number),
+                                    companyName='{}Company {}'.format(prefix, number))
+        subscription = self.add_resource(SUBSCRIPTION_TYPE,
+                                         '{}subscription-{}'.format(prefix, number),
+                                         subscriptionId=len(self.oa))
+        self.admins[account['aps']['id']] = self.add_resource(
+            ADMIN_TYPE, '{}admin-{}'.format(prefix, number),
+            email='admin@{}company{}.example'.format(prefix, number),
+            fullName='Admin {}'.format(number), isAccountAdmin=True, telWork='+1 555 0100',
+            addressPostal={'streetAddress': '1 Main St', 'locality': 'Springfield',
+                           'region': 'IL', 'postalCode': '62701', 'countryName': 'us'},
+            account={'aps': {'id': account['aps']['id']}})
+        return self.add_resource(
+            TENANT_TYPE, '{}tenant-{}'.format(prefix, number),
+            oaAccount={'aps': {'id': account['aps']['id']}},
+            oaSubscription={'aps': {'id': subscription['aps']['id']}},
+            USERS={'limit': users_limit})
+
+    def seed(self, tenants, users_per_tenant, new_users_per_tenant=0, new_tenants=0):
+        """Create subscriptions with their OA resources, Box enterprises and users.
+
+        The ``new-user-<tenant>-<n>`` OA users have no Box user yet and the
+        ``new-tenant-<n>`` subscriptions no Box enterprise, creating them does
+        not end in a conflict.
+        """
+        for i in range(tenants):
+            tenant = self.add_subscription('', i, users_per_tenant + new_users_per_tenant)
+            admin = self.admins_of(tenant['aps']['id'])[0]
+            enterprise = self.add_enterprise({
+                'name': 'Company {}'.format(i), 'seats': tenant['USERS']['limit'],
+                'administered_by': {'login': admin['email'], 'name': admin['fullName']}})
+            tenant['tenantId'] = enterprise['id']
+            for j in range(users_per_tenant):
+                oa_user = self.add_resource(
+                    OA_USER_TYPE, 'user-{}-{}'.format(i, j),
+                    email='user{}@company{}.example'.format(j, i),
+                    fullName='User {} {}'.format(i, j), isAccountAdmin=False)
+                box_user = self.add_user(enterprise['id'], oa_user['email'], oa_user['fullName'])
+                self.add_resource(USER_TYPE, 'user-service-{}-{}'.format(i, j),
+                                  userId=box_user['id'], user={'aps': {'id': oa_user['aps']['id']}},
+                                  tenant={'aps': {'id': tenant['aps']['id']}})
+            for j in range(new_users_per_tenant):
+                self.add_resource(OA_USER_TYPE, 'new-user-{}-{}'.format(i, j),
+                                  email='new{}@company{}.example'.format(j, i),
+                                  fullName='New User {} {}'.format(i, j), isAccountAdmin=False)
+        for i in range(new_tenants):
+            self.add_subscription('new-', i, users_per_tenant + new_users_per_tenant)
+
+    def admins_of(self, tenant_id):
+        """Admin users visible to the tenant, the admin of its account."""
+        tenant = self.oa.get(tenant_id) or {}
+        admin = self.admins.get(tenant.get('oaAccount', {}).get('aps', {}).get('id'))
+        return [admin] if admin else []
+
+
+def create_app(store, profiles):
+    app = Flask(__name__)
+    stats = Counter()
+    stats_lock = threading.Lock()
+
+    def count(*key):
+        with stats_lock:
+            stats[':'.join(key)] += 1
+
+    def profile_of(path):
+        if path.startswith('/aps/'):
+            return profiles['oa']
+        if path.startswith('/2.0/') or path.startswith('/oauth2/'):
+            return profiles['box']
+        return None
+
+    def slowly(body, seconds, chunks=10):
+        step = max(1, len(body) // chunks)
+        for start in range(0, len(body), step):
+            time.sleep(seconds / float(chunks))
+            yield body[start:start + step]
+
+    @app.before_request
+    def inject_faults():
+        profile = profile_of(request.path)
+        if profile is None:
+            return None
+        count(profile.name, request.method, request.url_rule.rule if request.url_rule else '?')
+        time.sleep(profile.delay())
+        if profile.roll(profile.throttle_rate):
+            count(profile.name, 'fault', '429')
+            return Response(json.dumps({'type': 'error', 'status': 429,
+                                        'code': 'rate_limit_exceeded'}),
+                            status=429, mimetype='application/json',
+                            headers={'Retry-After': str(profile.retry_after)})
+        if profile.roll(profile.error_rate):
+            status = profile.choice((500, 502, 503))
+            count(profile.name, 'fault', str(status))
+            return Response(json.dumps({'type': 'error', 'status': status}), status=status,
+                            mimetype='application/json')
+        return None
+
+    @app.after_request
+    def slow_body(response):
+        profile = profile_of(request.path)
+        if (profile is not None and response.status_code < 400 and
+                profile.roll(profile.slow_body_rate)):
+            count(profile.name, 'fault', 'slow_body')
+            body = response.get_data()
+            response.response = slowly(body, profile.slow_body_seconds)
+            response.headers['Content-Length'] = str(len(body))
+        return response
+
+    # OA controller
+
+    @app.route('/aps/2/resources', methods=['GET'])
+    def oa_query():
+        rql = request.query_string.decode('utf-8')
+        with store.lock:
+            ids = re.search(r'in\(aps\.id,\(([^)]*)\)\)', rql)
+            if ids:
+                wanted = ids.group(1).split(',')
+                return jsonify_list([store.oa[i] for i in wanted if i in store.oa])
+            implementing = re.search(r'implementing\(([^)]*)\)', rql)
+            if not implementing:
+                abort(400)
+            if implementing.group(1) == ADMIN_TYPE:
+                return jsonify_list(store.admins_of(request.headers.get('Aps-Resource-Id')))
+            found = sorted((r for r in store.oa.values()
+                            if r['aps']['type'] == implementing.group(1)),
+                           key=lambda r: r['aps']['id'])
+        limit = re.search(r'limit\((\d+),(\d+)\)', rql)
+        if limit:
+            offset, size = int(limit.group(1)), int(limit.group(2))
+            found = found[offset:offset + size]
+        return jsonify_list(found)
+
+    @app.route('/aps/2/resources/<resource_id>', methods=['GET'])
+    def oa_resource(resource_id):
+        with store.lock:
+            resource = store.oa.get(resource_id)
+        if resource is None:
+            return jsonify({'code': 404, 'message': 'Resource not found'}), 404
+        return jsonify(resource)
+
+    @app.route('/aps/2/application', methods=['GET'])
+    def oa_application():
+        return jsonify({'aps': {'id': 'application',
+                                'type': 'http://box.com/box-connector/app/1.0'},
+                        'user': {'type': USER_TYPE}})
+
+    @app.route('/aps/2/application/user', methods=['POST'])
+    def oa_link_user():
+        data = request.get_json(force=True)
+        tenant_id = data['tenant']['aps']['id']
+        with store.lock:
+            box_user = store.users.get(data.get('userId'))
+            tenant = store.oa.get(tenant_id)
+            if tenant is None:
+                # a tenant provisioned during the run, OA stores the tenantId it was answered
+                tenant = store.add_resource(TENANT_TYPE, tenant_id)
+            if box_user is not None:
+                tenant['tenantId'] = box_user['enterprise']['id']
+            resource = store.add_resource(USER_TYPE, uuid.uuid4().hex, userId=data.get('userId'),
+                                          user=data['user'], tenant={'aps': {'id': tenant_id}})
+        return jsonify(resource)
+
+    # Box API, slumber appends a slash to every path
+
+    @app.route('/oauth2/token', methods=['POST'])
+    def box_token():
+        if request.form.get('grant_type') != 'client_credentials':
+            return jsonify({'error': 'unsupported_grant_type'}), 400
+        token = uuid.uuid4().hex
+        with store.lock:
+            store.tokens[token] = time.time() + app.config['TOKEN_TTL']
+        return jsonify({'access_token': token, 'expires_in': app.config['TOKEN_TTL'],
+                        'token_type': 'bearer'})
+
+    def authorized():
+        token = request.headers.get('Authorization', '')[len('Bearer '):]
+        with store.lock:
+            expires_at = store.tokens.get(token)
+        if expires_at is None or expires_at < time.time():
+            abort(401)
+
+    def page(entries):
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', 100))
+        return jsonify({'entries': entries[offset:offset + limit], 'total_count': len(entries),
+                        'offset': offset, 'limit': limit})
+
+    def box_not_found():
+        return jsonify({'type': 'error', 'status': 404, 'code': 'not_found'}), 404
+
+    @app.route('/2.0/enterprises/', strict_slashes=False, methods=['GET', 'POST'])
+    def box_enterprises():
+        authorized()
+        with store.lock:
+            if request.method == 'POST':
+                data = request.get_json(force=True)
+                login = (data.get('administered_by') or {}).get('login')
+                if any(u['login'] == login for u in store.users.values()):
+                    # what the connector takes for a second subscription of the same admin
+                    return jsonify({'type': 'error', 'status': 400, 'code': 'bad_request',
+                                    'context_info': {'errors': [{'reason': 'invalid_parameter',
+                                                                 'name': 'master_login'}]}}), 400
+                return jsonify(store.add_enterprise(data)), 201
+            entries = sorted(store.enterprises.values(), key=lambda e: int(e['id']))
+        return page(entries)
+
+    @app.route('/2.0/enterprises/<enterprise_id>/', strict_slashes=False, methods=['GET', 'PUT'])
+    def box_enterprise(enterprise_id):
+        authorized()
+        with store.lock:
+            enterprise = store.enterprises.get(enterprise_id)
+            if enterprise is None:
+                return box_not_found()
+            if request.method == 'PUT' and request.get_data():
+                data = request.get_json(force=True)
+                data.pop('administered_by', None)
+                enterprise.update(data)
+            return jsonify(enterprise)
+
+    @app.route('/2.0/enterprises/<enterprise_id>/users/', strict_slashes=False, methods=['GET'])
+    def box_enterprise_users(enterprise_id):
+        authorized()
+        with store.lock:
+            if enterprise_id not in store.enterprises:
+                return box_not_found()
+            entries = sorted((u for u in store.users.values()
+                              if u['enterprise']['id'] == enterprise_id),
+                             key=lambda u: int(u['id']))
+        return page(entries)
+
+    @app.route('/2.0/users/', strict_slashes=False, methods=['POST'])
+    def box_create_user():
+        authorized()
+        data = request.get_json(force=True)
+        enterprise_id = str((data.get('enterprise') or {}).get('id'))
+        with store.lock:
+            if enterprise_id not in store.enterprises:
+                return box_not_found()
+            if any(u['login'] == data.get('login') for u in store.users.values()):
+                return jsonify({'type': 'error', 'status': 409,
+                                'code': 'user_login_already_used'}), 409
+            fields = {k: v for k, v in data.items()
+                      if k not in ('login', 'name', 'role', 'enterprise')}
+            return jsonify(store.add_user(enterprise_id, data.get('login'), data.get('name'),
+                                          **fields)), 201
+
+    @app.route('/2.0/users/<user_id>/', strict_slashes=False, methods=['GET', 'PUT', 'DELETE'])
+    def box_user(user_id):
+        authorized()
+        with store.lock:
+            user = store.users.get(user_id)
+            if user is None:
+                return box_not_found()
+            if request.method == 'DELETE':
+                del store.users[user_id]
+                store.enterprises[user['enterprise']['id']]['seats_used'] -= 1
+                return '', 204
+            if request.method == 'PUT':
+                data = request.get_json(force=True)
+                data.pop('enterprise', None)
+                user.update(data)
+            return jsonify(user)
+
+    # control
+
+    @app.route('/_simulator/stats', methods=['GET'])
+    def simulator_stats():
+        with stats_lock:
+            counters = dict(stats)
+        with store.lock:
+            sizes = {'oa_resources': len(store.oa), 'enterprises': len(store.enterprises),
+                     'users': len(store.users), 'tokens': len(store.tokens)}
+        return jsonify({'requests': counters, 'store': sizes})
+
+    @app.route('/_simulator/seed', methods=['GET'])
+    def simulator_seed():
+        with store.lock:
+            ids = {}
+            for resource in store.oa.values():
+                ids.setdefault(resource['aps']['type'], []).append(resource['aps']['id'])
+        return jsonify({t: sorted(v) for t, v in ids.items()})
+
+    @app.route('/_simulator/faults/<name>', methods=['GET', 'PUT'])
+    def simulator_faults(name):
+        profile = profiles.get(name)
+        if profile is None:
+            abort(404)
+        if request.method == 'PUT':
+            settings = request.get_json(force=True)
+            unknown = set(settings) - set(profile.settings())
+            if unknown:
+                message = 'Unknown settings: {}'.format(', '.join(sorted(unknown)))
+                return jsonify({'message': message}), 400
+            try:
+                profile.update(**settings)
+            except ValueError as e:
+                return jsonify({'message': str(e)}), 400
+        return jsonify(profile.settings())
+
+    return app
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Skips the access log line, writing it would cost more than most simulated requests."""
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def jsonify_list(items):
+    # flask 0.12 refuses to jsonify top-level lists
+    return Response(json.dumps(items), mimetype='application/json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--tenants', type=int, default=100, help='subscriptions seeded')
+    parser.add_argument('--users-per-tenant', type=int, default=20)
+    parser.add_argument('--new-users-per-tenant', type=int, default=20,
+                        help='OA users without a Box user, for user creation')
+    parser.add_argument('--new-tenants', type=int, default=100,
+                        help='subscriptions without a Box enterprise, for provisioning')
+    parser.add_argument('--oa-latency', default='fixed:0',
+                        help='fixed:MS, uniform:LOW,HIGH, exponential:MEAN '
+                             'or lognormal:MEDIAN,SIGMA')
+    parser.add_argument('--box-latency', default='fixed:0')
+    parser.add_argument('--faults', choices=('oa', 'box', 'both'), default='both',
+                        help='upstreams the fault rates apply to')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='share of 500/502/503 answers')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='share of 429 answers')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After of 429 answers')
+    parser.add_argument('--slow-body-rate', type=float, default=0.0,
+                        help='share of responses whose body is sent in chunks')
+    parser.add_argument('--slow-body-seconds', type=float, default=5.0,
+                        help='time a slow body takes to arrive')
+    parser.add_argument('--token-ttl', type=int, default=3600, help='lifetime of Box tokens')
+    parser.add_argument('--seed', type=int, help='random seed for reproducible runs')
+    parser.add_argument('--access-log', action='store_true', help='log every request')
+    args = parser.parse_args()
+
+    profiles = {}
+    for name, latency in (('oa', args.oa_latency), ('box', args.box_latency)):
+        faulty = args.faults in (name, 'both')
+        profiles[name] = Profile(name, latency=latency,
+                                 error_rate=args.error_rate if faulty else 0.0,
+                                 throttle_rate=args.throttle_rate if faulty else 0.0,
+                                 retry_after=args.retry_after,
+                                 slow_body_rate=args.slow_body_rate if faulty else 0.0,
+                                 slow_body_seconds=args.slow_body_seconds,
+                                 seed=None if args.seed is None else args.seed + len(profiles))
+
+    store = Store()
+    store.seed(args.tenants, args.users_per_tenant, args.new_users_per_tenant, args.new_tenants)
+    app = create_app(store, profiles)
+    app.config['TOKEN_TTL'] = args.token_ttl
+    print('Seeded {} tenants, {} Box users'.format(args.tenants, len(store.users)))
+    run_simple(args.host, args.port, app, threaded=True,
+               request_handler=None if args.access_log else QuietRequestHandler)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Measure how long importing the connector takes and how much memory it needs.
+
+Every measurement runs in a fresh interpreter. The modules are imported one
+after another, so the time and RSS growth of a module exclude what the
+modules before it already loaded. Exits with status 1 when importing
+``connector.app`` exceeds the budget, which makes it usable in CI.
+
+    python -m benchmarks.startup --runs 5 --max-import-ms 800 --max-rss-mb 80
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+MODULES = ['connector.config', 'connector.cache', 'connector.client',
+           'connector.v1.resources', 'connector.v1', 'connector.app']
+
+PROBE = '''
+import importlib, json, resource, sys, time
+
+def rss_kb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+results = []
+for name in sys.argv[1:]:
+    rss = rss_kb()
+    started = time.time()
+    importlib.import_module(name)
+    results.append([name, (time.time() - started) * 1000, rss_kb() - rss])
+results.append(['total', sum(r[1] for r in results), rss_kb()])
+print(json.dumps(results))
+'''
+
+
+def measure(modules):
+    output = subprocess.check_output([sys.executable, '-c', PROBE] + modules)
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-import-ms', type=float, default=1000,
+                        help='budget for importing connector.app')
+    parser.add_argument('--max-rss-mb', type=float, default=100,
+                        help='budget for the RSS of a process that imported connector.app')
+    args = parser.parse_args()
+
+    runs = [measure(MODULES) for _ in range(args.runs)]
+    # the fastest run is the least disturbed by the rest of the machine
+    best = min(runs, key=lambda run: run[-1][1])
+
+    print('{:<24} {:>10} {:>10}'.format('module', 'import, ms', 'rss, MB'))
+    for name, import_ms, rss_kb in best:
+        print('{:<24} {:>10.1f} {:>10.1f}'.format(name, import_ms, rss_kb / 1024.0))
+
+    import_ms, rss_mb = best[-1][1], best[-1][2] / 1024.0
+    failed = []
+    if import_ms > args.max_import_ms:
+        failed.append('import time {:.0f}ms > {:.0f}ms'.format(import_ms, args.max_import_ms))
+    if rss_mb > args.max_rss_mb:
+        failed.append('RSS {:.1f}MB > {:.1f}MB'.format(rss_mb, args.max_rss_mb))
+    if failed:
+        print('Startup budget exceeded: ' + ', '.join(failed))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
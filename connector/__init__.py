@@ -0,0 +1,5 @@
+import logging
+import sys
+
+# the only handler of the connector loggers, their level follows the loglevel setting
+logging.getLogger(__name__).addHandler(logging.StreamHandler(sys.stdout))
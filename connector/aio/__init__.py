@@ -0,0 +1,9 @@
+"""asyncio implementation of the v1 API for ASGI servers.
+
+Requires Python 3.5+ and aiohttp (``pip install box-connector[async]``).
+The WSGI application in ``connector.app`` does not depend on this package.
+"""
+import sys
+
+if sys.version_info < (3, 5):
+    raise ImportError('connector.aio requires Python 3.5+')
@@ -0,0 +1,191 @@
+"""ASGI application serving the v1 API with the asyncio resources.
+
+    uvicorn connector.aio.app:app --workers 1
+"""
+import json
+import logging
+import socket
+
+from werkzeug.datastructures import Headers
+from werkzeug.exceptions import MethodNotAllowed, NotFound
+from werkzeug.routing import Map, Rule
+
+from connector.breaker import CircuitOpenError
+from connector.client.usage import usage_collector
+from connector.metrics import authorized_scrape, registry, request_duration, timer
+from connector.v1 import set_name_for_reseller
+from connector.v1.resources import make_unavailable_error
+from connector.validator import get_signer, verify_request
+
+from .client import AsyncReseller
+from .resources import (HealthCheck, HttpError, Metrics, Stats, StreamResponse, TextResponse,
+                        resource_routes)
+from .upstream import AsyncOA, close_sessions
+
+logger = logging.getLogger(__name__)
+
+public_endpoints = (HealthCheck,)
+
+internal_endpoints = (Stats, Metrics)
+
+url_map = Map([Rule('/v1' + route, endpoint=resource, strict_slashes=False)
+               for route, resource in resource_routes.items()])
+
+
+class AsyncRequest(object):
+    """The parts of an ASGI HTTP request used by the connector.
+
+    Attribute names follow ``flask.Request`` so that the OAuth helpers in
+    ``connector.validator`` accept it.
+    """
+
+    def __init__(self, scope, body):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = Headers([(k.decode('latin-1'), v.decode('latin-1'))
+                                for k, v in scope['headers']])
+        self.data = body
+        host = self.headers.get('Host', 'localhost')
+        self.url = '{}://{}{}{}'.format(scope.get('scheme', 'http'), host,
+                                        scope.get('root_path', ''), self.path)
+        query_string = scope.get('query_string', b'').decode('latin-1')
+        if query_string:
+            self.url += '?' + query_string
+        self.oa = None
+        self.reseller = None
+        self.enterprise_id = 'N/A'
+        # rule of the matched route, the route label of the metrics
+        self.route = None
+
+    def get_json(self):
+        return json.loads(self.data.decode('utf-8')) if self.data else {}
+
+
+UNAUTHORIZED = 'The server could not verify that you are authorized to access the URL requested.'
+
+
+async def authenticate(request, resource):
+    if resource in internal_endpoints:
+        # Prometheus can not sign its scrapes, it sends the metrics token instead
+        scrape = resource is Metrics and authorized_scrape(request.headers.get('Authorization'))
+        if not scrape and not verify_request(request).valid:
+            raise HttpError(401, UNAUTHORIZED)
+        return
+
+    reseller_id = request.headers.get('Aps-Instance-Id')
+    if not set_name_for_reseller(reseller_id):
+        if resource not in public_endpoints:
+            raise HttpError(401, UNAUTHORIZED)
+        return
+
+    oauth = verify_request(request)
+    if not oauth.valid:
+        raise HttpError(401, UNAUTHORIZED)
+
+    request.oa = AsyncOA(request.headers.get('aps-controller-uri'),
+                         transaction_id=request.headers.get('aps-transaction-id'),
+                         signer=get_signer(oauth.client_key).client)
+    request.reseller = AsyncReseller(None)
+    await request.reseller.refresh()
+    if not request.reseller.token:
+        raise HttpError(403, 'You don\'t have the permission to access the requested resource.')
+    usage_collector.ensure_started()
+
+
+async def handle(request):
+    if request.path.rstrip('/') == '':
+        return {'service': 'box_connector', 'host': socket.gethostname()}, 200
+
+    try:
+        rule, kwargs = url_map.bind('localhost').match(request.path, return_rule=True)
+    except (NotFound, MethodNotAllowed):
+        return {'message': 'The requested URL was not found on the server.'}, 404
+    resource, request.route = rule.endpoint, rule.rule
+
+    try:
+        await authenticate(request, resource)
+        return await resource().dispatch(request, **kwargs)
+    except HttpError as e:
+        return e.body, e.status
+    except CircuitOpenError as e:
+        # e.g. a cold reseller token fetch in authenticate, outside of the resources
+        return make_unavailable_error(e)
+    except Exception:
+        logger.exception("%s %s failed", request.method, request.path)
+        return {'message': 'Internal Server Error'}, 500
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_sessions()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def send_stream(request, data, status, send):
+    logger.info("%s %s %s company_id=%s", request.method, request.path, status,
+                request.enterprise_id)
+    await send({'type': 'http.response.start',
+                'status': status,
+                'headers': [(b'content-type', data.content_type.encode('latin-1'))]})
+    try:
+        async for line in data.lines:
+            await send({'type': 'http.response.body', 'body': line.encode('utf-8'),
+                        'more_body': True})
+    except Exception:
+        # the status is sent already, the client sees a truncated body
+        logger.exception("%s %s failed while streaming", request.method, request.path)
+    finally:
+        # e.g. cancels the request of a page nobody reads any more
+        data.lines.close()
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    body = b''
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get('body', b'')
+        more_body = message.get('more_body', False)
+
+    started = timer()
+    registry.ensure_started()
+    request = AsyncRequest(scope, body)
+    result = await handle(request)
+    data, status = result[:2]
+    extra_headers = result[2] if len(result) > 2 else {}
+    if request.route:
+        # for streamed responses until the body starts, like the WSGI application
+        request_duration.observe(timer() - started, route=request.route,
+                                 method=request.method, status=status)
+
+    if isinstance(data, StreamResponse):
+        return await send_stream(request, data, status, send)
+
+    if isinstance(data, TextResponse):
+        content_type, payload = data.content_type.encode('latin-1'), data.text.encode('utf-8')
+    elif status == 204:
+        content_type, payload = b'application/json', b''
+    else:
+        content_type, payload = b'application/json', (json.dumps(data) + '\n').encode('utf-8')
+
+    logger.info("%s %s %s company_id=%s", request.method, request.path, status,
+                request.enterprise_id)
+
+    await send({'type': 'http.response.start',
+                'status': status,
+                'headers': [(b'content-type', content_type),
+                            (b'content-length', str(len(payload)).encode('latin-1'))] +
+                           [(k.lower().encode('latin-1'), v.encode('latin-1'))
+                            for k, v in extra_headers.items()]})
+    await send({'type': 'http.response.body', 'body': payload})
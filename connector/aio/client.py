@@ -0,0 +1,212 @@
+import asyncio
+import logging
+
+from connector.client import reseller_tokens
+from connector.client.client import Client
+from connector.client.pagination import next_page_params
+from connector.client.snapshot import MISSING, STALE, enterprises
+from connector.client.usage import usage_collector
+from connector.client.user import User
+
+from .upstream import AsyncBoxAPI, run_blocking
+
+logger = logging.getLogger(__name__)
+
+_api = AsyncBoxAPI()
+
+
+def adjust_users(enterprise_id, delta):
+    enterprises.adjust_users(enterprise_id, delta)
+    usage_collector.adjust(enterprise_id, delta)
+
+
+def forget_enterprise_usage(enterprise_id):
+    enterprises.invalidate(enterprise_id)
+    usage_collector.invalidate(enterprise_id)
+
+
+class AsyncIterator(object):
+    """Base of the async iterators of the package, an empty one by itself.
+
+    Async generators need Python 3.6, these classes run on 3.5. ``close()``
+    releases what an iterator abandoned before its end holds.
+    """
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        raise StopAsyncIteration
+
+    def close(self):
+        pass
+
+
+class AsyncMap(AsyncIterator):
+    """``function(item)`` for the items of the async iterator ``items``."""
+
+    def __init__(self, function, items):
+        self.function = function
+        self.items = items
+
+    async def __anext__(self):
+        return self.function(await self.items.__anext__())
+
+    def close(self):
+        self.items.close()
+
+
+class Entries(AsyncIterator):
+    """Entries of a Box collection, the next page is requested while ``page`` is consumed."""
+
+    def __init__(self, fetch_page, query, page_size, page):
+        self.fetch_page = fetch_page
+        self.query = query
+        self.page_size = page_size
+        self.offset = 0
+        self.next_page = None
+        self.load(page)
+
+    def load(self, page):
+        entries = page.get('entries') or []
+        self.offset += len(entries)
+        self.entries = iter(entries)
+        next_query = next_page_params(page, self.offset, self.page_size)
+        if next_query is not None:
+            self.next_page = asyncio.ensure_future(
+                self.fetch_page(dict(self.query, **next_query)))
+
+    async def __anext__(self):
+        while True:
+            for entry in self.entries:
+                return entry
+            if self.next_page is None:
+                raise StopAsyncIteration
+            next_page, self.next_page = self.next_page, None
+            self.load(await next_page)
+
+    def close(self):
+        if self.next_page is not None and not self.next_page.done():
+            self.next_page.cancel()
+
+
+async def paginate(fetch_page, page_size=100, params=None):
+    """Async counterpart of ``connector.client.pagination.paginate``.
+
+    ``fetch_page(query)`` is a coroutine function, the returned async
+    iterator requests the next page while the current one is consumed.
+    """
+    query = dict(params or {}, limit=page_size)
+    return Entries(fetch_page, query, page_size, await fetch_page(query))
+
+
+class AsyncReseller(object):
+    token = None
+
+    def __init__(self, token=None):
+        self.token = token
+
+    def api(self):
+        return AsyncBoxAPI(token=self.token) if self.token else _api
+
+    def __repr__(self):
+        return '<AsyncReseller>'
+
+    async def refresh(self):
+        if not self.token:
+            self.token = await run_blocking(reseller_tokens.get)
+
+    async def enterprises(self, page_size=100):
+        """Async iterator over the enterprises of the reseller as ``AsyncClient`` objects."""
+        entries = await paginate(lambda query: self.api().get('enterprises', query), page_size)
+
+        def client(entry):
+            client = AsyncClient(self, enterprise_id=entry['id'])
+            client.load(entry)
+            return client
+
+        return AsyncMap(client, entries)
+
+
+class AsyncClient(Client):
+    __slots__ = ()
+
+    async def create(self, administered_by):
+        self.administered_by = administered_by
+        result = await self.api().post('enterprises', self._dump)
+        self.load(result)
+        await run_blocking(enterprises.put, self.enterprise_id, result)
+        return result
+
+    async def update(self):
+        result = await self.api().put('enterprises/{}'.format(self.enterprise_id), self._dump)
+        await run_blocking(enterprises.put, self.enterprise_id, result)
+        return result
+
+    def fetch(self):
+        return self.api().get('enterprises/{}'.format(self.enterprise_id))
+
+    async def users(self, page_size=100):
+        """Async iterator over the users of the enterprise as ``AsyncUser`` objects."""
+        path = 'enterprises/{}/users'.format(self.enterprise_id)
+        entries = await paginate(lambda query: self.api().get(path, query), page_size)
+
+        def user(entry):
+            user = AsyncUser(self)
+            user.load(entry)
+            return user
+
+        return AsyncMap(user, entries)
+
+    async def refresh(self, field=None):
+        # snapshots may be kept in a sqlite cache, they are read and written off the event loop
+        if self.enterprise_id:
+            result, state = (None, MISSING)
+            if field:
+                result, state = await run_blocking(enterprises.lookup, self.enterprise_id, field)
+            if state == MISSING:
+                result = await run_blocking(enterprises.put, self.enterprise_id,
+                                            await self.fetch())
+            elif state == STALE:
+                enterprises.stale_served += 1
+                if await run_blocking(enterprises.claim_refresh, self.enterprise_id):
+                    asyncio.ensure_future(self._refresh_later(self.fetch()))
+            self.load(result)
+
+    async def _refresh_later(self, fetch):
+        response = None
+        try:
+            response = await fetch
+        except Exception:
+            logger.exception("Background refresh of enterprise %s failed", self.enterprise_id)
+        finally:
+            await run_blocking(enterprises.refreshed, self.enterprise_id, response)
+
+    async def delete(self):
+        self.active_status = 'deactivated'
+        if self.enterprise_id:
+            result = await self.api().put('enterprises/{}'.format(self.enterprise_id))
+            await run_blocking(forget_enterprise_usage, self.enterprise_id)
+            return result
+
+
+class AsyncUser(User):
+    __slots__ = ()
+
+    async def create(self):
+        result = await self.api().post('users', self._dump)
+        self.load(result)
+        await run_blocking(adjust_users, self.client.enterprise_id, 1)
+        return result
+
+    async def update(self):
+        await self.api().put('users/{}'.format(self.user_id), self._dump)
+
+    async def refresh(self):
+        result = await self.api().get('users/{}'.format(self.user_id))
+        self.load(result)
+
+    async def delete(self):
+        result = await self.api().delete('users/{}'.format(self.user_id))
+        await run_blocking(adjust_users, self.client.enterprise_id, -1)
+        return result
@@ -0,0 +1,529 @@
+"""Async counterparts of the resources in ``connector.v1.resources``.
+
+Handlers get an ``AsyncRequest`` with ``oa`` and ``reseller`` attached by
+the application and return ``(body, status)`` like flask-restful resources.
+"""
+import asyncio
+import json
+import logging
+from collections import OrderedDict, namedtuple
+
+from connector.config import Config
+from connector import idempotency
+from connector.breaker import CircuitOpenError
+from connector.client.usage import usage_collector
+from connector.jobs import jobs
+from connector.v1.resources import make_error, make_unavailable_error, parameter_validator
+from connector.v1.resources.application import get_version
+from connector.v1.resources.job import job_status
+# registers the collected metrics too
+from connector.v1.resources.metrics import CONTENT_TYPE, registry
+from connector.v1.resources.stats import Stats as SyncStats
+from connector.tenants import tenant_store
+from connector.v1.resources.tenant import (get_enterprise_id_for_tenant as sync_enterprise_lookup,
+                                           forget_enterprise, make_user, map_tenant_type,
+                                           remember_enterprise, user_summary)
+
+from .client import AsyncClient, AsyncIterator, AsyncMap, AsyncUser
+from .upstream import BoxError, run_blocking
+
+logger = logging.getLogger(__name__)
+
+config = Config()
+
+_missing = object()
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        self.status = status
+        self.body = {'message': message}
+        super(HttpError, self).__init__(message)
+
+
+class TextResponse(object):
+    def __init__(self, text, content_type='text/plain'):
+        self.text = text
+        self.content_type = content_type
+
+
+class StreamResponse(object):
+    """Body sent in chunks, ``lines`` is an ``AsyncIterator`` of strings."""
+
+    def __init__(self, lines, content_type='application/x-ndjson'):
+        self.lines = lines
+        self.content_type = content_type
+
+
+Argument = namedtuple('Argument', ['name', 'dest', 'validator', 'required', 'help'])
+
+
+def parse_args(request, *arguments):
+    """Subset of ``reqparse.RequestParser.parse_args`` for JSON bodies."""
+    data = request.get_json()
+    values = {}
+    for arg in arguments:
+        if arg.name not in data:
+            if arg.required:
+                raise HttpError(400, {arg.name: arg.help})
+            values[arg.dest] = None
+            continue
+        try:
+            values[arg.dest] = arg.validator(data[arg.name])
+        except ValueError as e:
+            raise HttpError(400, {arg.name: arg.help or str(e)})
+    return namedtuple('Args', list(values))(**values)
+
+
+def stored_enterprise_id(tenant_id):
+    """The enterprise of ``tenant_id`` from the tenant cache or store, ``_missing`` if unknown."""
+    # shares the cache with the WSGI implementation, so invalidation works for both
+    cache = sync_enterprise_lookup.cache
+    enterprise_id = cache.get((tenant_id,), _missing)
+    if enterprise_id is _missing:
+        enterprise_id = tenant_store.get(tenant_id)
+        if enterprise_id is None:
+            return _missing
+        cache.set((tenant_id,), enterprise_id)
+    return enterprise_id
+
+
+async def get_enterprise_id_for_tenant(oa, tenant_id):
+    # the tenant store and a sqlite cache block, they are read off the event loop
+    enterprise_id = await run_blocking(stored_enterprise_id, tenant_id)
+    if enterprise_id is _missing:
+        tenant_resource = await oa.get_resource(tenant_id)
+        if 'tenantId' not in tenant_resource:
+            raise KeyError("tenantId property is missing in OA resource {}".format(tenant_id))
+        enterprise_id = tenant_resource['tenantId']
+        enterprise_id = None if enterprise_id == 'TBD' else enterprise_id
+        await run_blocking(remember_enterprise, tenant_id, enterprise_id)
+    return enterprise_id
+
+
+class AsyncResource(object):
+    async def dispatch(self, request, **kwargs):
+        handler = getattr(self, request.method.lower(), None)
+        if handler is None:
+            raise HttpError(405, 'The method is not allowed for the requested URL.')
+        key = idempotency.request_key(request.method, request.path,
+                                      request.headers.get('aps-transaction-id'), request.data)
+        completed = await run_blocking(idempotency.lookup, key) if key else None
+        if completed is not None:
+            data, status, headers, request.enterprise_id = completed
+            logger.info("%s %s was completed in this transaction already, returning its response",
+                        request.method, request.path)
+            return data, status, headers
+
+        try:
+            result = await handler(request, **kwargs)
+        except BoxError as e:
+            return make_error(e)
+        except CircuitOpenError as e:
+            return make_unavailable_error(e)
+        if key:
+            await run_blocking(idempotency.remember, key, result[0], result[1],
+                               result[2] if len(result) > 2 else {}, request.enterprise_id)
+        return result
+
+
+class HealthCheck(AsyncResource):
+    async def get(self, request):
+        return {'status': 'ok', 'version': get_version()}, 200
+
+
+class Stats(AsyncResource):
+    async def get(self, request):
+        # the sizes of sqlite caches are queried
+        return await run_blocking(SyncStats().get), 200
+
+
+class Metrics(AsyncResource):
+    async def get(self, request):
+        # reads the files of the other workers
+        return TextResponse(await run_blocking(registry.render), CONTENT_TYPE), 200
+
+
+class ApplicationList(AsyncResource):
+    async def post(self, request):
+        args = parse_args(
+            request,
+            Argument('aps', 'aps_type', parameter_validator('type'), True, 'No APS type specified'),
+            Argument('aps', 'aps_id', parameter_validator('id'), True, 'No APS id specified'))
+        return {'aps': {'type': args.aps_type, 'id': args.aps_id}}, 201
+
+
+class Application(AsyncResource):
+    async def delete(self, request, app_id):
+        return {}, 204
+
+
+class ApplicationUpgrade(AsyncResource):
+    async def post(self, request, app_id):
+        return {}, 200
+
+
+class ApplicationTenantNew(AsyncResource):
+    async def post(self, request, app_id, tenant_id=None):
+        return {}, 200
+
+
+class ApplicationTenantDelete(AsyncResource):
+    async def delete(self, request, app_id, tenant_id=None):
+        return {}, 200
+
+
+class TenantList(AsyncResource):
+    async def post(self, request):
+        args = parse_args(
+            request,
+            Argument('aps', 'aps_id', parameter_validator('id'), True, 'Missing aps.id in request'),
+            Argument(config.users_resource, 'users_limit', parameter_validator('limit'), False,
+                     'Missing {} limit in request'.format(config.users_resource)),
+            Argument(config.tenant_type_resource, 'ttype_limit', parameter_validator('limit'),
+                     False, 'Missing {} limit in request'.format(config.tenant_type_resource)),
+            Argument('oaSubscription', 'sub_id', parameter_validator('aps', 'id'), True,
+                     'Missing link to subscription in request'),
+            Argument('oaAccount', 'acc_id', parameter_validator('aps', 'id'), True,
+                     'Missing link to account in request'))
+        oa = request.oa
+
+        resources = await oa.get_resources_by_ids([args.acc_id, args.sub_id])
+        admins = await oa.send_request(
+            'GET',
+            '/aps/2/resources?implementing(http://parallels.com/aps/types/pa/admin-user/1.0)',
+            impersonate_as=args.aps_id)
+        if not admins:
+            raise KeyError("No admins in OA account {}".format(args.acc_id))
+
+        admin_user = admins[0]
+
+        # set before the OA link below, a request repeated by APS after a failed link
+        # must not create a second enterprise
+        enterprise_id = await run_blocking(tenant_store.get, args.aps_id)
+        if enterprise_id is not None:
+            logger.info("Enterprise %s of tenant %s exists already, linking it in OA",
+                        enterprise_id, args.aps_id)
+            client = AsyncClient(request.reseller, enterprise_id=enterprise_id)
+            if enterprise_id != 'SECOND':
+                await client.refresh('administered_by')
+        else:
+            client = await create_client(request.reseller, args, resources, admin_user)
+            await run_blocking(remember_enterprise, args.aps_id, client.enterprise_id)
+
+        # link BOX tenant to the user in OA
+        user_type = (await oa.send_request('GET', '/aps/2/application'))['user']['type']
+        await oa.send_request('POST', '/aps/2/application/user', body={
+            'aps': {'type': user_type},
+            'userId': client.administered_by['user_id'] if client.enterprise_id != 'SECOND'
+            else 'SECOND',
+            'user': {'aps': {'id': admin_user['aps']['id']}},
+            'tenant': {'aps': {'id': args.aps_id}}
+        }, impersonate_as=args.aps_id)
+
+        request.enterprise_id = client.enterprise_id
+        return {'tenantId': client.enterprise_id}, 201
+
+
+async def create_client(reseller, args, resources, admin_user):
+    """Create the Box enterprise administered by ``admin_user``, return its client."""
+    company_name = resources[args.acc_id]['companyName']
+    sub_id = resources[args.sub_id]['subscriptionId']
+    company_name = '{}-sub{}'.format(company_name if company_name else 'Unnamed', sub_id)
+    plan_code = map_tenant_type(args.ttype_limit)
+
+    client = AsyncClient(reseller, name=company_name, users_limit=args.users_limit,
+                         plan_code=plan_code)
+    user = make_user(client, admin_user, user_class=AsyncUser)
+
+    try:
+        await client.create(user)
+    except BoxError as e:
+        r = e.response
+        if r.status_code != 400:
+            raise
+        error = json.loads(r.text)['context_info']['errors'][0]
+        if error['reason'] == 'invalid_parameter' and error['name'] == 'master_login':
+            logger.info("Attempt to create a subscription with admin already registered "
+                        "in BOX, skipping it as a second subscription: %s", error)
+            client.enterprise_id = 'SECOND'
+        else:
+            raise
+    return client
+
+
+class Tenant(AsyncResource):
+    async def get(self, request, tenant_id):
+        enterprise_id = await get_enterprise_id_for_tenant(request.oa, tenant_id)
+        request.enterprise_id = enterprise_id
+        if enterprise_id == 'SECOND':
+            return {}, 200
+        usage = await run_blocking(usage_collector.get, enterprise_id)
+        if usage is None:
+            client = AsyncClient(request.reseller, enterprise_id=enterprise_id)
+            await client.refresh('users_amount')
+            usage = client.users_amount
+        return {config.users_resource: {'usage': usage}}, 200
+
+    async def put(self, request, tenant_id):
+        args = parse_args(
+            request,
+            Argument(config.users_resource, 'users_limit', parameter_validator('limit'), False,
+                     'Missing {} limit in request'.format(config.users_resource)),
+            Argument(config.tenant_type_resource, 'ttype_limit', parameter_validator('limit'),
+                     False, 'Missing {} limit in request'.format(config.tenant_type_resource)))
+        enterprise_id = await get_enterprise_id_for_tenant(request.oa, tenant_id)
+        request.enterprise_id = enterprise_id
+        if enterprise_id == 'SECOND':
+            return {}, 200
+
+        plan_code = map_tenant_type(args.ttype_limit)
+        if args.users_limit or plan_code:
+            client = AsyncClient(request.reseller, enterprise_id=enterprise_id,
+                                 users_limit=args.users_limit, plan_code=plan_code)
+            await client.update()
+        return {}, 200
+
+    async def delete(self, request, tenant_id):
+        enterprise_id = await get_enterprise_id_for_tenant(request.oa, tenant_id)
+        request.enterprise_id = enterprise_id
+        if enterprise_id != 'SECOND':
+            client = AsyncClient(request.reseller, enterprise_id=enterprise_id)
+            await client.delete()
+        await run_blocking(forget_enterprise, tenant_id)
+        return None, 204
+
+
+class TenantDisable(AsyncResource):
+    async def put(self, request, tenant_id):
+        return {}, 200
+
+
+class TenantEnable(AsyncResource):
+    async def put(self, request, tenant_id):
+        return {}, 200
+
+
+class TenantAdminLogin(AsyncResource):
+    async def get(self, request, tenant_id):
+        return TextResponse('https://app.box.com/'), 200
+
+
+class TenantUserCreated(AsyncResource):
+    async def get(self, request, oa_tenant_id):
+        enterprise_id = await get_enterprise_id_for_tenant(request.oa, oa_tenant_id)
+        request.enterprise_id = enterprise_id
+        users = AsyncIterator()
+        if enterprise_id and enterprise_id != 'SECOND':
+            client = AsyncClient(request.reseller, enterprise_id=enterprise_id)
+            users = await client.users(config.users_page_size)
+
+        return StreamResponse(AsyncMap(lambda user: json.dumps(user_summary(user)) + '\n',
+                                       users)), 200
+
+    async def post(self, request, oa_tenant_id):
+        return {}, 200
+
+
+class TenantUserRemoved(AsyncResource):
+    async def delete(self, request, tenant_id, user_id):
+        return {}, 200
+
+
+async def make_box_user(request, oa_user_service_id):
+    oa_user_service = await request.oa.get_resource(oa_user_service_id)
+    oa_tenant_id = oa_user_service['tenant']['aps']['id']
+    enterprise_id = await get_enterprise_id_for_tenant(request.oa, oa_tenant_id)
+    client = AsyncClient(reseller=request.reseller, enterprise_id=enterprise_id)
+    return AsyncUser(client=client, user_id=oa_user_service['userId'])
+
+
+class UserList(AsyncResource):
+    async def post(self, request):
+        args = parse_args(
+            request,
+            Argument('tenant', 'oa_tenant_id', parameter_validator('aps', 'id'), True,
+                     'Missing tenant in request'),
+            Argument('user', 'oa_user_id', parameter_validator('aps', 'id'), True,
+                     'Missing user id in request'))
+
+        enterprise_id = await get_enterprise_id_for_tenant(request.oa, args.oa_tenant_id)
+        request.enterprise_id = enterprise_id
+        if enterprise_id == 'SECOND':
+            # no support for second subscription yet, just skip it
+            return {'userId': 'SECOND'}, 201
+
+        client = AsyncClient(request.reseller, enterprise_id=enterprise_id)
+        await client.refresh('administered_by')
+
+        oa_user = await request.oa.get_resource(args.oa_user_id)
+        return {'userId': await create_user(client, oa_user)}, 201
+
+
+class User(AsyncResource):
+    async def delete(self, request, oa_user_service_id):
+        user = await make_box_user(request, oa_user_service_id)
+        enterprise_id = request.enterprise_id = user.client.enterprise_id
+        if user.user_id == 'SECOND':
+            logger.info("A crutch for the second subscription support, "
+                        "skipping deletion of fake user")
+            return {}, 204
+
+        # Check that this user is not assigned to the enterprise as admin
+        client = AsyncClient(request.reseller, enterprise_id=enterprise_id)
+        await client.refresh('administered_by')
+        await delete_user(client, user)
+        return {}, 204
+
+    async def put(self, request, oa_user_service_id):
+        return {}, 200
+
+
+class UserLogin(AsyncResource):
+    async def get(self, request, oa_user_service_id):
+        user = await make_box_user(request, oa_user_service_id)
+        request.enterprise_id = user.client.enterprise_id
+        return TextResponse(user.login_link()), 200
+
+
+def user_list(value):
+    if not isinstance(value, list) or not value:
+        raise ValueError("A non-empty list of ids is expected")
+    # a repeated id would create or delete the same user concurrently
+    return list(OrderedDict.fromkeys(str(i) for i in value))
+
+
+class TenantUsersBulk(AsyncResource):
+    async def refreshed_client(self, request, tenant_id):
+        enterprise_id = await get_enterprise_id_for_tenant(request.oa, tenant_id)
+        request.enterprise_id = enterprise_id
+        if enterprise_id == 'SECOND':
+            return None
+        client = AsyncClient(request.reseller, enterprise_id=enterprise_id)
+        await client.refresh('administered_by')
+        return client
+
+    async def post(self, request, tenant_id):
+        args = parse_args(request, Argument('users', 'users', user_list, True,
+                                            'Missing list of user ids in request'))
+        client = await self.refreshed_client(request, tenant_id)
+        if client is None:
+            return {'users': [{'id': i, 'status': 201, 'userId': 'SECOND'}
+                              for i in args.users]}, 200
+
+        # resources missing from the RQL query are fetched by their user, failing just that user
+        oa_users = await request.oa.get_resources_by_ids(args.users, fetch_missing=False)
+        limit = asyncio.Semaphore(config.bulk_concurrency)
+
+        async def create_one(oa_user_id):
+            oa_user = oa_users.get(oa_user_id) or await request.oa.get_resource(oa_user_id)
+            return await create_user(client, oa_user)
+
+        async def create(oa_user_id):
+            async with limit:
+                return await bulk_result(oa_user_id, 201, lambda: create_one(oa_user_id),
+                                         'userId')
+
+        return {'users': list(await asyncio.gather(*[create(i) for i in args.users]))}, 200
+
+    async def delete(self, request, tenant_id):
+        args = parse_args(request, Argument('users', 'users', user_list, True,
+                                            'Missing list of user ids in request'))
+        client = await self.refreshed_client(request, tenant_id)
+        if client is None:
+            return {'users': [{'id': i, 'status': 204} for i in args.users]}, 200
+
+        oa_user_services = await request.oa.get_resources_by_ids(args.users, fetch_missing=False)
+        limit = asyncio.Semaphore(config.bulk_concurrency)
+
+        async def delete_one(oa_user_service_id):
+            oa_user_service = (oa_user_services.get(oa_user_service_id) or
+                               await request.oa.get_resource(oa_user_service_id))
+            await delete_user(client, AsyncUser(client=client, user_id=oa_user_service['userId']))
+
+        async def delete(oa_user_service_id):
+            async with limit:
+                return await bulk_result(oa_user_service_id, 204,
+                                         lambda: delete_one(oa_user_service_id))
+
+        return {'users': list(await asyncio.gather(*[delete(i) for i in args.users]))}, 200
+
+
+async def bulk_result(oa_id, status, coroutine_function, result_key=None):
+    """Await one user of a bulk request, turn errors into the user's result."""
+    try:
+        value = await coroutine_function()
+    except BoxError as e:
+        body, status = make_error(e)
+    except CircuitOpenError as e:
+        body, status, _ = make_unavailable_error(e)
+    except Exception as e:
+        # e.g. an OA error or incomplete OA data, the other users of the request are not affected
+        logger.exception("Bulk operation on user %s failed", oa_id)
+        body, status = {'message': '{}: {}'.format(e.__class__.__name__, e)}, 500
+    else:
+        result = {'id': oa_id, 'status': status}
+        if result_key:
+            result[result_key] = value
+        return result
+    logger.info("Bulk operation on user %s failed with %s: %s", oa_id, status, body['message'])
+    return {'id': oa_id, 'status': status, 'message': body['message']}
+
+
+async def create_user(client, oa_user):
+    if client.administered_by['login'] == oa_user['email']:
+        # this user has been created as part of tenant registration, just return ID
+        return client.administered_by['user_id']
+
+    user = make_user(client, oa_user, user_class=AsyncUser)
+    await user.create()
+    return user.user_id
+
+
+async def delete_user(client, user):
+    if client.administered_by['user_id'] == user.user_id:
+        logger.info("User %s is assigned as the tenant admin, we can't delete it, "
+                    "skipping deletion", user.user_id)
+        return
+
+    try:
+        await user.delete()
+    except BoxError as e:
+        if e.response.status_code != 404:
+            raise
+        logger.info("User %s is not found in BOX, skip deletion", user.user_id)
+
+
+class Job(AsyncResource):
+    async def get(self, request, job_id):
+        job = await run_blocking(jobs.get, job_id)
+        if job is None:
+            raise HttpError(404, 'Job {} is not found'.format(job_id))
+        return job_status(job), 200
+
+
+resource_routes = {
+    '/': HealthCheck,
+    '/stats': Stats,
+    '/metrics': Metrics,
+    '/app': ApplicationList,
+    '/app/<app_id>': Application,
+    '/app/<app_id>/tenants': ApplicationTenantNew,
+    '/app/<app_id>/tenants/<tenant_id>': ApplicationTenantDelete,
+    '/app/<app_id>/upgrade': ApplicationUpgrade,
+
+    '/tenant': TenantList,
+    '/tenant/<tenant_id>': Tenant,
+    '/tenant/<tenant_id>/disable': TenantDisable,
+    '/tenant/<tenant_id>/enable': TenantEnable,
+    '/tenant/<tenant_id>/adminlogin': TenantAdminLogin,
+    '/tenant/<oa_tenant_id>/users': TenantUserCreated,
+    '/tenant/<tenant_id>/users/bulk': TenantUsersBulk,
+    '/tenant/<tenant_id>/users/<user_id>': TenantUserRemoved,
+
+    '/user': UserList,
+    '/user/<oa_user_service_id>': User,
+    '/user/<oa_user_service_id>/login': UserLogin,
+
+    '/jobs/<job_id>': Job,
+}
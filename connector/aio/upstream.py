@@ -0,0 +1,233 @@
+import asyncio
+import json
+import logging
+from collections import OrderedDict, namedtuple
+
+import aiohttp
+
+try:
+    from urllib.parse import urlencode, urljoin
+except ImportError:
+    from urllib import urlencode
+    from urlparse import urljoin
+
+from connector.breaker import CircuitBreaker, CircuitOpenError, breakers, is_server_failure
+from connector.client import box_sessions, config, reseller_tokens
+from connector.config import breaker_options
+from connector.metrics import observe_upstream, timer
+from connector.retry import ANY_METHOD, IDEMPOTENT_METHODS
+from connector.v1.resources import OA_BATCH_SIZE, OACommunicationException, oa_retry
+
+logger = logging.getLogger(__name__)
+
+# just enough of a requests.Response for OACommunicationException, make_error and RetryPolicy
+UpstreamResponse = namedtuple('UpstreamResponse', ['status_code', 'text', 'headers'])
+UpstreamResponse.__new__.__defaults__ = ({},)
+
+# aiohttp counterparts of connector.retry.DEFAULT_EXCEPTION_RULES
+EXCEPTION_RULES = [(aiohttp.ClientConnectorError, ANY_METHOD),
+                   (asyncio.TimeoutError, IDEMPOTENT_METHODS),
+                   (aiohttp.ClientError, IDEMPOTENT_METHODS)]
+
+_sessions = {}
+
+
+def get_session(name, limit, connect_timeout, read_timeout):
+    """Return the keep-alive aiohttp session ``name`` of the running loop."""
+    session = _sessions.get(name)
+    if session is None or session.closed:
+        timeout = aiohttp.ClientTimeout(connect=connect_timeout, sock_read=read_timeout)
+        session = _sessions[name] = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=limit), timeout=timeout)
+    return session
+
+
+async def close_sessions():
+    for session in list(_sessions.values()):
+        await session.close()
+    _sessions.clear()
+
+
+def get_breaker(name, url):
+    """The circuit breaker shared with the WSGI code for the upstream of ``url``."""
+    name = '{}:{}'.format(name, box_sessions.base_url(url))
+    return breakers.get(name) or CircuitBreaker(name, **breaker_options(config))
+
+
+async def guarded_request(upstream, session, breaker, method, url, **kwargs):
+    """Make a request to ``upstream`` through ``breaker``, return an ``UpstreamResponse``."""
+    started = timer()
+    try:
+        breaker.allow()
+    except CircuitOpenError as e:
+        observe_upstream(upstream, method, url, started, error=e)
+        raise
+    try:
+        async with session.request(method, url, **kwargs) as resp:
+            text = await resp.text()
+    except Exception as e:
+        breaker.record(False)
+        observe_upstream(upstream, method, url, started, error=e)
+        raise
+    response = UpstreamResponse(resp.status, text, resp.headers)
+    breaker.record(not is_server_failure(response))
+    observe_upstream(upstream, method, url, started, response=response)
+    return response
+
+
+async def retry_call(policy, method, send, max_attempts=None):
+    """Async ``RetryPolicy.call``, awaits ``send()`` until it succeeds or may not be retried."""
+    max_attempts = max_attempts or policy.max_attempts
+    policy.budget.deposit()
+    attempt = 1
+    while True:
+        try:
+            response = await send()
+        except Exception as e:
+            if not (policy.should_retry_exception(method, e, EXCEPTION_RULES) and
+                    policy.can_retry(attempt, max_attempts)):
+                policy.attempts[attempt] += 1
+                raise
+            delay = policy.delay(attempt)
+            logger.info("%s %s attempt %s failed (%r), retrying in %.2fs",
+                        policy.name, method, attempt, e, delay)
+        else:
+            if not (policy.should_retry_status(method, response.status_code) and
+                    policy.can_retry(attempt, max_attempts)):
+                policy.attempts[attempt] += 1
+                return response
+            delay = policy.delay(attempt, response)
+            logger.info("%s %s attempt %s returned %s, retrying in %.2fs",
+                        policy.name, method, attempt, response.status_code, delay)
+
+        policy.retries += 1
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+def run_blocking(function, *args):
+    return asyncio.get_event_loop().run_in_executor(None, function, *args)
+
+
+class BoxError(Exception):
+    def __init__(self, status_code, text, url):
+        self.response = UpstreamResponse(status_code, text)
+        super(BoxError, self).__init__("Box API error {}: {}".format(status_code, url))
+
+
+class AsyncBoxAPI(object):
+    """Minimal async counterpart of the slumber client used for Box."""
+
+    def __init__(self, base_url=None, token=None):
+        self.base_url = base_url or config.box_baseurl
+        self.token = token
+
+    def session(self):
+        return get_session('box', config.box_pool_size,
+                           config.box_connect_timeout, config.box_read_timeout)
+
+    async def request(self, method, path, data=None, params=None):
+        # slumber appends a slash to every resource url, do the same
+        url = urljoin(self.base_url, path.strip('/') + '/')
+        if params:
+            url += '?' + urlencode(sorted(params.items()))
+        token = self.token or await run_blocking(reseller_tokens.get)
+        body = None if data is None else json.dumps(data)
+        headers = {'accept': 'application/json', 'content-type': 'application/json'}
+
+        def send():
+            # reads the token when called, the replay after a 401 uses the new one
+            return guarded_request('box', self.session(), get_breaker('box', url), method, url,
+                                   data=body,
+                                   headers=dict(headers, Authorization='Bearer {}'.format(token)))
+
+        # the retry policy of the WSGI Box sessions, with the same attempts and budget
+        response = await retry_call(box_sessions.retry, method, send)
+        if response.status_code == 401 and not self.token:
+            token = await run_blocking(reseller_tokens.invalidate, token)
+            response = await retry_call(box_sessions.retry, method, send)
+
+        if response.status_code >= 400:
+            raise BoxError(response.status_code, response.text, url)
+        return json.loads(response.text) if response.text else None
+
+    def get(self, path, params=None):
+        return self.request('GET', path, params=params)
+
+    def post(self, path, data):
+        return self.request('POST', path, data)
+
+    def put(self, path, data=None):
+        return self.request('PUT', path, data)
+
+    def delete(self, path):
+        return self.request('DELETE', path)
+
+
+class AsyncOA(object):
+    """Async OA client bound to one APS request.
+
+    Unlike ``connector.v1.resources.OA`` it does not read flask globals, the
+    controller URI, transaction id and OAuth signer come from the request.
+    """
+
+    def __init__(self, controller_uri, transaction_id=None, signer=None):
+        self.controller_uri = controller_uri
+        self.transaction_id = transaction_id
+        # an oauthlib client, e.g. ``get_signer(client_key).client``
+        self.signer = signer
+
+    def session(self):
+        return get_session('oa', config.oa_pool_size,
+                           config.oa_connect_timeout, config.oa_read_timeout)
+
+    def get_resource(self, resource_id, transaction=True, retry_num=10):
+        rql_request = 'aps/2/resources/{}'.format(resource_id)
+        return self.send_request('get', rql_request, transaction=transaction, retry_num=retry_num)
+
+    def get_resources(self, rql_request, transaction=True, retry_num=10):
+        return self.send_request('get', rql_request, transaction=transaction, retry_num=retry_num)
+
+    async def get_resources_by_ids(self, ids, transaction=True, retry_num=10, fetch_missing=True):
+        ids = list(OrderedDict.fromkeys(ids))
+        found = {}
+        for start in range(0, len(ids), OA_BATCH_SIZE):
+            batch = ids[start:start + OA_BATCH_SIZE]
+            rql_request = 'aps/2/resources?in(aps.id,({}))'.format(','.join(str(i) for i in batch))
+            for resource in await self.get_resources(rql_request, transaction=transaction,
+                                                     retry_num=retry_num):
+                found[resource['aps']['id']] = resource
+        for i in ids:
+            if str(i) not in found and fetch_missing:
+                found[str(i)] = await self.get_resource(i, transaction=transaction,
+                                                        retry_num=retry_num)
+        return OrderedDict((i, found[str(i)]) for i in ids if str(i) in found)
+
+    async def send_request(self, method, path, body=None, transaction=True, impersonate_as=None,
+                           retry_num=10):
+        url = urljoin(self.controller_uri, path)
+
+        headers = {'Content-Type': 'application/json'}
+        if impersonate_as:
+            headers['aps-resource-id'] = impersonate_as
+        if transaction and self.transaction_id:
+            headers['aps-transaction-id'] = self.transaction_id
+
+        data = None if body is None else json.dumps(body)
+
+        def send():
+            signed_url, signed_headers = url, headers
+            if self.signer:
+                # signed per attempt like requests does, OA rejects a repeated nonce;
+                # like requests_oauthlib, JSON bodies are not part of the signature
+                signed_url, signed_headers, _ = self.signer.sign(url, method.upper(), None,
+                                                                 headers)
+            return guarded_request('oa', self.session(), get_breaker('oa', url), method.upper(),
+                                   signed_url, data=data, headers=signed_headers, ssl=False)
+
+        response = await retry_call(oa_retry, method, send,
+                                    max_attempts=retry_num if retry_num > 0 else 1)
+
+        if response.status_code != 200:
+            raise OACommunicationException(response)
+        return json.loads(response.text)
@@ -1,5 +1,4 @@
 import logging
-import sys
 import socket
 import os
 
@@ -7,12 +6,10 @@ from flask import Flask, jsonify
 from werkzeug.contrib.fixers import ProxyFix
 
 from connector.config import Config, check_configuration
+from connector.metrics import registry
 from connector.v1 import api_bp as api_v1
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-stream = logging.StreamHandler(sys.stdout)
-logger.addHandler(stream)
 
 app = Flask(__name__)
 app.wsgi_app = ProxyFix(app.wsgi_app)
@@ -34,6 +31,9 @@ if __name__ == '__main__':
                            "file and replace PUT_HERE_* values with real "
                            "ones")
 
+    # the metrics files of a previous run would be summed with the new ones
+    registry.clear()
+
     port = int(os.environ.get('PORT', 5000))
 
     app.run(debug=True if Config().loglevel == 'DEBUG' else False,
@@ -0,0 +1,66 @@
+"""Import the tenant to enterprise mappings of existing subscriptions from OA.
+
+Reads the tenant resources of the application page by page, several pages
+concurrently, and stores their ``tenantId`` in the local tenant store. Run
+it once per host after enabling the store or moving ``tenant_store_path``.
+
+    python -m connector.backfill_tenants --controller-uri https://oa.example.com:6308 \\
+        --tenant-type http://box.com/box-connector/tenant/1.0
+"""
+import argparse
+import logging
+import time
+
+from flask import g
+
+from connector.app import app
+from connector.config import Config
+from connector.tenants import tenant_store
+from connector.v1.resources import OA, map_concurrently
+from connector.validator import get_signer
+
+logger = logging.getLogger(__name__)
+
+
+def fetch_tenants(tenant_type, offset, page_size):
+    return OA.send_request('GET', 'aps/2/resources?implementing({}),limit({},{})'.format(
+        tenant_type, offset, page_size), transaction=False)
+
+
+def backfill(tenant_type, page_size=100, concurrency=8):
+    """Store the mappings of all tenants of ``tenant_type``, return the number stored."""
+    stored = 0
+    offset = 0
+    while True:
+        offsets = [offset + i * page_size for i in range(concurrency)]
+        pages = map_concurrently(lambda o: fetch_tenants(tenant_type, o, page_size), offsets)
+        mappings = [(tenant['aps']['id'], tenant.get('tenantId'))
+                    for page in pages for tenant in page
+                    if tenant.get('tenantId') not in (None, 'TBD')]
+        tenant_store.set_many(mappings)
+        stored += len(mappings)
+        if any(len(page) < page_size for page in pages):
+            return stored
+        offset = offsets[-1] + page_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--controller-uri', required=True, help='APS controller endpoint of OA')
+    parser.add_argument('--tenant-type', required=True, help='APS type of the tenant resources')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=Config().oa_concurrency,
+                        help='pages requested at the same time')
+    args = parser.parse_args()
+
+    started = time.time()
+    with app.test_request_context(headers={'Aps-Controller-Uri': args.controller_uri}):
+        g.auth = get_signer(Config().oauth_key)
+        g.reseller_name = 'backfill'
+        stored = backfill(args.tenant_type, args.page_size, args.concurrency)
+    print('{} mappings stored in {} in {:.1f}s'.format(stored, tenant_store.path,
+                                                       time.time() - started))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# all circuit breakers of the process, used for introspection
+breakers = {}
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, breaker):
+        self.upstream = breaker.name
+        self.retry_after = max(1, int(breaker.opened_at + breaker.open_seconds - time.time()))
+        super(CircuitOpenError, self).__init__(
+            "{} is temporarily unavailable, retry in {}s".format(breaker.name, self.retry_after))
+
+
+class CircuitBreaker(object):
+    """Stops calling an upstream that keeps failing.
+
+    The breaker opens when at least ``min_calls`` were made during the last
+    ``window`` seconds and ``failure_rate`` of them failed. While open, calls
+    fail immediately with ``CircuitOpenError``. After ``open_seconds`` one
+    probe call is let through (half-open), its outcome closes or re-opens it.
+    """
+
+    def __init__(self, name, failure_rate=0.5, min_calls=20, window=30, open_seconds=30):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_at = 0
+        self._probing = False
+        # [second, successes, failures]
+        self._buckets = deque()
+        self._lock = threading.Lock()
+        breakers[name] = self
+
+    def _set_state(self, state):
+        if state != self.state:
+            logger.warning("Circuit breaker %s: %s -> %s", self.name, self.state, state)
+            self.state = state
+
+    def _bucket(self, now):
+        second = int(now)
+        if not self._buckets or self._buckets[-1][0] != second:
+            self._buckets.append([second, 0, 0])
+        while self._buckets[0][0] <= second - self.window:
+            self._buckets.popleft()
+        return self._buckets[-1]
+
+    def allow(self):
+        """Raise ``CircuitOpenError`` unless a call may be made now."""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and time.time() - self.opened_at >= self.open_seconds:
+                self._set_state(HALF_OPEN)
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            raise CircuitOpenError(self)
+
+    def record(self, success):
+        with self._lock:
+            now = time.time()
+            if self.state == HALF_OPEN:
+                self._probing = False
+                self._buckets.clear()
+                if success:
+                    self._set_state(CLOSED)
+                else:
+                    self.opened_at = now
+                    self._set_state(OPEN)
+                return
+
+            bucket = self._bucket(now)
+            bucket[1 if success else 2] += 1
+            if self.state == CLOSED and not success:
+                successes = sum(b[1] for b in self._buckets)
+                failures = sum(b[2] for b in self._buckets)
+                calls = successes + failures
+                if calls >= self.min_calls and float(failures) / calls >= self.failure_rate:
+                    self.opened_at = now
+                    self._set_state(OPEN)
+
+    def call(self, send, is_failure=None):
+        """Run ``send()`` through the breaker.
+
+        Exceptions count as failures, so do responses for which
+        ``is_failure(response)`` is true.
+        """
+        self.allow()
+        try:
+            response = send()
+        except Exception:
+            self.record(False)
+            raise
+        self.record(not (is_failure and is_failure(response)))
+        return response
+
+    def stats(self):
+        with self._lock:
+            successes = sum(b[1] for b in self._buckets)
+            failures = sum(b[2] for b in self._buckets)
+        return {'state': self.state,
+                'calls': successes + failures,
+                'failures': failures,
+                'opened_at': self.opened_at or None}
+
+
+def is_server_failure(response):
+    return response.status_code >= 500 or response.status_code == 429
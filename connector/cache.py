@@ -0,0 +1,280 @@
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from connector.config import Config
+
+# all named caches of the process, used for introspection
+caches = {}
+
+_missing = object()
+
+
+class CacheBackend(object):
+    """Base class of cache backends.
+
+    Entries expire after ``ttl`` seconds, ``None`` values are negative
+    results (e.g. an enterprise that is not created yet) and are kept for
+    ``negative_ttl`` seconds only. Hit/miss/eviction counters are per process.
+    """
+
+    def __init__(self, name=None, maxsize=1024, ttl=300, negative_ttl=30):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if name:
+            caches[name] = self
+
+    def _expires_at(self, value, ttl):
+        if ttl is None:
+            ttl = self.negative_ttl if value is None else self.ttl
+        return time.time() + ttl
+
+    def get(self, key, default=None):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def add(self, key, value, ttl=None):
+        """Set ``key`` unless it holds an unexpired value, return whether it was set."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def stats(self):
+        return {'backend': self.backend,
+                'size': len(self),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions}
+
+
+class LRUCache(CacheBackend):
+    """In-process LRU cache."""
+    backend = 'memory'
+
+    def __init__(self, name=None, maxsize=1024, ttl=300, negative_ttl=30):
+        super(LRUCache, self).__init__(name, maxsize, ttl, negative_ttl)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _missing)
+            if item is not _missing:
+                value, expires_at = item
+                if expires_at > time.time():
+                    # move to the most recently used end
+                    del self._data[key]
+                    self._data[key] = item
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        item = (value, self._expires_at(value, ttl))
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = item
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def add(self, key, value, ttl=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[1] > time.time():
+                return False
+            self._data.pop(key, None)
+            self._data[key] = (value, self._expires_at(value, ttl))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache(CacheBackend):
+    """Cache in a local SQLite file, shared by all worker processes of the host.
+
+    Keys and values must be JSON serializable. When the cache is full the
+    entries closest to expiration are evicted first.
+    """
+    backend = 'sqlite'
+
+    def __init__(self, name=None, maxsize=1024, ttl=300, negative_ttl=30, path=None):
+        super(SQLiteCache, self).__init__(name, maxsize, ttl, negative_ttl)
+        self.path = path
+        self.namespace = name or ''
+        self._local = threading.local()
+        with self._transaction() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS cache ('
+                       'namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT, '
+                       'expires_at REAL NOT NULL, PRIMARY KEY (namespace, key))')
+
+    def _conn(self):
+        # connections are neither shared between threads nor inherited over fork()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = connect(self.path)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._conn())
+
+    def get(self, key, default=None):
+        row = self._conn().execute('SELECT value, expires_at FROM cache '
+                                   'WHERE namespace = ? AND key = ?',
+                                   (self.namespace, json.dumps(key))).fetchone()
+        if row is not None and row[1] > time.time():
+            self.hits += 1
+            return json.loads(row[0])
+        self.misses += 1
+        return default
+
+    def set(self, key, value, ttl=None):
+        with self._transaction() as db:
+            db.execute('INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) '
+                       'VALUES (?, ?, ?, ?)',
+                       (self.namespace, json.dumps(key), json.dumps(value),
+                        self._expires_at(value, ttl)))
+            db.execute('DELETE FROM cache WHERE namespace = ? AND expires_at <= ?',
+                       (self.namespace, time.time()))
+            excess = db.execute('SELECT COUNT(*) FROM cache WHERE namespace = ?',
+                                (self.namespace,)).fetchone()[0] - self.maxsize
+            if excess > 0:
+                db.execute('DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache '
+                           'WHERE namespace = ? ORDER BY expires_at LIMIT ?)',
+                           (self.namespace, excess))
+                self.evictions += excess
+
+    def add(self, key, value, ttl=None):
+        with self._transaction() as db:
+            db.execute('DELETE FROM cache WHERE namespace = ? AND key = ? AND expires_at <= ?',
+                       (self.namespace, json.dumps(key), time.time()))
+            return db.execute('INSERT OR IGNORE INTO cache (namespace, key, value, expires_at) '
+                              'VALUES (?, ?, ?, ?)',
+                              (self.namespace, json.dumps(key), json.dumps(value),
+                               self._expires_at(value, ttl))).rowcount == 1
+
+    def delete(self, key):
+        with self._transaction() as db:
+            db.execute('DELETE FROM cache WHERE namespace = ? AND key = ?',
+                       (self.namespace, json.dumps(key)))
+
+    def clear(self):
+        with self._transaction() as db:
+            db.execute('DELETE FROM cache WHERE namespace = ?', (self.namespace,))
+
+    def __len__(self):
+        return self._conn().execute('SELECT COUNT(*) FROM cache '
+                                    'WHERE namespace = ? AND expires_at > ?',
+                                    (self.namespace, time.time())).fetchone()[0]
+
+
+def private_file(path):
+    """Create ``path`` and its directory readable for the owner only, unless they exist."""
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        try:
+            os.makedirs(directory, 0o700)
+        except OSError:
+            # created by another worker meanwhile
+            pass
+    os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+    return path
+
+
+def connect(path):
+    """Connect to the SQLite file at ``path`` in WAL mode, readers do not wait for writers.
+
+    The file may hold tokens and APS requests, it is created with mode 0600.
+    SQLite creates the WAL and shared memory files with the mode of the database.
+    """
+    conn = sqlite3.connect(private_file(path), timeout=10, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+class _Transaction(object):
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+backends = {
+    LRUCache.backend: LRUCache,
+    SQLiteCache.backend: SQLiteCache,
+}
+
+
+def make_cache(name, maxsize=1024, ttl=300, negative_ttl=30):
+    """Create a named cache on the backend selected by ``cache_backend`` in the config."""
+    config = Config()
+    backend = backends[config.cache_backend]
+    if backend is SQLiteCache:
+        return SQLiteCache(name, maxsize, ttl, negative_ttl, path=config.cache_path)
+    return backend(name, maxsize, ttl, negative_ttl)
+
+
+def memoize(cache):
+    """Cache results of ``function(*args)`` in ``cache``.
+
+    The wrapper gets ``invalidate(*args)`` and ``set(value, *args)`` to drop
+    or write through a cached result when the underlying data changes.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args):
+            value = cache.get(args, _missing)
+            if value is _missing:
+                value = function(*args)
+                cache.set(args, value)
+            return value
+
+        # functools.wraps of Python 2 does not set it
+        wrapper.__wrapped__ = function
+        wrapper.cache = cache
+        wrapper.invalidate = lambda *args: cache.delete(args)
+        wrapper.set = lambda value, *args: cache.set(args, value)
+        return wrapper
+
+    return decorator
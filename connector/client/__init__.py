@@ -2,36 +2,100 @@ from marshmallow import Schema, fields
 
 from requests.auth import AuthBase
 
-from connector.config import Config
-
-import requests
+from connector.cache import make_cache
+from connector.config import Config, breaker_options
+from connector.client.token import TokenManager
+from connector.pool import SessionPool
+from connector.retry import RetryBudget, RetryPolicy
 
 config = Config()
 
+# keep-alive sessions to the Box API, shared by all requests of the worker
+box_sessions = SessionPool(pool_size=config.box_pool_size,
+                           connect_timeout=config.box_connect_timeout,
+                           read_timeout=config.box_read_timeout,
+                           retry=RetryPolicy('box',
+                                             max_attempts=config.box_retry_attempts,
+                                             backoff=config.retry_backoff,
+                                             max_backoff=config.retry_max_backoff,
+                                             budget=RetryBudget(config.retry_budget_ratio)),
+                           breaker_name='box',
+                           breaker_options=breaker_options(config))
+
 
 class StorageSchema(Schema):
     usage = fields.Int(load_only=True)
     limit = fields.Int()
 
 
+def no_auth(r):
+    return r
+
+
+def fetch_reseller_token():
+    # headers = {'user-agent': 'my-app/0.0.1'}
+    auth_request_data = {
+            "grant_type": "client_credentials",
+            "client_id": config.box_reseller_client_id,
+            "client_secret": config.box_reseller_client_secret,
+            "box_subject_id": config.box_reseller_id,
+            "box_subject_type": "reseller",
+        }
+
+    # the session of the host is shared with the API client, whose auth waits for this token
+    r = box_sessions.request('POST', config.box_oauth_baseurl + "token", data=auth_request_data,
+                             auth=no_auth)
+
+    data = r.json()
+    return data["access_token"], data.get("expires_in")
+
+
+# the bearer token is written to the cache file only if the workers are to share it
+reseller_tokens = TokenManager(fetch_reseller_token,
+                               store=make_cache('box_token', maxsize=1, ttl=3600)
+                               if config.share_box_token else None,
+                               key=config.box_reseller_id)
+
+
 class BoxAuth(AuthBase):
-    def __init__(self, token):
-        if not token:
-            # headers = {'user-agent': 'my-app/0.0.1'}
-            auth_request_data = {
-                    "grant_type": "client_credentials",
-                    "client_id": config.box_reseller_client_id,
-                    "client_secret": config.box_reseller_client_secret,
-                    "box_subject_id": config.box_reseller_id,
-                    "box_subject_type": "reseller",
-                }
+    """Bearer auth for Box API calls.
+
+    Without an explicit token the current reseller token is taken from
+    ``reseller_tokens`` on every request, so one instance can be shared by
+    a long-lived API client.
+    """
+
+    def __init__(self, token=None):
+        self._token = token
+
+    @property
+    def managed(self):
+        return not self._token
+
+    @property
+    def token(self):
+        return self._token or reseller_tokens.get()
 
-            r = requests.post(config.box_oauth_baseurl + "token", data=auth_request_data)
+    def handle_401(self, r, **kwargs):
+        if r.status_code != 401:
+            return r
 
-            token = r.json()["access_token"]
+        # the token has been revoked or expired earlier than expected,
+        # get a new one through the manager and replay the request once
+        stale_token = r.request.headers['Authorization'][len('Bearer '):]
+        token = reseller_tokens.invalidate(stale_token)
 
-        self.token = token
+        r.content
+        r.close()
+        prep = r.request.copy()
+        prep.headers['Authorization'] = 'Bearer {}'.format(token)
+        _r = r.connection.send(prep, **kwargs)
+        _r.history.append(r)
+        _r.request = prep
+        return _r
 
     def __call__(self, r):
         r.headers['Authorization'] = 'Bearer {}'.format(self.token)
+        if self.managed:
+            r.register_hook('response', self.handle_401)
         return r
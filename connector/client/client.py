@@ -1,6 +1,10 @@
 from marshmallow import Schema, fields, post_load, pre_dump
 
-from connector.client import StorageSchema
+from connector.client.snapshot import enterprises
+from connector.client.serializers import Unsupported, get, integer, missing, text
+from connector.client.pagination import paginate
+from connector.client.usage import usage_collector
+from connector.client.user import User
 
 
 class AdministeredBySchema(Schema):
@@ -42,25 +46,98 @@ class ClientSchema(Schema):
 
     @pre_dump
     def dump_client(self, data):
-        return {k: v for k, v in data.__dict__.items() if v}
+        return {k: getattr(data, k) for k in Client.__slots__ if getattr(data, k)}
+
+
+client_schema = ClientSchema()
+
+
+# fields dumped as text when they are set, in addition to name
+_client_text_fields = ('plan_code', 'billing_cycle', 'subdomain', 'active_status')
+
+
+def dump_client(client):
+    """Same output as ``ClientSchema().dump(client).data`` for the usual attribute types."""
+    try:
+        result = {}
+        for name in ('name',) + _client_text_fields:
+            value = getattr(client, name)
+            if value:
+                result[name] = text(value)
+        if client.users_limit:
+            result['seats'] = integer(client.users_limit)
+        if client.trial:
+            if client.trial is not True:
+                raise Unsupported()
+            result['deal_status'] = 'trial'
+        if client.trial_end_at:
+            raise Unsupported()
+        administered_by = client.administered_by
+        if administered_by:
+            if isinstance(administered_by, dict):
+                result['administered_by'] = {k: text(administered_by[k], allow_none=True)
+                                             for k in ('name', 'phone', 'login')
+                                             if k in administered_by}
+            else:
+                result['administered_by'] = {
+                    'name': text(administered_by.name, allow_none=True),
+                    'phone': text(administered_by.phone, allow_none=True),
+                    'login': text(administered_by.login, allow_none=True)}
+        return result
+    except (Unsupported, AttributeError):
+        return client_schema.dump(client).data
+
+
+def load_client(result):
+    """Same ``Client`` as ``ClientSchema().load(result).data`` for well-formed Box responses."""
+    try:
+        data = {'name': text(result['name'])}
+        users_limit = get(result, 'users_limit', 'seats')
+        if users_limit is missing:
+            raise Unsupported()
+        data['users_limit'] = integer(users_limit)
+        users_amount = get(result, 'users_amount', 'seats_used')
+        if users_amount is not missing:
+            data['users_amount'] = integer(users_amount)
+        trial = get(result, 'trial', 'deal_status')
+        if trial is not missing:
+            if trial is None:
+                raise Unsupported()
+            data['trial'] = trial == 'trial'
+        if result.get('trial_end_at', missing) not in (missing, None):
+            raise Unsupported()
+        if 'trial_end_at' in result:
+            data['trial_end_at'] = None
+        for name in ('billing_cycle', 'subdomain', 'active_status'):
+            if name in result:
+                data[name] = text(result[name], allow_none=name != 'billing_cycle')
+        enterprise_id = get(result, 'enterprise_id', 'id')
+        if enterprise_id is not missing:
+            data['enterprise_id'] = text(enterprise_id)
+
+        administered_by = result['administered_by']
+        loaded = {'name': text(administered_by['name']),
+                  'login': text(administered_by['login'])}
+        if 'phone' in administered_by:
+            loaded['phone'] = text(administered_by['phone'], allow_none=True)
+        user_id = get(administered_by, 'user_id', 'id')
+        if user_id is not missing:
+            loaded['user_id'] = text(user_id)
+        data['administered_by'] = loaded
+    except (Unsupported, KeyError, TypeError, AttributeError):
+        return client_schema.load(result).data
+    return Client(**data)
 
 
 class Client(object):
-    reseller = None
-    name = None
-    users_amount = None
-    users_limit = 10
-    enterprise_id = None
-    plan_code = None
-    billing_cycle = None
-    administered_by = None
-    trial = None
-    active_status = None
+    __slots__ = ('reseller', 'name', 'users_amount', 'users_limit', 'trial', 'trial_end_at',
+                 'plan_code', 'billing_cycle', 'subdomain', 'administered_by', 'enterprise_id',
+                 'active_status')
 
     def __init__(self, reseller=None, name=None, users_amount=None, users_limit=10,
                  trial=None, trial_end_at=None,
                  plan_code=None, billing_cycle='monthly',
-                 subdomain=None, administered_by=None, enterprise_id=None, active_status = None):
+                 subdomain=None, administered_by=None, enterprise_id=None, active_status=None):
         self.reseller = reseller
         self.name = name
         self.users_amount = users_amount
@@ -72,40 +149,67 @@ class Client(object):
         self.subdomain = subdomain
         self.administered_by = administered_by
         self.active_status = active_status
-        if enterprise_id:
-            self.enterprise_id = enterprise_id
+        self.enterprise_id = enterprise_id or None
 
     def api(self):
         return self.reseller.api()
 
+    def users(self, page_size=100):
+        """Iterate over the users of the enterprise as ``User`` objects.
+
+        The first page is requested right away, so e.g. a missing enterprise
+        raises here and not on the first iteration.
+        """
+        entries = paginate(self.api().enterprises(self.enterprise_id).users.get, page_size)
+        return (self._user(entry) for entry in entries)
+
+    def _user(self, entry):
+        user = User(self)
+        user.load(entry)
+        return user
+
     def __repr__(self):
         return '<Client(id={} name={})>'.format(self.enterprise_id, self.name)
 
     @property
     def _dump(self):
-        return ClientSchema().dump(self).data
+        return dump_client(self)
 
     def create(self, administered_by):
         api = self.api()
         self.administered_by = administered_by
         result = api.enterprises.post(self._dump)
         self.load(result)
+        enterprises.put(self.enterprise_id, result)
         return result
 
     def update(self):
-        return self.api().enterprises(self.enterprise_id).put(self._dump)
+        result = self.api().enterprises(self.enterprise_id).put(self._dump)
+        enterprises.put(self.enterprise_id, result)
+        return result
 
     def load(self, result):
-        c = ClientSchema().load(result).data
-        self.__init__(self.reseller, name=c.name, users_amount=c.users_amount, users_limit=c.users_limit,
-                      trial=c.trial, trial_end_at=c.trial_end_at,
+        c = load_client(result)
+        self.__init__(self.reseller, name=c.name, users_amount=c.users_amount,
+                      users_limit=c.users_limit, trial=c.trial, trial_end_at=c.trial_end_at,
                       plan_code=c.plan_code, billing_cycle=c.plan_code,
-                      subdomain=c.subdomain, administered_by=c.administered_by, enterprise_id=c.enterprise_id)
+                      subdomain=c.subdomain, administered_by=c.administered_by,
+                      enterprise_id=c.enterprise_id or self.enterprise_id)
+
+    def fetch(self):
+        return self.api().enterprises(self.enterprise_id).get()
 
-    def refresh(self):
+    def refresh(self, field=None):
+        """Load the enterprise from Box.
+
+        With ``field`` an enterprise snapshot is used as long as that field is
+        recent enough, see ``EnterpriseSnapshots``.
+        """
         if self.enterprise_id:
-            api = self.api()
-            result = api.enterprises(self.enterprise_id).get()
+            if field:
+                result = enterprises.get(self.enterprise_id, field, self.fetch)
+            else:
+                result = enterprises.put(self.enterprise_id, self.fetch())
             self.load(result)
 
     def delete(self):
@@ -113,4 +217,6 @@ class Client(object):
         if self.enterprise_id:
             api = self.api()
             result = api.enterprises(self.enterprise_id).put()
+            enterprises.invalidate(self.enterprise_id)
+            usage_collector.invalidate(self.enterprise_id)
             return result
@@ -0,0 +1,50 @@
+from connector.client import config
+from connector.pool import LazyExecutor
+
+# fetches the next page of every open iterator while the current one is consumed
+prefetch_pool = LazyExecutor(config.bulk_concurrency)
+
+
+def next_page_params(page, offset, page_size):
+    """Return the query of the page following ``page``, ``None`` after the last one.
+
+    Box collections either page with ``next_marker`` or with ``offset`` and
+    ``total_count``, ``offset`` is the number of entries read so far.
+    """
+    entries = page.get('entries') or []
+    if 'next_marker' in page:
+        return {'limit': page_size, 'marker': page['next_marker']} if page['next_marker'] else None
+    if entries and offset < (page.get('total_count') or 0):
+        return {'limit': page_size, 'offset': offset}
+    return None
+
+
+def paginate(fetch_page, page_size=100, params=None, pool=prefetch_pool):
+    """Iterate over the entries of a Box collection.
+
+    ``fetch_page(**query)`` returns one page. The first page is fetched
+    before this returns, so errors are raised to the caller and not in the
+    middle of the iteration. Later pages are fetched in ``pool`` while the
+    previous one is consumed, at most two pages are held at a time.
+    """
+    query = dict(params or {}, limit=page_size)
+    first_page = fetch_page(**query)
+
+    def entries(page):
+        offset = 0
+        while page is not None:
+            offset += len(page.get('entries') or [])
+            next_query = next_page_params(page, offset, page_size)
+            next_page = None
+            if next_query is not None:
+                next_page = pool.submit(fetch_page, **dict(query, **next_query))
+            try:
+                for entry in page.get('entries') or []:
+                    yield entry
+                page = next_page.result() if next_page is not None else None
+            finally:
+                # the iteration may be abandoned, e.g. by a disconnected client
+                if next_page is not None:
+                    next_page.cancel()
+
+    return entries(first_page)
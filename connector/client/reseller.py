@@ -1,28 +1,68 @@
+import threading
+
 import slumber
 
-from marshmallow import Schema, fields, post_load, pre_dump
+from connector.client import BoxAuth, box_sessions, reseller_tokens
+from connector.client import config
+from connector.client.pagination import paginate
 
-from slumber.exceptions import HttpNotFoundError
+_apis = {}
+_apis_lock = threading.Lock()
 
-from connector.client import BoxAuth, StorageSchema
-from connector.client import config
+
+def box_api(token=None):
+    """Return the Box API client for the configured reseller credentials.
+
+    The client is built once per credential set and reused by every
+    Reseller, Client and User of the worker, all requests go through the
+    keep-alive session of ``box_sessions``. Explicit tokens get a client of
+    their own since slumber binds auth to the session.
+    """
+    if token:
+        session = box_sessions.make_session(box_sessions.base_url(config.box_baseurl))
+        return slumber.API(config.box_baseurl, auth=BoxAuth(token), session=session)
+
+    key = (config.box_baseurl, config.box_reseller_client_id, config.box_reseller_id)
+    api = _apis.get(key)
+    if api is None:
+        with _apis_lock:
+            api = _apis.get(key)
+            if api is None:
+                api = _apis[key] = slumber.API(config.box_baseurl, auth=BoxAuth(),
+                                               session=box_sessions.session(config.box_baseurl))
+    return api
 
 
 class Reseller(object):
     token = None
 
-
     def __init__(self, token=None):
         self.token = token
+        self.managed = not token
 
     def api(self, token=None):
-        token = token if token else self.token
-        auth = BoxAuth(token)
-        self.token = auth.token
-        return slumber.API(config.box_baseurl, auth=auth)
+        if token:
+            return box_api(token)
+        if not self.managed:
+            return box_api(self.token)
+        api = box_api()
+        self.token = reseller_tokens.get()
+        return api
 
     def __repr__(self):
         return '<Reseller>'
 
     def refresh(self):
-        self.api()
\ No newline at end of file
+        self.api()
+
+    def enterprises(self, page_size=100):
+        """Iterate over the enterprises of the reseller as ``Client`` objects."""
+        # connector.client.client imports this module through the usage collector
+        from connector.client.client import Client
+
+        def load(entry):
+            client = Client(self, enterprise_id=entry['id'])
+            client.load(entry)
+            return client
+
+        return (load(entry) for entry in paginate(self.api().enterprises.get, page_size))
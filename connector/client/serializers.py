@@ -0,0 +1,34 @@
+"""Helpers of the hand-written serializers of Box objects.
+
+They convert values the way the marshmallow 2 fields do and raise
+``Unsupported`` for anything else, the caller then falls back to the schema.
+"""
+from marshmallow.compat import basestring
+from marshmallow.utils import ensure_text_type
+
+
+class Unsupported(Exception):
+    """Raised by the fast serializers for data only the marshmallow schema handles."""
+
+
+missing = object()
+
+
+def text(value, allow_none=False):
+    if value is None and allow_none:
+        return None
+    if not isinstance(value, basestring):
+        raise Unsupported()
+    return ensure_text_type(value)
+
+
+def integer(value):
+    if type(value) is not int:
+        raise Unsupported()
+    return value
+
+
+def get(data, name, load_from):
+    """The raw value of a field, looked up like marshmallow 2 does."""
+    value = data.get(name, missing)
+    return data.get(load_from, missing) if value is missing else value
@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+
+from connector.cache import make_cache
+from connector.client import config
+from connector.pool import LazyExecutor
+
+logger = logging.getLogger(__name__)
+
+FRESH = 'fresh'
+STALE = 'stale'
+MISSING = 'missing'
+
+
+class EnterpriseSnapshots(object):
+    """Box enterprise responses by enterprise id, with a refresh time.
+
+    A snapshot serves a field while it is younger than ``max_age[field]``
+    seconds. For another ``stale_grace`` seconds it is still served, but
+    refreshed in the background; older snapshots are fetched synchronously.
+    Fields without a max age are always fetched.
+
+    Writes to Box go through ``put``, ``adjust_users`` and ``invalidate``.
+    With a cache shared between processes concurrent user counter updates
+    may get lost, the max age of ``users_amount`` bounds the error.
+    """
+
+    def __init__(self, cache, max_age, stale_grace, executor=None):
+        self.cache = cache
+        self.max_age = max_age
+        self.stale_grace = stale_grace
+        self.executor = executor or LazyExecutor(2)
+        self.stale_served = 0
+        self.refreshes = 0
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def lookup(self, enterprise_id, field):
+        """Return the snapshot of ``enterprise_id``, FRESH or STALE for ``field``, or MISSING."""
+        entry = self.cache.get(enterprise_id)
+        if entry is None:
+            return None, MISSING
+        fetched_at, response = entry
+        age = time.time() - fetched_at
+        max_age = self.max_age.get(field)
+        if max_age is None or age > max_age + self.stale_grace:
+            return None, MISSING
+        return response, FRESH if age <= max_age else STALE
+
+    def get(self, enterprise_id, field, fetch):
+        """Return the enterprise response, ``fetch()`` it if the snapshot cannot serve ``field``."""
+        response, state = self.lookup(enterprise_id, field)
+        if state == MISSING:
+            return self.put(enterprise_id, fetch())
+        if state == STALE:
+            self.stale_served += 1
+            self.refresh_later(enterprise_id, fetch)
+        return response
+
+    def refresh_later(self, enterprise_id, fetch):
+        if self.claim_refresh(enterprise_id):
+            self.executor.submit(self._refresh, enterprise_id, fetch)
+
+    def _refresh(self, enterprise_id, fetch):
+        response = None
+        try:
+            response = fetch()
+        except Exception:
+            logger.exception("Background refresh of enterprise %s failed", enterprise_id)
+        finally:
+            self.refreshed(enterprise_id, response)
+
+    def claim_refresh(self, enterprise_id):
+        """Return whether the caller should refresh the snapshot, one refresh runs at a time."""
+        with self._lock:
+            if enterprise_id in self._refreshing:
+                return False
+            self._refreshing.add(enterprise_id)
+            return True
+
+    def refreshed(self, enterprise_id, response):
+        """Store the result of a claimed refresh, ``None`` if it failed."""
+        if response is not None:
+            self.put(enterprise_id, response)
+            self.refreshes += 1
+        with self._lock:
+            self._refreshing.discard(enterprise_id)
+
+    def put(self, enterprise_id, response):
+        if enterprise_id and isinstance(response, dict):
+            with self._lock:
+                self.cache.set(enterprise_id, [time.time(), response])
+        return response
+
+    def adjust_users(self, enterprise_id, delta):
+        """Account for a user created (``delta=1``) or deleted (``delta=-1``) in Box."""
+        with self._lock:
+            entry = self.cache.get(enterprise_id)
+            if entry is None:
+                return
+            fetched_at, response = entry
+            if response.get('seats_used') is not None:
+                response['seats_used'] = max(0, response['seats_used'] + delta)
+                self.cache.set(enterprise_id, [fetched_at, response])
+
+    def invalidate(self, enterprise_id):
+        with self._lock:
+            self.cache.delete(enterprise_id)
+
+    def stats(self):
+        return {'stale_served': self.stale_served,
+                'background_refreshes': self.refreshes,
+                'refreshing': len(self._refreshing)}
+
+
+enterprises = EnterpriseSnapshots(
+    make_cache('enterprise', maxsize=config.enterprise_cache_size,
+               ttl=max(config.enterprise_max_age.values()) + config.enterprise_stale_grace),
+    max_age=config.enterprise_max_age,
+    stale_grace=config.enterprise_stale_grace)
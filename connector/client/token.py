@@ -0,0 +1,130 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TokenManager(object):
+    """Process-wide holder of an OAuth access token.
+
+    The token is cached together with its expiry time and is refreshed by a
+    background timer ``refresh_margin`` seconds before it expires. Only one
+    caller refreshes at a time, concurrent callers wait for that refresh and
+    reuse its result.
+
+    With a shared ``store`` (see ``connector.cache``) a token obtained by one
+    worker process is picked up by the others instead of fetching their own.
+    """
+    refresh_margin = 300
+    default_expires_in = 3600
+
+    def __init__(self, fetch, refresh_margin=None, store=None, key='token'):
+        # fetch() must return an (access_token, expires_in) tuple
+        self._fetch = fetch
+        self._store = store
+        self._key = key
+        if refresh_margin is not None:
+            self.refresh_margin = refresh_margin
+        self._cond = threading.Condition(threading.Lock())
+        self._token = None
+        self._expires_at = 0
+        self._refreshing = False
+        self._timer = None
+        self.refresh_count = 0
+
+    @property
+    def token(self):
+        return self._token
+
+    def _is_valid(self):
+        return self._token is not None and time.time() < self._expires_at
+
+    def get(self):
+        with self._cond:
+            if self._is_valid():
+                return self._token
+            return self._refresh(self._token)
+
+    def invalidate(self, stale_token):
+        """Force a refresh after the upstream rejected ``stale_token`` (e.g. on 401).
+
+        If another caller has already replaced the stale token, the new one is
+        returned without hitting the token endpoint again.
+        """
+        with self._cond:
+            if self._token is not None and self._token != stale_token:
+                return self._token
+            self._expires_at = 0
+            return self._refresh(stale_token)
+
+    def clear(self):
+        with self._cond:
+            self._cancel_timer()
+            self._token = None
+            self._expires_at = 0
+
+    def _refresh(self, stale_token):
+        # must be called with self._cond held
+        while self._refreshing:
+            self._cond.wait()
+        if self._token != stale_token and self._is_valid():
+            # somebody else has refreshed the token while we were waiting
+            return self._token
+
+        self._refreshing = True
+        self._cond.release()
+        try:
+            token, expires_at = self._load_shared(stale_token) or self._fetch_new()
+        finally:
+            self._cond.acquire()
+            self._refreshing = False
+            self._cond.notify_all()
+
+        self._token = token
+        self._expires_at = expires_at
+        self._schedule(expires_at - time.time())
+        return token
+
+    def _load_shared(self, stale_token):
+        if self._store is None:
+            return None
+        shared = self._store.get(self._key)
+        if not shared:
+            return None
+        token, expires_at = shared
+        if token == stale_token or expires_at - time.time() <= self.refresh_margin:
+            return None
+        return token, expires_at
+
+    def _fetch_new(self):
+        token, expires_in = self._fetch()
+        expires_in = int(expires_in or self.default_expires_in)
+        expires_at = time.time() + expires_in
+        self.refresh_count += 1
+        if self._store is not None:
+            self._store.set(self._key, [token, expires_at], ttl=expires_in)
+        return token, expires_at
+
+    def _cancel_timer(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+    def _schedule(self, expires_in):
+        self._cancel_timer()
+        delay = expires_in - self.refresh_margin
+        if delay <= 0:
+            return
+        self._timer = threading.Timer(delay, self._background_refresh, args=(self._token,))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self, stale_token):
+        try:
+            with self._cond:
+                if self._token == stale_token:
+                    self._refresh(stale_token)
+        except Exception:
+            # the token stays usable until it expires, callers will refresh it on demand
+            logger.exception("Background token refresh failed")
@@ -0,0 +1,126 @@
+import logging
+import os
+import threading
+import time
+
+from connector.cache import make_cache
+from connector.client import config
+from connector.client.reseller import box_api
+
+logger = logging.getLogger(__name__)
+
+
+def fetch_enterprises(offset, limit):
+    return box_api().enterprises.get(offset=offset, limit=limit)
+
+
+class UsageCollector(object):
+    """Records ``seats_used`` of every enterprise of the reseller in the background.
+
+    Every ``interval`` seconds one worker, the one taking the lease in
+    ``state``, walks the paginated enterprise list of Box with at most
+    ``rate`` page requests per second and stores ``[collected_at, seats_used]``
+    per enterprise in ``usage``. The offset of the next page is kept in
+    ``state`` as well, so a walk interrupted by an error or a restart
+    continues where it stopped. Entries older than ``max_age`` seconds are
+    not served.
+    """
+
+    def __init__(self, usage, state, interval, page_size=100, rate=2, max_age=3600,
+                 fetch_page=fetch_enterprises):
+        self.usage = usage
+        self.state = state
+        self.interval = interval
+        self.page_size = page_size
+        self.rate = rate
+        self.max_age = max_age
+        self.fetch_page = fetch_page
+        self.pages = 0
+        self.errors = 0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        # like the log writer, a forked worker has to start a thread of its own
+        if self.interval and self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    thread = threading.Thread(target=self._run, name='usage-collector')
+                    thread.daemon = True
+                    thread.start()
+                    self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            try:
+                self.collect()
+            except Exception:
+                self.errors += 1
+                logger.exception("Collecting enterprise usage failed")
+            time.sleep(self.interval)
+
+    def collect(self):
+        """Walk the enterprises unless another worker did within ``interval``, return if it did."""
+        if not self.state.add('lease', os.getpid(), ttl=self.interval):
+            return False
+
+        walk = self.state.get('walk') or {'started_at': time.time(), 'offset': 0}
+        next_request = 0
+        while True:
+            time.sleep(max(0, next_request - time.time()))
+            next_request = time.time() + 1.0 / self.rate
+            page = self.fetch_page(walk['offset'], self.page_size)
+            self.pages += 1
+
+            collected_at = time.time()
+            entries = page.get('entries') or []
+            for enterprise in entries:
+                if enterprise.get('seats_used') is not None:
+                    self.usage.set(enterprise['id'], [collected_at, enterprise['seats_used']])
+
+            walk['offset'] += len(entries)
+            if not entries or walk['offset'] >= page.get('total_count', 0):
+                break
+            self.state.set('walk', walk, ttl=self.max_age)
+            self.state.set('lease', os.getpid(), ttl=self.interval)
+
+        self.state.delete('walk')
+        self.state.set('last_walk', {'started_at': walk['started_at'],
+                                     'duration': time.time() - walk['started_at'],
+                                     'enterprises': walk['offset']}, ttl=self.max_age)
+        return True
+
+    def get(self, enterprise_id):
+        """Return the collected ``seats_used`` of the enterprise, ``None`` if unknown or too old."""
+        entry = self.usage.get(enterprise_id)
+        if entry is None or time.time() - entry[0] > self.max_age:
+            return None
+        return entry[1]
+
+    def adjust(self, enterprise_id, delta):
+        """Account for a user created (``delta=1``) or deleted (``delta=-1``) in Box."""
+        entry = self.usage.get(enterprise_id)
+        if entry is not None:
+            self.usage.set(enterprise_id, [entry[0], max(0, entry[1] + delta)])
+
+    def invalidate(self, enterprise_id):
+        self.usage.delete(enterprise_id)
+
+    def stats(self):
+        last_walk = self.state.get('last_walk') or {}
+        started_at = last_walk.get('started_at')
+        return {'enabled': bool(self.interval),
+                'enterprises': last_walk.get('enterprises'),
+                'snapshot_age': time.time() - started_at if started_at else None,
+                'last_walk_duration': last_walk.get('duration'),
+                'pages': self.pages,
+                'errors': self.errors}
+
+
+usage_collector = UsageCollector(
+    make_cache('enterprise_usage', maxsize=config.enterprise_cache_size, ttl=config.usage_max_age),
+    make_cache('usage_collector', maxsize=16, ttl=config.usage_max_age),
+    interval=config.usage_collect_interval,
+    page_size=config.usage_page_size,
+    rate=config.usage_collect_rate,
+    max_age=config.usage_max_age)
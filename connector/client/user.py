@@ -1,6 +1,8 @@
-from marshmallow import Schema, fields, post_load, pre_dump
+from marshmallow import Schema, ValidationError, fields, post_load, pre_dump, validate
 
-from connector.client import StorageSchema
+from connector.client.snapshot import enterprises
+from connector.client.serializers import Unsupported, get, integer, missing, text
+from connector.client.usage import usage_collector
 
 
 class EnterpriseSchema(Schema):
@@ -36,30 +38,73 @@ class UserSchema(Schema):
 
     @pre_dump
     def dump_user(self, data):
-        d = {k: v for k, v in data.__dict__.items() if v}
+        d = {k: getattr(data, k) for k in User.__slots__ if getattr(data, k)}
         d['enterprise'] = {'enterprise_id': data.client.enterprise_id}
         return d
 
 
+user_schema = UserSchema()
+validate_email = validate.Email()
+
+# text fields of users, the ones that may be null in Box responses are True
+_user_text_fields = {'name': False, 'language': False, 'timezone': False, 'status': False,
+                     'job_title': True, 'phone': True, 'address': True}
+
+
+def dump_user(user):
+    """Same output as ``UserSchema().dump(user).data`` for the usual attribute types."""
+    try:
+        result = {}
+        if user.login:
+            result['login'] = validate_email(text(user.login))
+        for name in _user_text_fields:
+            value = getattr(user, name)
+            if value:
+                result[name] = text(value)
+        if user.space_amount:
+            result['space_amount'] = integer(user.space_amount)
+        enterprise_id = user.client.enterprise_id
+        result['enterprise'] = {'id': None if enterprise_id is None else int(text(enterprise_id))}
+        return result
+    except (Unsupported, ValidationError, ValueError, AttributeError):
+        return user_schema.dump(user).data
+
+
+def load_user(result):
+    """Same ``User`` as ``UserSchema().load(result).data`` for well-formed Box responses."""
+    try:
+        if 'role' in result or 'admin' in result:
+            # left to the schema, a 'role' even makes it fail as User takes no such argument
+            raise Unsupported()
+        data = {'login': validate_email(text(result['login'])),
+                'name': text(result['name'])}
+        for name, allow_none in _user_text_fields.items():
+            if name in result and name != 'name':
+                data[name] = text(result[name], allow_none=allow_none)
+        if 'space_amount' in result:
+            data['space_amount'] = integer(result['space_amount'])
+        for name in ('can_see_managed_users', 'is_sync_enabled'):
+            if name in result:
+                if type(result[name]) is not bool:
+                    raise Unsupported()
+                data[name] = result[name]
+        user_id = get(result, 'user_id', 'id')
+        if user_id is not missing:
+            data['user_id'] = text(user_id)
+    except (Unsupported, ValidationError, KeyError, TypeError, AttributeError):
+        return user_schema.load(result).data
+    return User(**data)
+
+
 class User(object):
-    client = None
-    login = None
-    name = None
-    admin = False
-    can_see_managed_users = None
-    space_amount = 0
-    is_sync_enabled = True
-    language = "en"
-    job_title = None
-    phone = None
-    address = None
-    timezone = 'Australia/Melbourne'
-    status = None
-    user_id = None
-
-    def __init__(self, client=None, name=None, login=None, admin=False, space_amount=0, status=None, user_id=None,
-                 phone=None, address=None, can_see_managed_users=None, is_sync_enabled=True, language='en',
-                 job_title=None, timezone='Australia/Melbourne'):
+    __slots__ = ('client', 'login', 'name', 'admin', 'can_see_managed_users', 'space_amount',
+                 'is_sync_enabled', 'language', 'job_title', 'phone', 'address', 'timezone',
+                 'status', 'user_id')
+
+    def __init__(self, client=None, name=None, login=None, admin=False, space_amount=0,
+                 status=None, user_id=None, phone=None, address=None, can_see_managed_users=None,
+                 is_sync_enabled=True, language='en', job_title=None,
+                 timezone='Australia/Melbourne'):
         self.client = client
         self.login = login
         self.name = name
@@ -67,8 +112,7 @@ class User(object):
         self.can_see_managed_users = can_see_managed_users
         self.space_amount = space_amount
         self.status = status
-        if user_id:
-            self.user_id = user_id
+        self.user_id = user_id or None
         self.phone = phone
         self.address = address
         self.is_sync_enabled = is_sync_enabled
@@ -84,12 +128,14 @@ class User(object):
 
     @property
     def _dump(self):
-        return UserSchema().dump(self).data
+        return dump_user(self)
 
     def create(self):
         api = self.api()
         result = api.users.post(self._dump)
         self.load(result)
+        enterprises.adjust_users(self.client.enterprise_id, 1)
+        usage_collector.adjust(self.client.enterprise_id, 1)
         return result
 
     def update(self):
@@ -101,15 +147,19 @@ class User(object):
         self.load(result)
 
     def load(self, result):
-        u = UserSchema().load(result).data
-        self.__init__(self.client, name=u.name, login=u.login, admin=u.admin, space_amount=u.space_amount,
-                status=u.status, user_id=u.user_id, phone=u.phone, address=u.address,
-                can_see_managed_users=u.can_see_managed_users, is_sync_enabled=u.is_sync_enabled,
-                language=u.language, job_title=u.job_title, timezone=u.timezone)
+        u = load_user(result)
+        self.__init__(self.client, name=u.name, login=u.login, admin=u.admin,
+                      space_amount=u.space_amount, status=u.status,
+                      user_id=u.user_id or self.user_id, phone=u.phone, address=u.address,
+                      can_see_managed_users=u.can_see_managed_users,
+                      is_sync_enabled=u.is_sync_enabled, language=u.language,
+                      job_title=u.job_title, timezone=u.timezone)
 
     def delete(self):
         api = self.api()
         result = api.users(self.user_id).delete()
+        enterprises.adjust_users(self.client.enterprise_id, -1)
+        usage_collector.adjust(self.client.enterprise_id, -1)
         return result
 
     def token(self):
@@ -1,12 +1,16 @@
 import json
 import os
 import logging
-import sys
 
-logger = logging.getLogger(__file__)
-logger.setLevel(logging.DEBUG)
-stream = logging.StreamHandler(sys.stdout)
-logger.addHandler(stream)
+logger = logging.getLogger(__name__)
+
+
+def breaker_options(config):
+    return {'failure_rate': config.breaker_failure_rate,
+            'min_calls': config.breaker_min_calls,
+            'window': config.breaker_window,
+            'open_seconds': config.breaker_open_seconds}
+
 
 def check_configuration(config):
     for item in (
@@ -37,6 +41,53 @@ class Config(object):
     oauth_signature = None
     tenant_type_resource = None
     tenant_type_map = None
+    oa_pool_size = None
+    oa_connect_timeout = None
+    oa_read_timeout = None
+    oa_concurrency = None
+    bulk_concurrency = None
+    box_pool_size = None
+    box_connect_timeout = None
+    box_read_timeout = None
+    retry_backoff = None
+    retry_max_backoff = None
+    retry_budget_ratio = None
+    box_retry_attempts = None
+    breaker_failure_rate = None
+    breaker_min_calls = None
+    breaker_window = None
+    breaker_open_seconds = None
+    log_queue_size = None
+    log_body_limit = None
+    log_sample_rate = None
+    log_sample_rates = None
+    data_dir = None
+    cache_backend = None
+    cache_path = None
+    share_box_token = None
+    tenant_cache_size = None
+    tenant_cache_ttl = None
+    tenant_cache_negative_ttl = None
+    enterprise_cache_size = None
+    enterprise_max_age = None
+    enterprise_stale_grace = None
+    usage_collect_interval = None
+    usage_collect_rate = None
+    usage_page_size = None
+    usage_max_age = None
+    users_page_size = None
+    async_provisioning = None
+    job_queue_path = None
+    job_queue_size = None
+    job_workers = None
+    job_timeout = None
+    job_retry_timeout = None
+    idempotency_cache_size = None
+    idempotency_ttl = None
+    tenant_store_path = None
+    metrics_dir = None
+    metrics_flush_interval = None
+    metrics_token = None
 
     def __init__(self):
         if not Config.users_resource:
@@ -50,6 +101,61 @@ class Config(object):
         with open(Config.conf_file, 'r') as c:
             config = json.load(c)
             Config.loglevel = config.get('loglevel', 'DEBUG')
+            logging.getLogger('connector').setLevel(Config.loglevel)
+            Config.oa_pool_size = config.get('oa_pool_size', 10)
+            Config.oa_connect_timeout = config.get('oa_connect_timeout', 5)
+            Config.oa_read_timeout = config.get('oa_read_timeout', 50)
+            Config.oa_concurrency = config.get('oa_concurrency', 8)
+            Config.bulk_concurrency = config.get('bulk_concurrency', 8)
+            Config.box_pool_size = config.get('box_pool_size', 10)
+            Config.box_connect_timeout = config.get('box_connect_timeout', 5)
+            Config.box_read_timeout = config.get('box_read_timeout', 60)
+            Config.retry_backoff = config.get('retry_backoff', 0.1)
+            Config.retry_max_backoff = config.get('retry_max_backoff', 2.0)
+            Config.retry_budget_ratio = config.get('retry_budget_ratio', 0.2)
+            Config.box_retry_attempts = config.get('box_retry_attempts', 3)
+            Config.breaker_failure_rate = config.get('breaker_failure_rate', 0.5)
+            Config.breaker_min_calls = config.get('breaker_min_calls', 20)
+            Config.breaker_window = config.get('breaker_window', 30)
+            Config.breaker_open_seconds = config.get('breaker_open_seconds', 30)
+            Config.log_queue_size = config.get('log_queue_size', 10000)
+            Config.log_body_limit = config.get('log_body_limit', 4096)
+            Config.log_sample_rate = config.get('log_sample_rate', 1.0)
+            Config.log_sample_rates = config.get('log_sample_rates', {})
+            # local state of the connector, next to the config file rather than in a shared /tmp
+            Config.data_dir = config.get('data_dir', os.path.join(
+                os.path.dirname(os.path.abspath(Config.conf_file)), 'data'))
+            Config.cache_backend = config.get('cache_backend', 'memory')
+            Config.cache_path = config.get('cache_path',
+                                           os.path.join(Config.data_dir, 'cache.sqlite'))
+            Config.share_box_token = config.get('share_box_token', False)
+            Config.tenant_cache_size = config.get('tenant_cache_size', 10000)
+            Config.tenant_cache_ttl = config.get('tenant_cache_ttl', 3600)
+            Config.tenant_cache_negative_ttl = config.get('tenant_cache_negative_ttl', 30)
+            Config.enterprise_cache_size = config.get('enterprise_cache_size', 10000)
+            Config.enterprise_max_age = dict({'users_amount': 300, 'users_limit': 3600,
+                                              'administered_by': 86400},
+                                             **config.get('enterprise_max_age', {}))
+            Config.enterprise_stale_grace = config.get('enterprise_stale_grace', 3600)
+            Config.usage_collect_interval = config.get('usage_collect_interval', 0)
+            Config.usage_collect_rate = config.get('usage_collect_rate', 2)
+            Config.usage_page_size = config.get('usage_page_size', 100)
+            Config.usage_max_age = config.get('usage_max_age', 3600)
+            Config.users_page_size = config.get('users_page_size', 100)
+            Config.async_provisioning = config.get('async_provisioning', False)
+            Config.job_queue_path = config.get('job_queue_path',
+                                               os.path.join(Config.data_dir, 'jobs.sqlite'))
+            Config.job_queue_size = config.get('job_queue_size', 100)
+            Config.job_workers = config.get('job_workers', 2)
+            Config.job_timeout = config.get('job_timeout', 600)
+            Config.job_retry_timeout = config.get('job_retry_timeout', 30)
+            Config.idempotency_cache_size = config.get('idempotency_cache_size', 10000)
+            Config.idempotency_ttl = config.get('idempotency_ttl', 3600)
+            Config.tenant_store_path = config.get('tenant_store_path',
+                                                  os.path.join(Config.data_dir, 'tenants.sqlite'))
+            Config.metrics_dir = config.get('metrics_dir', os.path.join(Config.data_dir, 'metrics'))
+            Config.metrics_flush_interval = config.get('metrics_flush_interval', 5)
+            Config.metrics_token = config.get('metrics_token')
 
             try:
                 Config.users_resource = config['users_resource']
@@ -75,6 +181,7 @@ class Config(object):
             try:
                 tmap = config['tenant_types_map']
             except KeyError as e:
-                logger.info("Tenant types map is missed in the config file, using default one ({})".format(e))
+                logger.info("Tenant types map is missed in the config file, "
+                            "using default one ({})".format(e))
             finally:
-                Config.tenant_type_map = tmap
\ No newline at end of file
+                Config.tenant_type_map = tmap
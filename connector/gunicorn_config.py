@@ -0,0 +1,12 @@
+"""gunicorn settings of the connector.
+
+    gunicorn -c python:connector.gunicorn_config connector.app:app
+"""
+
+
+def on_starting(server):
+    # the master starts once per run, the metrics files of a previous run would be summed
+    # with the new ones
+    from connector.metrics import registry
+
+    registry.clear()
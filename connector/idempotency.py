@@ -0,0 +1,48 @@
+import hashlib
+import json
+
+from connector.cache import make_cache
+from connector.config import Config
+
+config = Config()
+
+# requests that change something, OA repeats them within the same transaction
+MUTATING_METHODS = ('POST', 'PUT', 'DELETE')
+
+# 202 means the work is not done yet, the repeated request has to check again
+STORED_STATUSES = (200, 201, 204)
+
+responses = make_cache('idempotency', maxsize=config.idempotency_cache_size,
+                       ttl=config.idempotency_ttl)
+
+
+def request_key(method, path, transaction_id, body):
+    """Key of a completed request, ``None`` if repeats of it cannot be recognized.
+
+    A transaction may contain several requests, so the key includes a
+    fingerprint of the request besides the APS transaction id.
+    """
+    if not transaction_id or method.upper() not in MUTATING_METHODS:
+        return None
+    fingerprint = hashlib.sha256(b'\n'.join([method.upper().encode('utf-8'),
+                                             path.encode('utf-8'),
+                                             body or b''])).hexdigest()
+    return '{}:{}'.format(transaction_id, fingerprint)
+
+
+def lookup(key):
+    """Return ``(data, status, headers, enterprise_id)`` of a completed request or ``None``."""
+    if key is None:
+        return None
+    return responses.get(key)
+
+
+def remember(key, data, status, headers, enterprise_id):
+    if key is None or status not in STORED_STATUSES:
+        return
+    try:
+        json.dumps(data)
+    except (TypeError, ValueError):
+        # e.g. a text or streamed response
+        return
+    responses.set(key, [data, status, dict(headers or {}), enterprise_id])
@@ -0,0 +1,186 @@
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+import uuid
+
+from connector.cache import _Transaction, connect
+from connector.config import Config
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobQueue(object):
+    """Jobs in a local SQLite file, run by ``workers`` threads of every process.
+
+    A job is submitted with a ``key``, submitting the same key again returns
+    the existing job until it is discarded, so a repeated request does not
+    run twice. At most ``maxsize`` jobs wait at a time. Jobs survive restarts,
+    a job running longer than ``timeout`` seconds is considered lost with
+    its worker and is run again. Finished jobs are kept for ``keep`` seconds.
+    """
+
+    def __init__(self, path, workers=2, maxsize=100, timeout=600, keep=86400, poll_interval=1):
+        self.path = path
+        self.workers = workers
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.keep = keep
+        self.poll_interval = poll_interval
+        self.handlers = {}
+        self.completed = 0
+        self.failed = 0
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        # connections are neither shared between threads nor inherited over fork()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = connect(self.path)
+            # created on first use, the file is not needed while provisioning is synchronous
+            conn.execute('CREATE TABLE IF NOT EXISTS jobs ('
+                         'id TEXT PRIMARY KEY, kind TEXT NOT NULL, key TEXT UNIQUE, '
+                         'payload TEXT NOT NULL, status TEXT NOT NULL, result TEXT, error TEXT, '
+                         'created_at REAL NOT NULL, updated_at REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._conn())
+
+    def handler(self, kind):
+        """Register the function running jobs of ``kind``, it gets the payload."""
+        def decorator(function):
+            self.handlers[kind] = function
+            return function
+        return decorator
+
+    def submit(self, kind, key, payload):
+        """Queue a job unless one with ``key`` exists already, return the job."""
+        # also picks up the jobs left by a previous run of the process
+        self.ensure_started()
+        now = time.time()
+        with self._transaction() as db:
+            db.execute('DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?',
+                       (DONE, FAILED, now - self.keep))
+            job = self._get(db, 'key', key)
+            if job is not None:
+                return job
+            if self._count(db, QUEUED) >= self.maxsize:
+                raise QueueFullError('{} jobs are waiting already'.format(self.maxsize))
+            db.execute('INSERT INTO jobs (id, kind, key, payload, status, created_at, updated_at) '
+                       'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                       (uuid.uuid4().hex, kind, key, json.dumps(payload), QUEUED, now, now))
+            job = self._get(db, 'key', key)
+        self._wakeup.set()
+        return job
+
+    def get(self, job_id):
+        return self._get(self._conn(), 'id', job_id)
+
+    def discard(self, job_id):
+        with self._transaction() as db:
+            db.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+
+    def _get(self, db, column, value):
+        row = db.execute('SELECT id, kind, key, status, result, error, created_at, updated_at '
+                         'FROM jobs WHERE {} = ?'.format(column), (value,)).fetchone()
+        if row is None:
+            return None
+        return {'id': row[0], 'kind': row[1], 'key': row[2], 'status': row[3],
+                'result': json.loads(row[4]) if row[4] else None, 'error': row[5],
+                'created_at': row[6], 'updated_at': row[7]}
+
+    def _count(self, db, status):
+        return db.execute('SELECT COUNT(*) FROM jobs WHERE status = ?', (status,)).fetchone()[0]
+
+    def claim(self):
+        """Mark the oldest waiting or lost job as running, return ``(id, kind, payload)``."""
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute('SELECT id, kind, payload FROM jobs '
+                             'WHERE status = ? OR (status = ? AND updated_at < ?) '
+                             'ORDER BY created_at LIMIT 1',
+                             (QUEUED, RUNNING, now - self.timeout)).fetchone()
+            if row is None:
+                return None
+            db.execute('UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?',
+                       (RUNNING, now, row[0]))
+        return row[0], row[1], json.loads(row[2])
+
+    def run_one(self):
+        """Run one job, return whether there was one."""
+        job = self.claim()
+        if job is None:
+            return False
+        job_id, kind, payload = job
+        try:
+            result = self.handlers[kind](payload)
+        except Exception as e:
+            logger.error("Job %s (%s) failed: %s", job_id, kind, traceback.format_exc())
+            self._finish(job_id, FAILED, error=str(e) or e.__class__.__name__)
+            self.failed += 1
+        else:
+            self._finish(job_id, DONE, result=json.dumps(result))
+            self.completed += 1
+        return True
+
+    def _finish(self, job_id, status, result=None, error=None):
+        with self._transaction() as db:
+            db.execute('UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? '
+                       'WHERE id = ?', (status, result, error, time.time(), job_id))
+
+    def ensure_started(self):
+        # like the log writer, a forked worker has to start threads of its own
+        if self.workers and self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    for i in range(self.workers):
+                        thread = threading.Thread(target=self._run, name='job-worker-{}'.format(i))
+                        thread.daemon = True
+                        thread.start()
+                    self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            try:
+                if self.run_one():
+                    continue
+            except Exception:
+                logger.exception("Job worker failed")
+            # jobs submitted by other processes are found on the next poll
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def stats(self):
+        db = self._conn()
+        return {'workers': self.workers,
+                'queued': self._count(db, QUEUED),
+                'running': self._count(db, RUNNING),
+                'maxsize': self.maxsize,
+                'completed': self.completed,
+                'failed': self.failed}
+
+
+config = Config()
+
+jobs = JobQueue(config.job_queue_path,
+                workers=config.job_workers,
+                maxsize=config.job_queue_size,
+                timeout=config.job_timeout)
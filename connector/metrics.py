@@ -0,0 +1,383 @@
+"""Prometheus metrics of the connector in the text exposition format.
+
+Every worker process keeps its own counters and histograms and writes them
+to ``<metrics_dir>/<pid>-<start>.json`` every ``metrics_flush_interval``
+seconds. A scrape of any worker sums the files of all workers of the host,
+so the numbers do not depend on the worker that answers. Files of exited
+workers are merged into ``dead.json``, their counts are kept and a reused
+pid starts a file of its own. ``Registry.clear()`` empties the directory
+when the server starts.
+"""
+import errno
+import hmac
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+
+try:
+    from urllib.parse import unquote, urlsplit
+except ImportError:
+    from urllib import unquote
+    from urlparse import urlsplit
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from connector.config import Config
+
+timer = getattr(time, 'perf_counter', time.time)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Metric(object):
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key):
+        return list(zip(self.labelnames, key))
+
+    def samples(self):
+        """Yield ``(name, [(label, value), ...], value)`` of the current process."""
+        raise NotImplementedError()
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, self._labels(key), value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super(Histogram, self).__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # observations per bucket, the last one is +Inf, then the sum
+            values = self._values.get(key)
+            if values is None:
+                values = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            values[bisect_left(self.buckets, value)] += 1
+            values[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(values)) for key, values in self._values.items()]
+        for key, values in items:
+            labels = self._labels(key)
+            count = 0
+            for bound, observed in zip(self.buckets + (float('inf'),), values):
+                count += observed
+                yield self.name + '_bucket', labels + [('le', format_value(bound))], count
+            yield self.name + '_sum', labels, values[-1]
+            yield self.name + '_count', labels, count
+
+
+class Collected(Metric):
+    """Counter read at collection time from ``function``, which returns ``{label values: value}``.
+
+    Exposes counters the connector already keeps, e.g. the cache hits,
+    without counting them twice on the request path.
+    """
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames, function):
+        super(Collected, self).__init__(name, documentation, labelnames)
+        self.function = function
+
+    def samples(self):
+        for key, value in self.function().items():
+            yield self.name, self._labels(key if isinstance(key, tuple) else (key,)), value
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return '{:.1f}'.format(value)
+    return repr(value)
+
+
+def escape(value):
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+class Registry(object):
+    def __init__(self, directory=None, flush_interval=5):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.metrics = OrderedDict()
+        self._pid = None
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def collected(self, name, documentation, labelnames, function):
+        return self.register(Collected(name, documentation, labelnames, function))
+
+    def samples(self):
+        return [[name, labels, value] for metric in list(self.metrics.values())
+                for name, labels, value in metric.samples()]
+
+    def path(self):
+        if self._instance is None or self._instance[0] != os.getpid():
+            # the start time tells a worker from an exited one that had the same pid
+            self._instance = (os.getpid(), int(time.time() * 1000))
+        return os.path.join(self.directory, '{}-{}.json'.format(*self._instance))
+
+    def flush(self):
+        """Write the samples of this process to its file in ``directory``."""
+        if not self.directory:
+            return
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory, 0o700)
+            except OSError:
+                # created by another worker meanwhile
+                pass
+        self._write(self.path(), self.samples())
+
+    def _write(self, path, samples):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(samples, f)
+        # readers see either the previous or the new file, never a partial one
+        os.rename(tmp, path)
+
+    def clear(self):
+        """Remove the files of all workers, e.g. of the previous run of the server."""
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith(('.json', '.tmp')):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    # removed by another process meanwhile
+                    pass
+
+    def ensure_started(self):
+        # like the log writer, a forked worker has to start a flush thread of its own
+        if self.directory and self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    thread = threading.Thread(target=self._run, name='metrics-flush')
+                    thread.daemon = True
+                    thread.start()
+                    self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                # metrics must never break the worker, the next flush tries again
+                pass
+
+    def _dead_files(self):
+        """Names of the files of exited workers, the newest file of a pid is the live one."""
+        newest = {}
+        for name in os.listdir(self.directory):
+            pid, _, started = name[:-len('.json')].partition('-')
+            if name.endswith('.json') and pid.isdigit() and started.isdigit():
+                newest.setdefault(int(pid), []).append((int(started), name))
+        dead = []
+        for pid, files in newest.items():
+            files.sort()
+            dead.extend(name for _, name in files[:-1])
+            if not pid_alive(pid):
+                dead.append(files[-1][1])
+        return dead
+
+    def _merge_dead(self):
+        names = self._dead_files()
+        if names:
+            totals = OrderedDict()
+            for samples in self._read_files(['dead.json'] + names):
+                for name, labels, value in samples:
+                    key = (name, tuple(tuple(label) for label in labels))
+                    totals[key] = totals.get(key, 0) + value
+            self._write(os.path.join(self.directory, 'dead.json'),
+                        [[name, labels, value] for (name, labels), value in totals.items()])
+            for name in names:
+                os.remove(os.path.join(self.directory, name))
+
+    def _read_all(self):
+        if fcntl is None:
+            return self._read_files()
+        # one process merges or reads at a time, a file moved into dead.json is never
+        # counted twice or missed
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._merge_dead()
+            return self._read_files()
+
+    def _read_files(self, names=None):
+        sources = []
+        for name in os.listdir(self.directory) if names is None else names:
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    sources.append(json.load(f))
+            except (IOError, OSError, ValueError):
+                # removed or replaced while listing
+                continue
+        return sources
+
+    def collect(self):
+        """Return ``{(name, labels): value}`` summed over all worker processes."""
+        sources = []
+        if self.directory:
+            try:
+                self.flush()
+                sources = self._read_all()
+            except (IOError, OSError):
+                # e.g. a read-only directory, the other workers are left out
+                sources = []
+        totals = {}
+        for samples in sources or [self.samples()]:
+            for name, labels, value in samples:
+                key = (name, tuple(tuple(label) for label in labels))
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def render(self):
+        """The metrics of all worker processes in the Prometheus text format."""
+        families = {}
+        for (name, labels), value in self.collect().items():
+            for suffix in ('_bucket', '_sum', '_count', ''):
+                family = name[:len(name) - len(suffix)] if suffix else name
+                if name.endswith(suffix) and family in self.metrics:
+                    break
+            families.setdefault(family, []).append((name, labels, value))
+
+        lines = []
+        for metric in self.metrics.values():
+            lines.append('# HELP {} {}'.format(metric.name, metric.documentation))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.kind))
+            for name, labels, value in sorted(families.get(metric.name, []), key=sample_order):
+                label_text = ','.join('{}="{}"'.format(k, escape(v)) for k, v in labels)
+                lines.append('{}{} {}'.format(name, '{' + label_text + '}' if label_text else '',
+                                              format_value(value)))
+        return '\n'.join(lines) + '\n'
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        # EPERM: the process exists but belongs to another user
+        return e.errno != errno.ESRCH
+    return True
+
+
+def authorized_scrape(authorization):
+    """Whether the ``Authorization`` header carries the configured ``metrics_token``."""
+    token = config.metrics_token
+    if not token or not authorization:
+        return False
+    return hmac.compare_digest(to_bytes(authorization), to_bytes('Bearer {}'.format(token)))
+
+
+def to_bytes(value):
+    return value if isinstance(value, bytes) else value.encode('utf-8')
+
+
+def sample_order(sample):
+    name, labels, _ = sample
+    # buckets of a series stay together and in ascending order
+    series = tuple(label for label in labels if label[0] != 'le')
+    bound = [float(v.replace('+Inf', 'inf')) for k, v in labels if k == 'le']
+    return series, name, bound
+
+
+# path segments following these are ids, they would make a label value per resource
+_ID_COLLECTIONS = ('resources', 'enterprises', 'users')
+
+
+def operation(url):
+    """Template of an upstream ``url`` for metric labels.
+
+    Ids are replaced by ``{id}`` and RQL queries reduced to their
+    operators, e.g. ``/aps/2/resources?implementing,limit``.
+    """
+    parts = urlsplit(url)
+    segments = parts.path.rstrip('/').split('/')
+    template = '/'.join('{id}' if i and segments[i - 1] in _ID_COLLECTIONS else segment
+                        for i, segment in enumerate(segments))
+    query = unquote(parts.query)
+    if '(' in query:
+        template += '?' + ','.join(sorted(set(re.findall(r'([a-z]\w*)\(', query))))
+    return template
+
+
+config = Config()
+
+registry = Registry(config.metrics_dir, config.metrics_flush_interval)
+
+request_duration = registry.histogram(
+    'connector_request_duration_seconds', 'APS requests by route, method and status.',
+    ('route', 'method', 'status'))
+
+upstream_duration = registry.histogram(
+    'connector_upstream_request_duration_seconds',
+    'OA and Box HTTP requests by upstream, method, operation and status, every attempt counts.',
+    ('upstream', 'method', 'operation', 'status'))
+
+upstream_errors = registry.counter(
+    'connector_upstream_errors_total',
+    'OA and Box requests that got no response, by upstream, operation and exception.',
+    ('upstream', 'operation', 'error'))
+
+
+def observe_upstream(upstream, method, url, started, response=None, error=None):
+    """Record one upstream attempt that got ``response`` or failed with ``error``."""
+    name = operation(url)
+    if error is not None:
+        upstream_errors.inc(upstream=upstream, operation=name, error=error.__class__.__name__)
+    else:
+        upstream_duration.observe(timer() - started, upstream=upstream, method=method.upper(),
+                                  operation=name, status=response.status_code)
@@ -0,0 +1,155 @@
+import os
+import threading
+
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+from connector.breaker import CircuitBreaker, breakers, is_server_failure
+from connector.metrics import observe_upstream, timer
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:
+    from urlparse import urlsplit
+
+
+class PooledSession(requests.Session):
+    """Session that applies the pool timeouts, retry policy and circuit breaker to every request."""
+    timeout = None
+    retry = None
+    breaker = None
+    # upstream name of the request metrics
+    upstream = None
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+
+        def attempt():
+            if self.breaker is None:
+                return super(PooledSession, self).request(method, url, **kwargs)
+            return self.breaker.call(
+                lambda: super(PooledSession, self).request(method, url, **kwargs),
+                is_failure=is_server_failure)
+
+        def send():
+            started = timer()
+            try:
+                response = attempt()
+            except Exception as e:
+                observe_upstream(self.upstream, method, url, started, error=e)
+                raise
+            observe_upstream(self.upstream, method, url, started, response=response)
+            return response
+
+        if self.retry is None:
+            return send()
+        return self.retry.call(method, send)
+
+
+class SessionPool(object):
+    """Keep-alive ``requests.Session`` objects, one per upstream base URL.
+
+    Sessions live for the whole life of the worker process, so consecutive
+    calls to the same host reuse already established TCP/TLS connections
+    instead of doing a new handshake for every request.
+    """
+
+    def __init__(self, pool_size=10, connect_timeout=5, read_timeout=50, verify=True,
+                 retry=None, breaker_name=None, breaker_options=None,
+                 session_class=PooledSession):
+        self.pool_size = pool_size
+        self.retry = retry
+        # one circuit breaker per base URL, named breaker_name or breaker_name:<base URL>
+        self.breaker_name = breaker_name
+        self.breaker_options = breaker_options or {}
+        self.timeout = (connect_timeout, read_timeout)
+        self.verify = verify
+        self.session_class = session_class
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def base_url(url):
+        parts = urlsplit(url)
+        return '{}://{}'.format(parts.scheme, parts.netloc)
+
+    def make_session(self, key=None):
+        session = self.session_class()
+        session.verify = self.verify
+        session.timeout = self.timeout
+        session.retry = self.retry
+        session.upstream = self.breaker_name or key
+        if self.breaker_name:
+            name = self.breaker_name if key is None else '{}:{}'.format(self.breaker_name, key)
+            session.breaker = breakers.get(name) or CircuitBreaker(name, **self.breaker_options)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def session(self, url):
+        key = self.base_url(url)
+        session = self._sessions.get(key)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(key)
+                if session is None:
+                    session = self._sessions[key] = self.make_session(key)
+        return session
+
+    def request(self, method, url, **kwargs):
+        return self.session(url).request(method, url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    def stats(self):
+        result = {}
+        for key, session in list(self._sessions.items()):
+            requests_num = connections = idle = 0
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for pool_key in pools.keys():
+                    pool = pools.get(pool_key)
+                    if pool is None:
+                        continue
+                    requests_num += pool.num_requests
+                    connections += pool.num_connections
+                    if pool.pool is not None:
+                        idle += sum(1 for conn in list(pool.pool.queue)
+                                    if conn is not None and getattr(conn, 'sock', None) is not None)
+            result[key] = {
+                'requests': requests_num,
+                'connections': connections,
+                'idle_connections': idle,
+                'reuse_ratio': (round(1 - float(connections) / requests_num, 3)
+                                if requests_num else 0.0),
+            }
+        return result
+
+
+class LazyExecutor(object):
+    """``ThreadPoolExecutor`` created on the first ``submit`` instead of at import.
+
+    Like the log writer, a forked worker gets an executor of its own, the
+    threads of an executor used before the fork do not exist in the child.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def submit(self, function, *args, **kwargs):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+                    self._pid = os.getpid()
+        return self._executor.submit(function, *args, **kwargs)
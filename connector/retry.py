@@ -0,0 +1,150 @@
+import logging
+import random
+import threading
+import time
+from collections import Counter
+
+from requests.exceptions import ConnectionError, ConnectTimeout, ReadTimeout
+
+logger = logging.getLogger(__name__)
+
+# all retry policies of the process, used for introspection
+policies = {}
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+ANY_METHOD = None
+
+# the request is known not to have been processed, any method may be repeated
+DEFAULT_STATUS_RULES = {429: ANY_METHOD, 502: IDEMPOTENT_METHODS,
+                        503: ANY_METHOD, 504: IDEMPOTENT_METHODS}
+DEFAULT_EXCEPTION_RULES = [(ConnectTimeout, ANY_METHOD),
+                           (ReadTimeout, IDEMPOTENT_METHODS),
+                           (ConnectionError, IDEMPOTENT_METHODS)]
+
+
+class RetryBudget(object):
+    """Limits retries to a share of the calls made through a policy.
+
+    Every call deposits ``ratio`` of a retry and ``min_per_second`` retries
+    are granted regardless of traffic, so a degraded upstream gets at most
+    ``1 + ratio`` times the normal load instead of ``max_attempts`` times.
+    """
+
+    def __init__(self, ratio=0.2, min_per_second=1.0, capacity=100):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self._balance = float(capacity)
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.time()
+        self._balance = min(self.capacity,
+                            self._balance + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self):
+        with self._lock:
+            self._refill()
+            self._balance = min(self.capacity, self._balance + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            self._refill()
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+
+class RetryPolicy(object):
+    """Repeats upstream calls that failed with a retriable status or exception.
+
+    ``status_rules`` maps response codes and ``exception_rules`` lists
+    exception classes to the HTTP methods that may be retried for them
+    (``ANY_METHOD`` for all). Delays grow exponentially from ``backoff``
+    up to ``max_backoff`` with full jitter, ``Retry-After`` is honoured.
+    """
+
+    def __init__(self, name, max_attempts=3, status_rules=None, exception_rules=None,
+                 backoff=0.1, max_backoff=2.0, budget=None):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.status_rules = DEFAULT_STATUS_RULES if status_rules is None else status_rules
+        self.exception_rules = (DEFAULT_EXCEPTION_RULES if exception_rules is None
+                                else exception_rules)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.budget = budget or RetryBudget()
+        self.attempts = Counter()
+        self.retries = 0
+        self.budget_exhausted = 0
+        policies[name] = self
+
+    @staticmethod
+    def _allowed(methods, method):
+        return methods is ANY_METHOD or method.upper() in methods
+
+    def should_retry_status(self, method, status_code):
+        return (status_code in self.status_rules and
+                self._allowed(self.status_rules[status_code], method))
+
+    def should_retry_exception(self, method, error, exception_rules=None):
+        """``exception_rules`` replaces the rules of the policy for clients of other libraries."""
+        for exception_class, methods in (self.exception_rules if exception_rules is None
+                                         else exception_rules):
+            if isinstance(error, exception_class):
+                return self._allowed(methods, method)
+        return False
+
+    def delay(self, attempt, response=None):
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), self.max_backoff))
+        return delay
+
+    def can_retry(self, attempt, max_attempts):
+        if attempt >= max_attempts:
+            return False
+        if not self.budget.withdraw():
+            self.budget_exhausted += 1
+            return False
+        return True
+
+    def call(self, method, send, max_attempts=None):
+        """Run ``send()``, which makes one HTTP request, until it succeeds or may not be retried."""
+        max_attempts = max_attempts or self.max_attempts
+        self.budget.deposit()
+        attempt = 1
+        while True:
+            try:
+                response = send()
+            except Exception as e:
+                if not (self.should_retry_exception(method, e) and
+                        self.can_retry(attempt, max_attempts)):
+                    self.attempts[attempt] += 1
+                    raise
+                delay = self.delay(attempt)
+                logger.info("%s %s attempt %s failed (%s), retrying in %.2fs",
+                            self.name, method, attempt, e, delay)
+            else:
+                if not (self.should_retry_status(method, response.status_code) and
+                        self.can_retry(attempt, max_attempts)):
+                    self.attempts[attempt] += 1
+                    return response
+                delay = self.delay(attempt, response)
+                logger.info("%s %s attempt %s returned %s, retrying in %.2fs",
+                            self.name, method, attempt, response.status_code, delay)
+                response.close()
+
+            self.retries += 1
+            attempt += 1
+            time.sleep(delay)
+
+    def stats(self):
+        return {'calls': sum(self.attempts.values()),
+                'retries': self.retries,
+                'budget_exhausted': self.budget_exhausted,
+                'attempts_per_call': dict(self.attempts)}
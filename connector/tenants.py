@@ -0,0 +1,68 @@
+import os
+import threading
+import time
+
+from connector.cache import _Transaction, connect
+from connector.config import Config
+
+
+class TenantStore(object):
+    """OA tenant id to Box enterprise id mapping in a local SQLite file.
+
+    Unlike the tenant cache the mapping is kept over restarts and is shared
+    by all worker processes of the host, so a cold worker does not ask OA.
+    The file is in WAL mode, readers do not wait for writers.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+
+    def _conn(self):
+        # connections are neither shared between threads nor inherited over fork()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = connect(self.path)
+            conn.execute('CREATE TABLE IF NOT EXISTS tenants ('
+                         'tenant_id TEXT PRIMARY KEY, enterprise_id TEXT NOT NULL, '
+                         'updated_at REAL NOT NULL)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, tenant_id):
+        row = self._conn().execute('SELECT enterprise_id FROM tenants WHERE tenant_id = ?',
+                                   (tenant_id,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def set(self, tenant_id, enterprise_id):
+        self.set_many([(tenant_id, enterprise_id)])
+
+    def set_many(self, mappings):
+        """Store ``(tenant_id, enterprise_id)`` pairs, mappings to ``None`` are skipped."""
+        now = time.time()
+        with _Transaction(self._conn()) as db:
+            db.executemany('INSERT OR REPLACE INTO tenants (tenant_id, enterprise_id, updated_at) '
+                           'VALUES (?, ?, ?)',
+                           [(t, e, now) for t, e in mappings if t and e])
+
+    def delete(self, tenant_id):
+        with _Transaction(self._conn()) as db:
+            db.execute('DELETE FROM tenants WHERE tenant_id = ?', (tenant_id,))
+
+    def __len__(self):
+        return self._conn().execute('SELECT COUNT(*) FROM tenants').fetchone()[0]
+
+    def stats(self):
+        return {'size': len(self), 'hits': self.hits, 'misses': self.misses}
+
+
+config = Config()
+
+tenant_store = TenantStore(config.tenant_store_path)
@@ -1,11 +1,26 @@
-import logging
-import sys
+import atexit
 import json
+import logging
+import os
+import random
 import re
+import sys
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 from flask import g
 
-logger = logging.getLogger(__file__)
+from connector.config import Config
+
+config = Config()
+
+logger = logging.getLogger(__name__)
+# request and response records are JSON and have their own handler
+logger.propagate = False
 
 
 class ResellerNameFilter(logging.Filter):
@@ -14,6 +29,20 @@ class ResellerNameFilter(logging.Filter):
         return True
 
 
+class Body(object):
+    """Request or response body decoded only when the record is written."""
+
+    def __init__(self, data, limit):
+        self.data = data
+        self.limit = limit
+
+    def __str__(self):
+        text = self.data[:self.limit].decode('utf-8', 'replace')
+        if len(self.data) > self.limit:
+            text += '...<{} bytes truncated>'.format(len(self.data) - self.limit)
+        return text
+
+
 class ConnectorLogFormatter(logging.Formatter):
     def format(self, record):
         resp = {}
@@ -24,33 +53,103 @@ class ConnectorLogFormatter(logging.Formatter):
         resp['time'] = self.formatTime(record, self.datefmt)
         resp['level'] = record.levelname
         resp['reseller_id'] = record.reseller_name
-        return json.dumps(resp)
+        return json.dumps(resp, default=str)
+
+
+class BackgroundHandler(logging.Handler):
+    """Passes records to a thread that formats and writes them with ``target``.
+
+    At most ``maxsize`` records wait in the queue, further records are
+    dropped and counted instead of blocking the request.
+    """
+
+    def __init__(self, target, maxsize=10000):
+        super(BackgroundHandler, self).__init__()
+        self.target = target
+        self.queue = queue.Queue(maxsize)
+        self.dropped = 0
+        self._pid = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_thread(self):
+        # a worker forked from a preloading master has the handler but not the thread
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._thread = threading.Thread(target=self._run, name='log-writer')
+                    self._thread.daemon = True
+                    self._thread.start()
+                    self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            record = self.queue.get()
+            if record is None:
+                return
+            try:
+                self.target.handle(record)
+            except Exception:
+                self.target.handleError(record)
+
+    def emit(self, record):
+        self._ensure_thread()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        if self._pid == os.getpid():
+            try:
+                self.queue.put(None, timeout=1)
+            except queue.Full:
+                pass
+            self._thread.join(1)
+            self._pid = None
+        super(BackgroundHandler, self).close()
+
+    def stats(self):
+        return {'queued': self.queue.qsize(), 'dropped': self.dropped}
 
 
 stream = logging.StreamHandler(sys.stdout)
+stream.setFormatter(ConnectorLogFormatter())
+handler = BackgroundHandler(stream, maxsize=config.log_queue_size)
+atexit.register(handler.close)
+
 logger.addFilter(ResellerNameFilter())
-formatter = ConnectorLogFormatter()
-stream.setFormatter(formatter)
-logger.setLevel(logging.DEBUG)
-logger.addHandler(stream)
+logger.addHandler(handler)
+
+
+def is_sampled(endpoint):
+    rate = config.log_sample_rates.get(endpoint, config.log_sample_rate)
+    return rate >= 1 or random.random() < rate
 
 
 def log_request(request):
+    g.log_sampled = is_sampled(g.endpoint)
+    if not (g.log_sampled and logger.isEnabledFor(logging.INFO)):
+        return
     logger.info({"type": "request",
                  "app": "box_connector",
                  "method": request.method,
                  "url": request.url,
                  "headers": dict(request.headers),
-                 "data": request.data.decode('utf-8')})
+                 "data": Body(request.data, config.log_body_limit)})
 
 
 def log_response(response):
+    if not (g.get('log_sampled', True) and logger.isEnabledFor(logging.INFO)):
+        return
+    # a streamed body can be read only once, by the client
+    data = '<streamed>' if response.is_streamed else Body(response.data, config.log_body_limit)
     logger.info({"type": "response",
                  "app": "box_connector",
                  "status_code": response.status_code,
                  "status": response.status,
                  "headers": dict(response.headers),
-                 "data": response.data.decode('utf-8'),
+                 "data": data,
                  "company_id": g.enterprise_id})
 
 
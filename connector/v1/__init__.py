@@ -1,35 +1,42 @@
-import sys
+import json
 import logging
 from collections import namedtuple
 
 from flask import Blueprint, g, request
 from flask_restful import Api, abort
-from requests_oauthlib import OAuth1
-from faker import Faker
+from werkzeug.test import EnvironBuilder
 
+from connector.breaker import CircuitOpenError
 from connector.config import Config
+from connector.jobs import jobs
+from connector.metrics import authorized_scrape, registry, request_duration, timer
 from connector.utils import log_request, log_response
-from connector.validator import check_oauth_signature, get_client_key
+from connector.validator import OAuthResult, get_signer, verify_request
 from connector.client.reseller import Reseller
+from connector.client.usage import usage_collector
 
-from .resources import urlify
+from .resources import discard_request_memo, make_unavailable_error
 from .resources.application import (Application, ApplicationList, ApplicationTenantDelete,
-                                   ApplicationTenantNew, ApplicationUpgrade, HealthCheck)
+                                    ApplicationTenantNew, ApplicationUpgrade, HealthCheck)
+from .resources.job import Job
+from .resources.metrics import Metrics
+from .resources.stats import Stats
 from .resources.tenant import (Tenant, TenantAdminLogin, TenantDisable, TenantEnable,
-                              TenantList, TenantUserCreated, TenantUserRemoved)
-from .resources.user import User, UserList, UserLogin
+                               TenantList, TenantUserCreated, TenantUserRemoved,
+                               parse_tenant_args, provision_tenant)
+from .resources.user import TenantUsersBulk, User, UserList, UserLogin
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-stream = logging.StreamHandler(sys.stdout)
-logger.addHandler(stream)
 
-fake = Faker()
 api_bp = Blueprint('v1', __name__)
 
 ResellerInfo = namedtuple('ResellerInfo', ['id', 'name', 'is_new', 'auth'])
 
 
+# connector internals, e.g. the OA controller URIs, served to OAuth signed requests only
+internal_endpoints = (Stats.__name__.lower(), Metrics.__name__.lower())
+
+
 def allow_public_endpoints_only():
     public_endpoints = (HealthCheck.__name__.lower(),)
     if g.endpoint not in public_endpoints:
@@ -44,13 +51,11 @@ def set_name_for_reseller(reseller_id):
 #        return urlify(fake.bs())
 #    return get_reseller_name(reseller_id)
 
+
 def get_oauth():
-    client_key = get_client_key(request)
-    client_secret = Config().oauth_signature
-    if not client_key or not client_secret:
+    if not g.oauth.valid or not Config().oauth_signature:
         return None
-    return OAuth1(client_key=client_key,
-                  client_secret=client_secret)
+    return get_signer(g.oauth.client_key)
 
 
 def get_reseller_info():
@@ -63,38 +68,99 @@ def get_reseller_info():
 
 @api_bp.before_request
 def before_request():
+    g.started = timer()
+    registry.ensure_started()
     g.endpoint = request.endpoint
     if request.blueprint:
         g.endpoint = g.endpoint[len(request.blueprint):].lstrip('.')
 
+    g.oauth = verify_request(request)
     reseller_info = get_reseller_info()
     g.reseller_name = reseller_info.name
     g.enterprise_id = 'N/A'
 
     log_request(request)
 
+    if g.endpoint in internal_endpoints:
+        # Prometheus can not sign its scrapes, it sends the metrics token instead
+        scrape = g.endpoint == Metrics.__name__.lower() and \
+            authorized_scrape(request.headers.get('Authorization'))
+        if not g.oauth.valid and not scrape:
+            abort(401)
+        return
+
     if not reseller_info.name:
         allow_public_endpoints_only()
         return
 
-    if not check_oauth_signature(request):
+    if not g.oauth.valid:
         abort(401)
 
     g.auth = reseller_info.auth
 
     g.reseller = Reseller(None)
-    g.reseller.refresh()
+    try:
+        g.reseller.refresh()
+    except CircuitOpenError as e:
+        # a cold token fetch outside of the resources, answered like a request they make
+        data, status, headers = make_unavailable_error(e)
+        return api.make_response(data, status, headers=headers)
 
     if not g.reseller.token:
         abort(403)
 
+    usage_collector.ensure_started()
+
+
 @api_bp.after_request
 def after_request(response):
+    saved = discard_request_memo(g.endpoint)
+    if saved:
+        logger.debug("%s: %s OA calls served from the request memo", g.endpoint, saved)
     log_response(response)
+    if 'started' in g:
+        # for streamed responses until the body starts
+        request_duration.observe(timer() - g.started, route=request.url_rule.rule,
+                                 method=request.method, status=response.status_code)
     return response
 
+
+_apps = []
+
+
+@api_bp.record_once
+def remember_app(state):
+    # queued jobs run outside of requests, in request contexts of the app
+    _apps.append(state.app)
+
+
+@jobs.handler('tenant')
+def provision_tenant_job(payload):
+    """Run a queued ``POST /tenant`` in a request context rebuilt from the APS request."""
+    builder = EnvironBuilder('/v1/tenant', method='POST', headers=payload['headers'],
+                             data=json.dumps(payload['body']), content_type='application/json')
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+    with _apps[0].request_context(environ):
+        g.endpoint = TenantList.__name__.lower()
+        g.reseller_name = set_name_for_reseller(request.headers.get('Aps-Instance-Id'))
+        g.enterprise_id = 'N/A'
+        g.oauth = OAuthResult(True, payload['client_key'])
+        g.auth = get_oauth()
+        g.reseller = Reseller(None)
+        g.reseller.refresh()
+        try:
+            return provision_tenant(parse_tenant_args())
+        finally:
+            discard_request_memo(g.endpoint)
+
+
 resource_routes = {
     '/': HealthCheck,
+    '/stats': Stats,
+    '/metrics': Metrics,
     '/app': ApplicationList,
     '/app/<app_id>': Application,
     '/app/<app_id>/tenants': ApplicationTenantNew,
@@ -107,11 +173,14 @@ resource_routes = {
     '/tenant/<tenant_id>/enable': TenantEnable,
     '/tenant/<tenant_id>/adminlogin': TenantAdminLogin,
     '/tenant/<oa_tenant_id>/users': TenantUserCreated,
+    '/tenant/<tenant_id>/users/bulk': TenantUsersBulk,
     '/tenant/<tenant_id>/users/<user_id>': TenantUserRemoved,
 
     '/user': UserList,
     '/user/<oa_user_service_id>': User,
     '/user/<oa_user_service_id>/login': UserLogin,
+
+    '/jobs/<job_id>': Job,
 }
 
 api = Api(api_bp)
@@ -1,7 +1,8 @@
 import re
 import json
-
-import requests
+import logging
+import threading
+from collections import Counter, OrderedDict
 
 try:
     from functools import reduce
@@ -13,12 +14,139 @@ try:
 except ImportError:
     from urlparse import urljoin
 
-from flask import g, request
+from flask import copy_current_request_context, g, request
 
 from flask_restful import Resource
+from flask_restful.utils import unpack
 
 from slumber.exceptions import HttpClientError, HttpServerError
 
+from connector import idempotency
+from connector.breaker import CircuitOpenError
+from connector.config import Config, breaker_options
+from connector.pool import LazyExecutor, SessionPool
+from connector.retry import ANY_METHOD, DEFAULT_STATUS_RULES, RetryBudget, RetryPolicy
+
+config = Config()
+
+logger = logging.getLogger(__name__)
+
+# keep-alive sessions to the OA controllers, shared by all requests of the worker
+oa_sessions = SessionPool(pool_size=config.oa_pool_size,
+                          connect_timeout=config.oa_connect_timeout,
+                          read_timeout=config.oa_read_timeout,
+                          verify=False,
+                          breaker_name='oa',
+                          breaker_options=breaker_options(config))
+
+# OA answers 400 to calls colliding with a concurrent transaction, those are retried too
+oa_status_rules = dict(DEFAULT_STATUS_RULES)
+oa_status_rules[400] = ANY_METHOD
+
+oa_retry = RetryPolicy('oa',
+                       status_rules=oa_status_rules,
+                       backoff=config.retry_backoff,
+                       max_backoff=config.retry_max_backoff,
+                       budget=RetryBudget(config.retry_budget_ratio))
+
+# threads running independent upstream calls of a request concurrently
+executor = LazyExecutor(config.oa_concurrency)
+
+# threads creating and deleting the Box users of bulk requests, shared by all requests
+bulk_executor = LazyExecutor(config.bulk_concurrency)
+
+# resources fetched per RQL query, keeps the URL of the query short
+OA_BATCH_SIZE = 100
+
+
+def copy_current_context(function):
+    """Make ``function`` runnable in another thread within the current request.
+
+    With flask 0.12 pushing a copied request context creates a new app context,
+    so the request globals (``g.auth``, ``g.reseller``, ...) are copied explicitly.
+    """
+    request_memo()  # created here so that all threads share it
+    g_vars = dict(g.__dict__)
+
+    @copy_current_request_context
+    def wrapper(*args, **kwargs):
+        g.__dict__.update(g_vars)
+        return function(*args, **kwargs)
+
+    return wrapper
+
+
+def run_concurrently(*calls):
+    """Run independent no-argument callables concurrently, return their results in order."""
+    if len(calls) == 1:
+        return [calls[0]()]
+    futures = [executor.submit(copy_current_context(call)) for call in calls]
+    return [future.result() for future in futures]
+
+
+def map_concurrently(function, items, pool=None):
+    """Call ``function`` for every item on ``pool``, return the results in order."""
+    # a copied request context can only be pushed by one thread at a time
+    futures = [(pool or executor).submit(copy_current_context(function), item) for item in items]
+    return [future.result() for future in futures]
+
+
+_missing = object()
+
+
+class RequestMemo(object):
+    """OA responses fetched during one APS request, stored on ``g.oa_memo``."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                return self._data[key]
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+
+    def fetch(self, key, function):
+        value = self.get(key, _missing)
+        if value is _missing:
+            value = function()
+            with self._lock:
+                self.misses += 1
+                self._data[key] = value
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# upstream calls saved by the request memo, per endpoint
+memo_stats = Counter()
+
+
+def request_memo():
+    memo = getattr(g, 'oa_memo', None)
+    if memo is None:
+        memo = g.oa_memo = RequestMemo()
+    return memo
+
+
+def discard_request_memo(endpoint):
+    """Drop the memo of the finished request, return the number of saved upstream calls."""
+    memo = g.pop('oa_memo', None)
+    if not memo or not memo.hits:
+        return 0
+    memo_stats[endpoint] += memo.hits
+    return memo.hits
+
 
 def parameter_validator(*args):
     def extract_params(where, *args):
@@ -44,12 +172,29 @@ def make_error(e):
     return {'message': e.response.text.strip('"')}, e.response.status_code
 
 
+def make_unavailable_error(e):
+    return {'message': str(e)}, 503, {'Retry-After': str(e.retry_after)}
+
+
 class ConnectorResource(Resource):
     def dispatch_request(self, *args, **kwargs):
+        key = idempotency.request_key(request.method, request.path,
+                                      request.headers.get('aps-transaction-id'), request.get_data())
+        completed = idempotency.lookup(key)
+        if completed is not None:
+            data, status, headers, g.enterprise_id = completed
+            logger.info("%s %s was completed in this transaction already, returning its response",
+                        request.method, request.path)
+            return data, status, headers
+
         try:
-            return super(ConnectorResource, self).dispatch_request(*args, **kwargs)
+            result = super(ConnectorResource, self).dispatch_request(*args, **kwargs)
         except (HttpClientError, HttpServerError) as e:
             return make_error(e)
+        except CircuitOpenError as e:
+            return make_unavailable_error(e)
+        idempotency.remember(key, *unpack(result), enterprise_id=g.get('enterprise_id'))
+        return result
 
 
 class OACommunicationException(Exception):
@@ -60,16 +205,53 @@ class OACommunicationException(Exception):
 
 
 class OA(object):
-    request_timeout = 50
+    @staticmethod
+    def memo_key(path, transaction=True):
+        return request.headers.get('aps-transaction-id') if transaction else None, path
 
     @staticmethod
     def get_resource(resource_id, transaction=True, retry_num=10):
         rql_request = 'aps/2/resources/{}'.format(resource_id)
-        return OA.send_request('get', rql_request, transaction=transaction, retry_num=retry_num)
+        return request_memo().fetch(
+            OA.memo_key(rql_request, transaction),
+            lambda: OA.send_request('get', rql_request, transaction=transaction,
+                                    retry_num=retry_num))
 
     @staticmethod
     def get_resources(rql_request, transaction=True, retry_num=10):
-        return OA.send_request('get', rql_request, transaction=transaction, retry_num=retry_num)
+        return request_memo().fetch(
+            OA.memo_key(rql_request, transaction),
+            lambda: OA.send_request('get', rql_request, transaction=transaction,
+                                    retry_num=retry_num))
+
+    @staticmethod
+    def get_resources_by_ids(ids, transaction=True, retry_num=10, fetch_missing=True):
+        """Fetch several resources with one RQL query, return them keyed by the given ids.
+
+        Resources missing from the query result are fetched one by one, or left out
+        without ``fetch_missing``. Long id lists are queried in batches of ``OA_BATCH_SIZE``.
+        """
+        ids = list(OrderedDict.fromkeys(ids))
+        memo = request_memo()
+        found = {}
+        for i in ids:
+            resource = memo.get(OA.memo_key('aps/2/resources/{}'.format(i), transaction))
+            if resource is not None:
+                found[str(i)] = resource
+        missing = [str(i) for i in ids if str(i) not in found]
+        for start in range(0, len(missing), OA_BATCH_SIZE):
+            batch = missing[start:start + OA_BATCH_SIZE]
+            rql_request = 'aps/2/resources?in(aps.id,({}))'.format(','.join(batch))
+            for resource in OA.send_request('get', rql_request, transaction=transaction,
+                                            retry_num=retry_num):
+                found[resource['aps']['id']] = resource
+                memo.set(OA.memo_key('aps/2/resources/{}'.format(resource['aps']['id']),
+                                     transaction), resource)
+        for i in ids:
+            # sequentially: this may already run on the executor of run_concurrently()
+            if str(i) not in found and fetch_missing:
+                found[str(i)] = OA.get_resource(i, transaction=transaction, retry_num=retry_num)
+        return OrderedDict((i, found[str(i)]) for i in ids if str(i) in found)
 
     @staticmethod
     def send_request(method, path, body=None, transaction=True, impersonate_as=None, retry_num=10):
@@ -84,34 +266,18 @@ class OA(object):
 
         data = None if body is None else json.dumps(body)
 
-        retry_num = retry_num if retry_num > 0 else 1
-
-        while retry_num > 0:
-            retry_num -= 1
-            resp = requests.request(
-                method=method,
-                url=url,
-                data=data,
-                headers=headers,
-                auth=g.auth,
-                timeout=OA.request_timeout,
-                verify=False
-            )
-
-            if resp.status_code == 200:
-                return resp.json()
-            elif resp.status_code != 400:
-                raise OACommunicationException(resp)
-
-        raise OACommunicationException(resp)
-
-
-class Memoize(object):
-    def __init__(self, function):
-        self.function = function
-        self.memoized = {}
-
-    def __call__(self, *args):
-        if args not in self.memoized:
-            self.memoized[args] = self.function(*args)
-        return self.memoized[args]
+        if method.lower() != 'get':
+            # the request may change resources memoized earlier
+            request_memo().clear()
+
+        resp = oa_retry.call(method, lambda: oa_sessions.request(
+            method,
+            url,
+            data=data,
+            headers=headers,
+            auth=g.auth
+        ), max_attempts=retry_num if retry_num > 0 else 1)
+
+        if resp.status_code != 200:
+            raise OACommunicationException(resp)
+        return resp.json()
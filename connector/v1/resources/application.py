@@ -1,21 +1,35 @@
-import pkg_resources
+from flask_restful import reqparse
+
+from . import ConnectorResource, parameter_validator
+
+_version = None
+
+
+def get_version():
+    """Version of the installed box-connector distribution, looked up on first use."""
+    global _version
+    if _version is None:
+        try:
+            from importlib.metadata import PackageNotFoundError, version
+        except ImportError:
+            # python < 3.8, pkg_resources scans sys.path so it is not imported at startup
+            import pkg_resources
+            try:
+                _version = pkg_resources.get_distribution('box-connector').version
+            except pkg_resources.DistributionNotFound:
+                _version = ''
+        else:
+            try:
+                _version = version('box-connector')
+            except PackageNotFoundError:
+                _version = ''
+    return _version
 
-from flask import g
-
-from flask_restful import abort, reqparse
-
-from connector.client.reseller import Reseller
-
-from . import ConnectorResource, Memoize, parameter_validator
-
-env = pkg_resources.Environment()
-res = env._distmap.get('box-connector', [None])[0]
-version = res.version if res else ''
 
 class HealthCheck(ConnectorResource):
     def get(self):
         return {'status': 'ok',
-                'version': version}
+                'version': get_version()}
 
 
 class ApplicationList(ConnectorResource):
@@ -32,9 +46,9 @@ class ApplicationList(ConnectorResource):
 
 class Application(ConnectorResource):
     def delete(self, app_id):
-#        if g.reseller.reseller_name != app_id:
-#            abort(403)
-#        g.reseller.delete()
+        # if g.reseller.reseller_name != app_id:
+        #     abort(403)
+        # g.reseller.delete()
         return {}, 204
 
 
@@ -0,0 +1,23 @@
+from flask_restful import abort
+
+from connector.jobs import jobs
+
+from . import ConnectorResource
+
+
+def job_status(job):
+    status = {'id': job['id'], 'status': job['status'],
+              'created': job['created_at'], 'updated': job['updated_at']}
+    if job['result'] is not None:
+        status['result'] = job['result']
+    if job['error'] is not None:
+        status['error'] = job['error']
+    return status
+
+
+class Job(ConnectorResource):
+    def get(self, job_id):
+        job = jobs.get(job_id)
+        if job is None:
+            abort(404, message='Job {} is not found'.format(job_id))
+        return job_status(job)
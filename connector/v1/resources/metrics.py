@@ -0,0 +1,42 @@
+from flask import make_response
+
+from connector.cache import caches
+from connector.metrics import CONTENT_TYPE, registry
+from connector.retry import policies
+from connector.tenants import tenant_store
+from connector.utils import handler as log_handler
+
+from . import ConnectorResource, memo_stats
+
+# counters kept by the connector for /stats, read when the metrics are flushed
+
+registry.collected('connector_upstream_retries_total', 'Retried OA and Box requests by upstream.',
+                   ('upstream',), lambda: {name: p.retries for name, p in policies.items()})
+
+registry.collected('connector_retry_budget_exhausted_total',
+                   'Retries skipped because the retry budget of the upstream was used up.',
+                   ('upstream',),
+                   lambda: {name: p.budget_exhausted for name, p in policies.items()})
+
+registry.collected('connector_cache_requests_total', 'Cache lookups by cache and result.',
+                   ('cache', 'result'),
+                   lambda: dict([((name, 'hit'), c.hits) for name, c in caches.items()] +
+                                [((name, 'miss'), c.misses) for name, c in caches.items()]))
+
+registry.collected('connector_tenant_store_requests_total', 'Tenant store lookups by result.',
+                   ('result',), lambda: {'hit': tenant_store.hits, 'miss': tenant_store.misses})
+
+registry.collected('connector_oa_memo_saved_calls_total',
+                   'OA calls served from the request memo by endpoint.',
+                   ('endpoint',), lambda: dict(memo_stats))
+
+registry.collected('connector_log_records_dropped_total',
+                   'Log records dropped because the log queue was full.',
+                   (), lambda: {(): log_handler.dropped})
+
+
+class Metrics(ConnectorResource):
+    def get(self):
+        response = make_response(registry.render())
+        response.headers['Content-Type'] = CONTENT_TYPE
+        return response
@@ -0,0 +1,29 @@
+from connector.breaker import breakers
+from connector.cache import caches
+from connector.client import box_sessions
+from connector.client.snapshot import enterprises
+from connector.client.usage import usage_collector
+from connector.config import Config
+from connector.jobs import jobs
+from connector.retry import policies
+from connector.tenants import tenant_store
+from connector.utils import handler as log_handler
+
+from . import ConnectorResource, memo_stats, oa_sessions
+
+
+class Stats(ConnectorResource):
+    def get(self):
+        stats = {'pools': {'oa': oa_sessions.stats(),
+                           'box': box_sessions.stats()},
+                 'caches': {name: cache.stats() for name, cache in caches.items()},
+                 'breakers': {name: breaker.stats() for name, breaker in breakers.items()},
+                 'retries': {name: policy.stats() for name, policy in policies.items()},
+                 'oa_memo_saved_calls': dict(memo_stats),
+                 'enterprise_snapshots': enterprises.stats(),
+                 'usage_collector': usage_collector.stats(),
+                 'tenant_store': tenant_store.stats(),
+                 'logging': log_handler.stats()}
+        if Config().async_provisioning:
+            stats['jobs'] = jobs.stats()
+        return stats
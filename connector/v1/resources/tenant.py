@@ -1,50 +1,70 @@
 import logging
-import sys
 import json
-from flask import g, make_response
+from flask import Response, g, make_response, request, stream_with_context, url_for
 
 from flask_restful import reqparse
 
+from connector.cache import make_cache, memoize
 from connector.config import Config
 from connector.client.user import User as BoxUser
 from connector.client.client import Client
-from connector.utils import escape_domain_name
+from connector.client.usage import usage_collector
+from connector.jobs import DONE, FAILED, QueueFullError, jobs
+from connector.tenants import tenant_store
 from slumber.exceptions import HttpClientError
 
-from . import (ConnectorResource, Memoize, OA, OACommunicationException,
-               parameter_validator, urlify)
+from . import ConnectorResource, OA, parameter_validator, run_concurrently, urlify
 
 
-logger = logging.getLogger(__file__)
-logger.setLevel(Config.loglevel)
-stream = logging.StreamHandler(sys.stdout)
-logger.addHandler(stream)
+logger = logging.getLogger(__name__)
 
 config = Config()
 
+tenant_cache = make_cache('tenant_enterprise',
+                          maxsize=config.tenant_cache_size,
+                          ttl=config.tenant_cache_ttl,
+                          negative_ttl=config.tenant_cache_negative_ttl)
 
-@Memoize
+
+@memoize(tenant_cache)
 def get_enterprise_id_for_tenant(tenant_id):
+    enterprise_id = tenant_store.get(tenant_id)
+    if enterprise_id is not None:
+        return enterprise_id
     tenant_resource = OA.get_resource(tenant_id)
     if 'tenantId' not in tenant_resource:
         raise KeyError("tenantId property is missing in OA resource {}".format(tenant_id))
     enterprise_id = tenant_resource['tenantId']
-    return None if enterprise_id == 'TBD' else enterprise_id
+    enterprise_id = None if enterprise_id == 'TBD' else enterprise_id
+    tenant_store.set(tenant_id, enterprise_id)
+    return enterprise_id
+
+
+def remember_enterprise(tenant_id, enterprise_id):
+    tenant_store.set(tenant_id, enterprise_id)
+    get_enterprise_id_for_tenant.set(enterprise_id, tenant_id)
 
 
-def make_user(client, oa_user):
+def forget_enterprise(tenant_id):
+    tenant_store.delete(tenant_id)
+    get_enterprise_id_for_tenant.invalidate(tenant_id)
+
+
+def make_user(client, oa_user, user_class=BoxUser):
     email = oa_user['email']
     name = oa_user['fullName']
     admin = oa_user['isAccountAdmin']
     phone = oa_user['telWork'] if admin else None
     if admin:
         oa_address = oa_user['addressPostal']
-        address = '{},{},{},{},{}'.format(oa_address['streetAddress'],oa_address['locality'],oa_address['region'],
-                                      oa_address['postalCode'],oa_address['countryName'])
+        address = '{},{},{},{},{}'.format(oa_address['streetAddress'], oa_address['locality'],
+                                          oa_address['region'], oa_address['postalCode'],
+                                          oa_address['countryName'])
     else:
         address = None
 
-    user = BoxUser(client=client, login=email, name=name, admin=admin, phone=phone, address=address)
+    user = user_class(client=client, login=email, name=name, admin=admin, phone=phone,
+                      address=address)
     return user
 
 
@@ -62,85 +82,150 @@ def map_tenant_type(limit):
         return None
     try:
         plan_code = config.tenant_type_map[limit]
-    except KeyError as e:
-        logger.error("Can't map limit {} to a BOX plan code, no entry in the map, aborting",format(limit))
+    except KeyError:
+        logger.error("Can't map limit %s to a BOX plan code, no entry in the map, aborting",
+                     limit)
 
     return plan_code
 
 
-class TenantList(ConnectorResource):
-    def post(self):
-        parser = reqparse.RequestParser()
-        parser.add_argument('aps', dest='aps_id', type=parameter_validator('id'),
-                            required=True,
-                            help='Missing aps.id in request')
-        parser.add_argument(config.users_resource, dest='users_limit',
-                            type=parameter_validator('limit'),
-                            required=False,
-                            help='Missing {} limit in request'.format(config.users_resource))
-        parser.add_argument(config.tenant_type_resource, dest='ttype_limit',
-                            type=parameter_validator('limit'),
-                            required=False,
-                            help='Missing {} limit in request'.format(config.tenant_type_resource))
-        parser.add_argument('oaSubscription', dest='sub_id', type=parameter_validator('aps', 'id'),
-                            required=True,
-                            help='Missing link to subscription in request')
-        parser.add_argument('oaAccount', dest='acc_id', type=parameter_validator('aps', 'id'),
-                            required=True,
-                            help='Missing link to account in request')
+def parse_tenant_args():
+    parser = reqparse.RequestParser()
+    parser.add_argument('aps', dest='aps_id', type=parameter_validator('id'),
+                        required=True,
+                        help='Missing aps.id in request')
+    parser.add_argument(config.users_resource, dest='users_limit',
+                        type=parameter_validator('limit'),
+                        required=False,
+                        help='Missing {} limit in request'.format(config.users_resource))
+    parser.add_argument(config.tenant_type_resource, dest='ttype_limit',
+                        type=parameter_validator('limit'),
+                        required=False,
+                        help='Missing {} limit in request'.format(config.tenant_type_resource))
+    parser.add_argument('oaSubscription', dest='sub_id', type=parameter_validator('aps', 'id'),
+                        required=True,
+                        help='Missing link to subscription in request')
+    parser.add_argument('oaAccount', dest='acc_id', type=parameter_validator('aps', 'id'),
+                        required=True,
+                        help='Missing link to account in request')
+
+    return parser.parse_args()
+
+
+def provision_tenant(args):
+    """Create the Box enterprise of a new subscription and link its admin in OA, return its id."""
+    resources, admins, application = run_concurrently(
+        lambda: OA.get_resources_by_ids([args.acc_id, args.sub_id]),
+        lambda: OA.send_request('GET', '/aps/2/resources?implementing('
+                                       'http://parallels.com/aps/types/pa/admin-user/1.0)',
+                                impersonate_as=args.aps_id),
+        lambda: OA.send_request('GET', '/aps/2/application'))
+
+    if not admins:
+        raise KeyError("No admins in OA account {}".format(args.acc_id))
+
+    admin_user = admins[0]
+
+    # set before the OA link below, a job run again after job_timeout or a request
+    # repeated by APS must not create a second enterprise
+    enterprise_id = tenant_store.get(args.aps_id)
+    if enterprise_id is not None:
+        logger.info("Enterprise %s of tenant %s exists already, linking it in OA",
+                    enterprise_id, args.aps_id)
+        client = Client(g.reseller, enterprise_id=enterprise_id)
+        if enterprise_id != 'SECOND':
+            client.refresh('administered_by')
+    else:
+        client = create_client(args, resources, admin_user)
+        remember_enterprise(args.aps_id, client.enterprise_id)
 
-        args = parser.parse_args()
+    # link BOX tenant to the user in OA
+    user_type = application['user']['type']
+    user_id = client.administered_by['user_id'] if client.enterprise_id != 'SECOND' else 'SECOND'
+    OA.send_request('POST', '/aps/2/application/user', body={
+        'aps': {'type': user_type},
+        'userId': user_id,
+        'user': {'aps': {'id': admin_user['aps']['id']}},
+        'tenant': {'aps': {'id': args.aps_id}}
+    }, impersonate_as=args.aps_id)
 
-        company_name = OA.get_resource(args.acc_id)['companyName']
-        sub_id = OA.get_resource(args.sub_id)['subscriptionId']
-        company_name = '{}-sub{}'.format(company_name if company_name else 'Unnamed', sub_id)
-        plan_code = map_tenant_type(args.ttype_limit)
+    g.enterprise_id = client.enterprise_id
+    return client.enterprise_id
+
+
+def create_client(args, resources, admin_user):
+    """Create the Box enterprise administered by ``admin_user``, return its client."""
+    company_name = resources[args.acc_id]['companyName']
+    sub_id = resources[args.sub_id]['subscriptionId']
+    company_name = '{}-sub{}'.format(company_name if company_name else 'Unnamed', sub_id)
+    plan_code = map_tenant_type(args.ttype_limit)
+
+    client = Client(g.reseller, name=company_name, users_limit=args.users_limit,
+                    plan_code=plan_code)
+
+    user = make_user(client, admin_user)
+
+#    user = make_default_user(client)
 
-        client = Client(g.reseller, name=company_name, users_limit=args.users_limit, plan_code=plan_code)
-
-        admins = OA.send_request('GET',
-                                 '/aps/2/resources?implementing(http://parallels.com/aps/types/pa/admin-user/1.0)',
-                                 impersonate_as=args.aps_id)
-        if not admins:
-            raise KeyError("No admins in OA account {}".format(args.acc_id))
-
-        admin_user = admins[0]
-
-        user = make_user(client, admin_user)
-
-#        user = make_default_user(client)
-
-        try:
-            client.create(user)
-        except HttpClientError as e:
-            r = e.response
-            if r.status_code == 400:
-                c = json.loads(r.content)
-                error = c['context_info']['errors'][0]
-                if error['reason'] == 'invalid_parameter' and error['name'] == 'master_login':
-                    logger.info("Attempt to create a subscription with admin already registered in BOX, "
-                                "we concider it as a second subscrpiption case which is not supported now, "
-                                 "so we just skip it returning fake enterprise_id for the sake of passigng"
-                                 "APS Connect publishing test : %s", error)
-                    # We don't support two subscriptions for one box account for now, skip it for the sake of APS Connect publishing test
-                    # TODO: there should be better handling to distinguish second subscrption from the user existing under other account
-                    client.enterprise_id = 'SECOND'
-                else:
-                    raise e
-
-        # link BOX tenant to the user in OA
-        user_type = OA.send_request('GET', '/aps/2/application')['user']['type']
-        OA.send_request('POST', '/aps/2/application/user', body=
-            {
-            'aps': {'type': user_type},
-            'userId': client.administered_by['user_id'] if client.enterprise_id != 'SECOND' else 'SECOND',
-            'user': {'aps': {'id': admin_user['aps']['id']}},
-            'tenant': {'aps': {'id': args.aps_id}}
-            },
-            impersonate_as=args.aps_id)
-
-        g.enterprise_id = client.enterprise_id
-        return {'tenantId': client.enterprise_id}, 201
+    try:
+        client.create(user)
+    except HttpClientError as e:
+        r = e.response
+        if r.status_code == 400:
+            c = json.loads(r.content)
+            error = c['context_info']['errors'][0]
+            if error['reason'] == 'invalid_parameter' and error['name'] == 'master_login':
+                logger.info("Attempt to create a subscription with admin already registered in "
+                            "BOX, we concider it as a second subscrpiption case which is not "
+                            "supported now, so we just skip it returning fake enterprise_id for "
+                            "the sake of passigng APS Connect publishing test : %s", error)
+                # We don't support two subscriptions for one box account for now,
+                # skip it for the sake of APS Connect publishing test
+                # TODO: there should be better handling to distinguish second subscrption
+                # from the user existing under other account
+                client.enterprise_id = 'SECOND'
+            else:
+                raise e
+    return client
+
+
+def provision_later(args):
+    """Provision the tenant on the job queue, following the APS asynchronous provisioning.
+
+    The first request is answered with ``202`` and APS repeats it every
+    ``Aps-Retry-Timeout`` seconds until the job is done.
+    """
+    try:
+        job = jobs.submit('tenant', args.aps_id, {'headers': job_headers(),
+                                                  'body': request.get_json(),
+                                                  'client_key': g.oauth.client_key})
+    except QueueFullError as e:
+        return {'message': str(e)}, 503, {'Retry-After': str(config.job_retry_timeout)}
+    if job['status'] == DONE:
+        g.enterprise_id = job['result']
+        return {'tenantId': job['result']}, 201
+    if job['status'] == FAILED:
+        # the next request of APS provisions again
+        jobs.discard(job['id'])
+        return {'message': job['error']}, 500
+    return ({'jobId': job['id'], 'status': job['status']}, 202,
+            {'Aps-Retry-Timeout': str(config.job_retry_timeout),
+             'Aps-Info': 'Box enterprise provisioning is {}'.format(job['status']),
+             'Location': url_for('v1.job', job_id=job['id'])})
+
+
+def job_headers():
+    # the APS transaction ends with this request, the job does not take part in it
+    return {name: request.headers[name] for name in ('Aps-Instance-Id', 'Aps-Controller-Uri')
+            if name in request.headers}
+
+
+class TenantList(ConnectorResource):
+    def post(self):
+        args = parse_tenant_args()
+        if config.async_provisioning:
+            return provision_later(args)
+        return {'tenantId': provision_tenant(args)}, 201
 
 
 class Tenant(ConnectorResource):
@@ -148,11 +233,14 @@ class Tenant(ConnectorResource):
         enterprise_id = g.enterprise_id = get_enterprise_id_for_tenant(tenant_id)
         if enterprise_id == 'SECOND':
             return {}
-        client = Client(g.reseller, enterprise_id = enterprise_id)
-        client.refresh()
+        usage = usage_collector.get(enterprise_id)
+        if usage is None:
+            client = Client(g.reseller, enterprise_id=enterprise_id)
+            client.refresh('users_amount')
+            usage = client.users_amount
         return {
             config.users_resource: {
-                'usage': client.users_amount
+                'usage': usage
             }
         }
 
@@ -181,6 +269,7 @@ class Tenant(ConnectorResource):
         if enterprise_id != 'SECOND':
             client = Client(g.reseller, enterprise_id=enterprise_id)
             client.delete()
+        forget_enterprise(tenant_id)
         return None, 204
 
 
@@ -204,43 +293,26 @@ class TenantAdminLogin(ConnectorResource):
         return response
 
 
-class TenantUserCreated(ConnectorResource):
-    def post(self, oa_tenant_id):
-        return {}
-        enterprise_id = get_enterprise_id_for_tenant(oa_tenant_id)
-        if enterprise_id:
-            # existing tenant, do  nothing, user will be created in the user request
-            g.enterprise_id = enterprise_id
-            return {}
-
-        #  Enterprise creation has been delayed until first user provisioning, let's do it now
-        parser = reqparse.RequestParser()
-
-        parser.add_argument('tenant', dest='oa_sub_id', type=parameter_validator('aps', 'subscription'),
-                            required=True,
-                            help='Missing link to subscription in request')
-        parser.add_argument('user', dest='oa_user_id', type=parameter_validator('aps', 'id'),
-                            required=True,
-                            help='Missing link to users list in request')
-
-        args = parser.parse_args()
+def user_summary(user):
+    return {'userId': user.user_id, 'login': user.login, 'name': user.name,
+            'status': user.status, 'admin': user.admin}
 
-        oa_user = OA.get_resource(args.oa_user_id)
-        sub_id = OA.get_resource(args.oa_sub_id)['subscriptionId']
-        oa_tenant = OA.get_resource(oa_tenant_id)
-        oa_account = OA.get_resource(oa_tenant['oaAccount']['aps']['id'])
 
-        company_name = oa_account['companyName']
-        company_name = '{}-sub{}'.format(company_name if company_name else 'Unnamed', sub_id)
-        users_limit = oa_tenant[config.users_resource]['limit']
+class TenantUserCreated(ConnectorResource):
+    def get(self, oa_tenant_id):
+        """Stream the Box users of the tenant as NDJSON, one user per line."""
+        enterprise_id = g.enterprise_id = get_enterprise_id_for_tenant(oa_tenant_id)
+        users = ()
+        if enterprise_id and enterprise_id != 'SECOND':
+            users = Client(g.reseller, enterprise_id=enterprise_id).users(config.users_page_size)
+        lines = (json.dumps(user_summary(user)) + '\n' for user in users)
+        return Response(stream_with_context(lines), mimetype='application/x-ndjson')
 
-        client = Client(g.reseller, name=company_name, users_limit=users_limit)
-        user = make_user(client, oa_user)
-        client.create(user)
-        g.enterprise_id = enterprise_id = client.enterprise_id
-        # todo: save tenantId
+    def post(self, oa_tenant_id):
+        # the enterprise is created with the tenant and the user by POST /user
         return {}
 
+
 class TenantUserRemoved(ConnectorResource):
     def delete(self, tenant_id, user_id):
         return {}
@@ -1,20 +1,21 @@
+from collections import OrderedDict
+
 from flask import g, make_response
 from flask_restful import reqparse
 
+from connector.breaker import CircuitOpenError
 from connector.config import Config
 from connector.client.client import Client
 from connector.client.user import User as BoxUser
 from connector.v1.resources.tenant import get_enterprise_id_for_tenant, make_user
-from . import ConnectorResource, OA, parameter_validator
-from slumber.exceptions import HttpNotFoundError
+from . import (ConnectorResource, OA, bulk_executor, make_error, make_unavailable_error,
+               map_concurrently, parameter_validator)
+from slumber.exceptions import HttpClientError, HttpNotFoundError, HttpServerError
 import logging
-import sys
 
 config = Config()
-logger = logging.getLogger(__file__)
-logger.setLevel(logging.DEBUG)
-stream = logging.StreamHandler(sys.stdout)
-logger.addHandler(stream)
+logger = logging.getLogger(__name__)
+
 
 class UserList(ConnectorResource):
     def post(self):
@@ -35,17 +36,10 @@ class UserList(ConnectorResource):
             return {'userId': 'SECOND'}, 201
 
         client = Client(g.reseller, enterprise_id=enterprise_id)
-        client.refresh()
+        client.refresh('administered_by')
 
         oa_user = OA.get_resource(args.oa_user_id)
-
-        if client.administered_by['login'] == oa_user['email']:
-            # this user has been created as part of tenant registration, just return ID
-            return {'userId': client.administered_by['user_id']}, 201
-
-        user = make_user(client, oa_user)
-        user.create()
-        return {'userId': user.user_id}, 201
+        return {'userId': create_user(client, oa_user)}, 201
 
 
 class User(ConnectorResource):
@@ -53,23 +47,14 @@ class User(ConnectorResource):
         user = make_box_user(oa_user_service_id)
         enterprise_id = g.enterprise_id = user.client.enterprise_id
         if user.user_id == 'SECOND':
-            logger.info("A crutch for the second subscription support, skipping deletion of fake user")
+            logger.info("A crutch for the second subscription support, "
+                        "skipping deletion of fake user")
             return {}, 204
 
         # Check that this user is not assigned to the enterprise as admin
         client = Client(g.reseller, enterprise_id=enterprise_id)
-        client.refresh()
-        if client.administered_by['user_id'] == user.user_id:
-            # this user has been created as part of tenant registration, we can't remove it
-            # TODO: repoint enterprise to another user, for now just skip deletion
-            logger.info("User %s is assigned as the tenant admin, we can't delete it, skipping deletion", user.user_id)
-            return {}, 204
-
-        try:
-            user.delete()
-        except HttpNotFoundError:
-            logger.info("User %s is not found in BOX, skip deletion", user.user_id)
-
+        client.refresh('administered_by')
+        delete_user(client, user)
         return {}, 204
 
     def put(self, oa_user_service_id):
@@ -98,6 +83,108 @@ class UserLogin(ConnectorResource):
         return response
 
 
+class TenantUsersBulk(ConnectorResource):
+    """Creates or deletes many users of a tenant, the result is reported per user."""
+
+    def parse_args(self):
+        parser = reqparse.RequestParser()
+        parser.add_argument('users', type=str, action='append', required=True,
+                            help='Missing list of user ids in request')
+        args = parser.parse_args()
+        # a repeated id would create or delete the same user concurrently
+        args.users = list(OrderedDict.fromkeys(args.users))
+        return args
+
+    def refreshed_client(self, tenant_id):
+        enterprise_id = g.enterprise_id = get_enterprise_id_for_tenant(tenant_id)
+        if enterprise_id == 'SECOND':
+            return None
+        client = Client(g.reseller, enterprise_id=enterprise_id)
+        client.refresh('administered_by')
+        return client
+
+    def post(self, tenant_id):
+        """Create the Box users of OA users ``{"users": [<OA user id>, ...]}``."""
+        args = self.parse_args()
+        client = self.refreshed_client(tenant_id)
+        if client is None:
+            return {'users': [{'id': i, 'status': 201, 'userId': 'SECOND'} for i in args.users]}
+
+        # resources missing from the RQL query are fetched by their user, failing just that user
+        oa_users = OA.get_resources_by_ids(args.users, fetch_missing=False)
+
+        def create(oa_user_id):
+            def create_one():
+                oa_user = oa_users.get(oa_user_id) or OA.get_resource(oa_user_id)
+                return {'userId': create_user(client, oa_user)}
+            return bulk_result(oa_user_id, 201, create_one)
+
+        return {'users': map_concurrently(create, args.users, bulk_executor)}
+
+    def delete(self, tenant_id):
+        """Delete the Box users of OA user services ``{"users": [<OA resource id>, ...]}``."""
+        args = self.parse_args()
+        client = self.refreshed_client(tenant_id)
+        if client is None:
+            return {'users': [{'id': i, 'status': 204} for i in args.users]}
+
+        oa_user_services = OA.get_resources_by_ids(args.users, fetch_missing=False)
+
+        def delete(oa_user_service_id):
+            def delete_one():
+                oa_user_service = (oa_user_services.get(oa_user_service_id) or
+                                   OA.get_resource(oa_user_service_id))
+                delete_user(client, BoxUser(client=client, user_id=oa_user_service['userId']))
+            return bulk_result(oa_user_service_id, 204, delete_one)
+
+        return {'users': map_concurrently(delete, args.users, bulk_executor)}
+
+
+def bulk_result(oa_id, status, function):
+    """Run ``function`` for one user of a bulk request, turn errors into the user's result."""
+    try:
+        result = function() or {}
+    except (HttpClientError, HttpServerError) as e:
+        body, status = make_error(e)
+    except CircuitOpenError as e:
+        body, status, _ = make_unavailable_error(e)
+    except Exception as e:
+        # e.g. an OA error or incomplete OA data, the other users of the request are not affected
+        logger.exception("Bulk operation on user %s failed", oa_id)
+        body, status = {'message': '{}: {}'.format(e.__class__.__name__, e)}, 500
+    else:
+        result.update({'id': oa_id, 'status': status})
+        return result
+    logger.info("Bulk operation on user %s failed with %s: %s", oa_id, status, body['message'])
+    return {'id': oa_id, 'status': status, 'message': body['message']}
+
+
+def create_user(client, oa_user):
+    """Create the Box user of ``oa_user`` in the refreshed ``client``, return its id."""
+    if client.administered_by['login'] == oa_user['email']:
+        # this user has been created as part of tenant registration, just return ID
+        return client.administered_by['user_id']
+
+    user = make_user(client, oa_user)
+    user.create()
+    return user.user_id
+
+
+def delete_user(client, user):
+    """Delete ``user`` unless it is the admin of the refreshed ``client``."""
+    if client.administered_by['user_id'] == user.user_id:
+        # this user has been created as part of tenant registration, we can't remove it
+        # TODO: repoint enterprise to another user, for now just skip deletion
+        logger.info("User %s is assigned as the tenant admin, we can't delete it, "
+                    "skipping deletion", user.user_id)
+        return
+
+    try:
+        user.delete()
+    except HttpNotFoundError:
+        logger.info("User %s is not found in BOX, skip deletion", user.user_id)
+
+
 def make_box_user(oa_user_service_id):
     oa_user_service = OA.get_resource(oa_user_service_id)
     oa_tenant_id = oa_user_service['tenant']['aps']['id']
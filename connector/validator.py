@@ -1,7 +1,15 @@
+from collections import namedtuple
+
 from oauthlib import oauth1 as oauth
+from requests_oauthlib import OAuth1
 
 from connector.config import Config
 
+OAuthResult = namedtuple('OAuthResult', ['valid', 'client_key'])
+
+# OAuth1 signers of outgoing OA requests by client key, they hold no per-request state
+signers = {}
+
 
 class RequestValidator(oauth.RequestValidator):
     enforce_ssl = False
@@ -35,21 +43,36 @@ class RequestValidator(oauth.RequestValidator):
                                      request_token=None, access_token=None):
         return True  # we don't validate nonce and timestamp
 
-    def validate_signature(self, url, command, body_string, headers):
-        result, request = self.endpoint.validate_request(url, command, body_string, headers)
-        return result
 
-    def get_request(self, url, command, body_string, headers):
-        result, request = self.endpoint.validate_request(url, command, body_string, headers)
-        return request
+validator = RequestValidator()
+
+
+def verify_request(request):
+    """Validate the OAuth signature of ``request``, parsing it only once.
+
+    The client key is returned even if the signature does not match.
+    """
+    try:
+        valid, oauth_request = validator.endpoint.validate_request(request.url, request.method,
+                                                                   request.data, request.headers)
+    except ValueError:
+        # an Authorization header of another scheme, e.g. the bearer metrics token
+        return OAuthResult(False, None)
+    return OAuthResult(valid, oauth_request.client_key if oauth_request else None)
 
 
 def check_oauth_signature(request):
-    return RequestValidator().validate_signature(request.url, request.method, request.data,
-                                                 request.headers)
+    return verify_request(request).valid
 
 
 def get_client_key(request):
-    oauth_request = RequestValidator().get_request(request.url, request.method, request.data,
-                                                   request.headers)
-    return oauth_request.client_key if oauth_request else None
+    return verify_request(request).client_key
+
+
+def get_signer(client_key):
+    """Signer of outgoing requests, only call it with verified client keys."""
+    signer = signers.get(client_key)
+    if signer is None:
+        signer = signers[client_key] = OAuth1(client_key=client_key,
+                                              client_secret=validator._config.oauth_signature)
+    return signer
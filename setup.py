@@ -1,4 +1,5 @@
 import codecs
+import sys
 
 from os.path import abspath, dirname, join
 
@@ -16,17 +17,20 @@ with codecs.open(join(here, 'README.md'), encoding='utf-8') as f:
     long_description = f.read()
 
 install_reqs = parse_requirements(join(here, 'requirements.txt'), session=False)
-reqs = [str(ir.req) for ir in install_reqs]
+reqs = [str(ir.req) + ('; {}'.format(ir.markers) if ir.markers else '') for ir in install_reqs]
 
 setup(
     name='box-connector',
     version=PACKAGE_VERSION,
     author='APAC PS team',
     author_email='alinovskiy@odin.com',
-    packages=find_packages(exclude=['tests']),
+    # connector.aio uses async syntax, it is left out where it cannot be compiled
+    packages=find_packages(exclude=['tests', 'benchmarks'] +
+                           (['connector.aio'] if sys.version_info < (3, 5) else [])),
     include_package_data=True,
     setup_requires=['nose>=1.0'],
     install_requires=reqs,
+    extras_require={'async': ['aiohttp>=3.3']},
     url='https://github.com/odin-public/',
     license='Apache License',
     description='A sample connector for FallBall file sharing application',
@@ -0,0 +1,6 @@
+import sys
+from unittest import SkipTest
+
+if sys.version_info < (3, 5):
+    # the modules of the package use async syntax, they must not even be imported
+    raise SkipTest('the asyncio application requires Python 3.5+')
@@ -0,0 +1,237 @@
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+from unittest import TestCase, skipIf
+
+from mock import patch
+
+from connector.validator import OAuthResult
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+def call(app, method, path, body=None, headers=None):
+    loop = asyncio.new_event_loop()
+    messages = []
+
+    def receive():
+        future = loop.create_future()
+        future.set_result({'type': 'http.request',
+                           'body': json.dumps(body).encode('utf-8') if body else b''})
+        return future
+
+    def send(message):
+        messages.append(message)
+        future = loop.create_future()
+        future.set_result(None)
+        return future
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'',
+             'headers': [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]}
+    try:
+        loop.run_until_complete(app(scope, receive, send))
+    finally:
+        loop.close()
+    payload = b''.join(message['body'] for message in messages[1:])
+    content_type = dict(messages[0]['headers']).get(b'content-type', b'')
+    if content_type == b'application/x-ndjson':
+        return messages[0]['status'], [json.loads(line)
+                                       for line in payload.decode('utf-8').splitlines()]
+    if content_type.startswith(b'text/plain'):
+        return messages[0]['status'], payload.decode('utf-8')
+    return messages[0]['status'], json.loads(payload.decode('utf-8')) if payload else None
+
+
+@skipIf(sys.version_info < (3, 5) or aiohttp is None, 'asyncio application requires aiohttp')
+class TestAsyncApp(TestCase):
+    def setUp(self):
+        from connector.aio import app
+
+        self.module = app
+        self.headers = {'Content-type': 'application/json',
+                        'aps-instance-id': '123-123-123',
+                        'aps-controller-uri': 'https://aps.com'}
+
+    def test_same_routes_as_wsgi(self):
+        from connector.aio.resources import resource_routes
+        from connector.v1 import resource_routes as wsgi_routes
+
+        assert set(resource_routes) == set(wsgi_routes)
+        for route, resource in resource_routes.items():
+            assert resource.__name__ == wsgi_routes[route].__name__
+
+    def test_healthcheck(self):
+        status, data = call(self.module.app, 'GET', '/v1/')
+        assert status == 200
+        assert data['status'] == 'ok'
+
+    def test_no_authorization(self):
+        status, _ = call(self.module.app, 'DELETE', '/v1/app/12345')
+        assert status == 401
+
+    def test_stats_requires_signature(self):
+        assert call(self.module.app, 'GET', '/v1/stats')[0] == 401
+        with patch.object(self.module, 'verify_request', return_value=OAuthResult(True, 'key')):
+            status, data = call(self.module.app, 'GET', '/v1/stats')
+        assert status == 200
+        assert 'pools' in data
+
+    def test_metrics(self):
+        from connector.metrics import config, registry
+
+        assert call(self.module.app, 'GET', '/v1/metrics')[0] == 401
+        with patch.object(registry, 'directory', None), \
+                patch.object(config, 'metrics_token', 'secret'):
+            call(self.module.app, 'DELETE', '/v1/app/12345')
+            status, text = call(self.module.app, 'GET', '/v1/metrics',
+                                headers={'Authorization': 'Bearer secret'})
+        assert status == 200
+        assert any(line.startswith('connector_request_duration_seconds_count{'
+                                   'route="/v1/app/<app_id>",method="DELETE",status="401"}')
+                   for line in text.splitlines())
+
+    def test_open_breaker_on_token_fetch(self):
+        from tests.test_breaker import open_box_breaker
+
+        open_box_breaker(self)
+        with patch.object(self.module, 'verify_request', return_value=OAuthResult(True, 'key')):
+            status, data = call(self.module.app, 'GET', '/v1/tenant/t-1', headers=self.headers)
+        assert status == 503
+        assert 'box' in data['message']
+
+    def test_new_app(self):
+        with patch.object(self.module, 'verify_request', return_value=OAuthResult(True, 'key')), \
+                patch('connector.aio.client.reseller_tokens') as tokens:
+            tokens.get.return_value = 'token'
+            status, data = call(self.module.app, 'POST', '/v1/app', headers=self.headers,
+                                body={'aps': {'type': 'http://new.app', 'id': '123'}})
+        assert status == 201
+        assert data['aps']['id'] == '123'
+
+    def test_missing_argument(self):
+        with patch.object(self.module, 'verify_request', return_value=OAuthResult(True, 'key')), \
+                patch('connector.aio.client.reseller_tokens') as tokens:
+            tokens.get.return_value = 'token'
+            status, data = call(self.module.app, 'POST', '/v1/tenant', headers=self.headers,
+                                body={'aps': {'id': '123'}})
+        assert status == 400
+        assert 'oaSubscription' in data['message']
+
+    def test_stream_tenant_users(self):
+        from connector.aio.upstream import AsyncBoxAPI
+        from connector.v1.resources.tenant import get_enterprise_id_for_tenant
+
+        pages = {None: {'entries': [{'id': '1', 'name': 'A', 'login': 'a@example.com'}],
+                        'total_count': 2},
+                 1: {'entries': [{'id': '2', 'name': 'B', 'login': 'b@example.com'}],
+                     'total_count': 2}}
+
+        async def get(api, path, params=None):
+            assert path == 'enterprises/e-1/users'
+            return pages[params.get('offset')]
+
+        get_enterprise_id_for_tenant.set('e-1', 't-1')
+        self.addCleanup(get_enterprise_id_for_tenant.invalidate, 't-1')
+        with patch.object(self.module, 'verify_request', return_value=OAuthResult(True, 'key')), \
+                patch('connector.aio.client.reseller_tokens') as tokens, \
+                patch.object(AsyncBoxAPI, 'get', get):
+            tokens.get.return_value = 'token'
+            status, data = call(self.module.app, 'GET', '/v1/tenant/t-1/users',
+                                headers=self.headers)
+        assert status == 200
+        assert [user['userId'] for user in data] == ['1', '2']
+
+    def test_bulk_failure_of_one_user(self):
+        from connector.aio import resources
+        from connector.aio.upstream import AsyncOA, UpstreamResponse
+        from connector.v1.resources import OACommunicationException
+
+        async def refresh(client, field=None):
+            client.administered_by = {'login': 'admin@example.com', 'user_id': 'box-admin'}
+
+        async def get_resources_by_ids(oa, ids, fetch_missing=True):
+            assert ids == ['u-1', 'u-2'] and not fetch_missing
+            return {'u-1': {'email': 'admin@example.com'}}
+
+        async def get_resource(oa, resource_id):
+            raise OACommunicationException(UpstreamResponse(404, 'not found'))
+
+        async def enterprise_id(oa, tenant_id):
+            return 'e-1'
+
+        with patch.object(self.module, 'verify_request', return_value=OAuthResult(True, 'key')), \
+                patch('connector.aio.client.reseller_tokens') as tokens, \
+                patch.object(resources, 'get_enterprise_id_for_tenant', enterprise_id), \
+                patch.object(resources.AsyncClient, 'refresh', refresh), \
+                patch.object(AsyncOA, 'get_resources_by_ids', get_resources_by_ids), \
+                patch.object(AsyncOA, 'get_resource', get_resource):
+            tokens.get.return_value = 'token'
+            status, data = call(self.module.app, 'POST', '/v1/tenant/t-1/users/bulk',
+                                headers=self.headers, body={'users': ['u-1', 'u-2', 'u-1']})
+        assert status == 200
+        assert [(user['id'], user['status']) for user in data['users']] == [('u-1', 201),
+                                                                            ('u-2', 500)]
+
+    def test_repeated_tenant_after_failed_link(self):
+        from connector.aio import resources
+        from connector.aio.upstream import AsyncOA, UpstreamResponse
+        from connector.tenants import TenantStore
+        from connector.v1.resources import OACommunicationException
+        from connector.v1.resources.tenant import get_enterprise_id_for_tenant
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.addCleanup(get_enterprise_id_for_tenant.invalidate, 'tenant-1')
+        store = TenantStore(os.path.join(directory, 'tenants.sqlite'))
+        created, refreshed, links = [], [], []
+
+        async def get_resources_by_ids(oa, ids, fetch_missing=True):
+            return {'acc-1': {'companyName': 'Company'}, 'sub-1': {'subscriptionId': 1}}
+
+        async def send_request(oa, method, path, body=None, **kwargs):
+            if method == 'POST':
+                links.append(body['userId'])
+                if len(links) == 1:
+                    raise OACommunicationException(UpstreamResponse(500, 'timeout'))
+                return {}
+            if 'admin-user' in path:
+                return [{'aps': {'id': 'admin-1'}, 'email': 'admin@example.com'}]
+            return {'user': {'type': 'http://box/user'}}
+
+        async def create(client, administered_by):
+            created.append(client)
+            client.enterprise_id = 'e-1'
+            client.administered_by = {'user_id': 'box-admin'}
+
+        async def refresh(client, field=None):
+            refreshed.append(field)
+            client.administered_by = {'user_id': 'box-admin'}
+
+        body = {'aps': {'id': 'tenant-1'}, 'oaSubscription': {'aps': {'id': 'sub-1'}},
+                'oaAccount': {'aps': {'id': 'acc-1'}}}
+        with patch.object(self.module, 'verify_request', return_value=OAuthResult(True, 'key')), \
+                patch('connector.aio.client.reseller_tokens') as tokens, \
+                patch.object(resources, 'tenant_store', store), \
+                patch('connector.v1.resources.tenant.tenant_store', store), \
+                patch.object(resources, 'make_user'), \
+                patch.object(resources.AsyncClient, 'create', create), \
+                patch.object(resources.AsyncClient, 'refresh', refresh), \
+                patch.object(AsyncOA, 'get_resources_by_ids', get_resources_by_ids), \
+                patch.object(AsyncOA, 'send_request', send_request):
+            tokens.get.return_value = 'token'
+            assert call(self.module.app, 'POST', '/v1/tenant', headers=self.headers,
+                        body=body)[0] != 201
+            assert store.get('tenant-1') == 'e-1'
+            status, data = call(self.module.app, 'POST', '/v1/tenant', headers=self.headers,
+                                body=body)
+        assert status == 201
+        assert data == {'tenantId': 'e-1'}
+        assert len(created) == 1
+        assert refreshed == ['administered_by']
+        assert links == ['box-admin', 'box-admin']
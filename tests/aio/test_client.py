@@ -0,0 +1,56 @@
+import asyncio
+import sys
+from unittest import TestCase, skipIf
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+@skipIf(sys.version_info < (3, 5) or aiohttp is None, 'asyncio application requires aiohttp')
+class TestPaginate(TestCase):
+    def setUp(self):
+        from connector.aio import client
+
+        self.client = client
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.queries = []
+
+    async def fetch_page(self, query):
+        self.queries.append(query)
+        offset = query.get('offset', 0)
+        return {'entries': [{'id': str(i)} for i in range(offset, min(offset + 2, 5))],
+                'total_count': 5}
+
+    def test_entries(self):
+        async def ids():
+            entries = await collect(await self.client.paginate(self.fetch_page, page_size=2))
+            return [entry['id'] for entry in entries]
+
+        assert self.loop.run_until_complete(ids()) == ['0', '1', '2', '3', '4']
+        assert [query.get('offset') for query in self.queries] == [None, 2, 4]
+
+    def test_close_cancels_prefetch(self):
+        async def first():
+            entries = await self.client.paginate(self.fetch_page, page_size=2)
+            entry = await entries.__anext__()
+            next_page = entries.next_page
+            entries.close()
+            return entry, next_page
+
+        entry, next_page = self.loop.run_until_complete(first())
+        assert entry == {'id': '0'}
+        assert next_page.cancelled()
+
+    def test_empty(self):
+        users = self.client.AsyncMap(str, self.client.AsyncIterator())
+        assert self.loop.run_until_complete(collect(users)) == []
+
+
+async def collect(iterator):
+    items = []
+    async for item in iterator:
+        items.append(item)
+    return items
@@ -0,0 +1,113 @@
+import asyncio
+import sys
+from unittest import TestCase, skipIf
+
+from mock import MagicMock, patch
+from oauthlib.oauth1 import Client
+
+from connector.retry import RetryPolicy
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def responses(*results):
+    """Coroutine function returning or raising ``results`` one by one."""
+    results = list(results)
+    calls = []
+
+    async def send(*args, **kwargs):
+        calls.append(args)
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    send.calls = calls
+    return send
+
+
+@skipIf(sys.version_info < (3, 5) or aiohttp is None, 'asyncio application requires aiohttp')
+class TestRetryCall(TestCase):
+    def setUp(self):
+        from connector.aio import upstream
+
+        self.upstream = upstream
+
+        async def sleep(delay):
+            pass
+
+        patcher = patch.object(upstream.asyncio, 'sleep', sleep)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_timeout_is_retried(self):
+        policy = RetryPolicy('test_aio_timeout', max_attempts=3)
+        send = responses(asyncio.TimeoutError(), aiohttp.ClientOSError(),
+                         self.upstream.UpstreamResponse(200, '{}'))
+        assert run(self.upstream.retry_call(policy, 'GET', send)).status_code == 200
+        assert len(send.calls) == 3
+        assert policy.stats()['attempts_per_call'] == {3: 1}
+
+    def test_non_idempotent_method_is_not_retried(self):
+        policy = RetryPolicy('test_aio_method')
+        send = responses(asyncio.TimeoutError())
+        self.assertRaises(asyncio.TimeoutError, run, self.upstream.retry_call(policy, 'POST', send))
+        assert len(send.calls) == 1
+
+    def test_retriable_status(self):
+        policy = RetryPolicy('test_aio_status', max_attempts=2)
+        send = responses(self.upstream.UpstreamResponse(503, ''),
+                         self.upstream.UpstreamResponse(503, ''))
+        assert run(self.upstream.retry_call(policy, 'POST', send)).status_code == 503
+        assert len(send.calls) == 2
+
+    def test_box_request_uses_box_policy(self):
+        from connector.client import box_sessions
+
+        guarded_request = responses(self.upstream.UpstreamResponse(503, ''),
+                                    self.upstream.UpstreamResponse(200, '{"id": "1"}'))
+        api = self.upstream.AsyncBoxAPI(base_url='https://box.com/', token='token')
+        with patch.object(self.upstream, 'guarded_request', guarded_request), \
+                patch.object(api, 'session', MagicMock()):
+            assert run(api.get('users/1')) == {'id': '1'}
+        assert len(guarded_request.calls) == 2
+        assert box_sessions.retry.retries >= 1
+
+    def test_oa_request_retries_connection_errors(self):
+        guarded_request = responses(aiohttp.ClientOSError(),
+                                    self.upstream.UpstreamResponse(200, '[]'))
+        oa = self.upstream.AsyncOA('https://aps.com/')
+        with patch.object(self.upstream, 'guarded_request', guarded_request), \
+                patch.object(oa, 'session', MagicMock()):
+            assert run(oa.get_resources('aps/2/resources')) == []
+        assert len(guarded_request.calls) == 2
+
+    def test_oa_retries_are_signed_again(self):
+        nonces = []
+
+        async def guarded_request(upstream, session, breaker, method, url, headers=None,
+                                  **kwargs):
+            nonces.append(dict(item.split('=', 1) for item in
+                               headers['Authorization'][len('OAuth '):].split(', '))
+                          ['oauth_nonce'])
+            if len(nonces) == 1:
+                raise aiohttp.ClientOSError()
+            return self.upstream.UpstreamResponse(200, '[]')
+
+        oa = self.upstream.AsyncOA('https://aps.com/', signer=Client('key', client_secret='s'))
+        with patch.object(self.upstream, 'guarded_request', guarded_request), \
+                patch.object(oa, 'session', MagicMock()):
+            assert run(oa.get_resources('aps/2/resources')) == []
+        assert len(nonces) == 2
+        assert nonces[0] != nonces[1]
@@ -0,0 +1,38 @@
+from unittest import TestCase
+
+from mock import Mock
+
+from connector.client.pagination import paginate
+
+
+class TestPaginate(TestCase):
+    def test_offset(self):
+        pages = {0: {'entries': [1, 2], 'total_count': 5, 'offset': 0},
+                 2: {'entries': [3, 4], 'total_count': 5, 'offset': 2},
+                 4: {'entries': [5], 'total_count': 5, 'offset': 4}}
+        fetch_page = Mock(side_effect=lambda limit, offset=0: pages[offset])
+        assert list(paginate(fetch_page, page_size=2)) == [1, 2, 3, 4, 5]
+        assert [c[1] for c in fetch_page.call_args_list] == [
+            {'limit': 2}, {'limit': 2, 'offset': 2}, {'limit': 2, 'offset': 4}]
+
+    def test_marker(self):
+        pages = {None: {'entries': [1, 2], 'next_marker': 'm'},
+                 'm': {'entries': [3], 'next_marker': None}}
+        fetch_page = Mock(side_effect=lambda limit, usemarker, marker=None: pages[marker])
+        assert list(paginate(fetch_page, page_size=2, params={'usemarker': True})) == [1, 2, 3]
+        assert fetch_page.call_args[1] == {'limit': 2, 'usemarker': True, 'marker': 'm'}
+
+    def test_first_page_is_fetched_eagerly(self):
+        fetch_page = Mock(side_effect=ValueError)
+        self.assertRaises(ValueError, paginate, fetch_page)
+
+    def test_prefetch(self):
+        fetch_page = Mock(side_effect=[{'entries': [1, 2], 'total_count': 4},
+                                       {'entries': [3, 4], 'total_count': 4}])
+        entries = paginate(fetch_page, page_size=2)
+        assert next(entries) == 1
+        entries.close()
+        assert fetch_page.call_count in (1, 2)
+
+    def test_empty(self):
+        assert list(paginate(Mock(return_value={'entries': [], 'total_count': 0}))) == []
@@ -0,0 +1,56 @@
+import threading
+from unittest import TestCase
+
+from mock import MagicMock, patch
+from requests import Session
+
+from connector.client import fetch_reseller_token
+from connector.client.client import Client
+from connector.client.reseller import Reseller, box_api
+from connector.client.token import TokenManager
+from connector.client.user import User
+
+
+class TestReseller(TestCase):
+    def test_api_is_shared(self):
+        with patch('connector.client.reseller.reseller_tokens') as tokens:
+            tokens.get.return_value = 'token'
+            reseller = Reseller(None)
+            client = Client(reseller, enterprise_id='1')
+            user = User(client=client, user_id='2')
+            assert reseller.api() is client.api() is user.api() is box_api()
+            assert Reseller(None).api() is reseller.api()
+            assert reseller.token == 'token'
+
+    def test_explicit_token(self):
+        api = Reseller('fake_token').api()
+        assert api is not box_api('fake_token')
+        assert api._store['session'].auth.token == 'fake_token'
+
+    def test_token_request_skips_api_auth(self):
+        # box_api() binds BoxAuth to the session shared with the token endpoint
+        box_api()
+        response = MagicMock(status_code=200)
+        response.json.return_value = {'access_token': 'token', 'expires_in': 3600}
+        with patch('connector.client.reseller_tokens') as tokens, \
+                patch.object(Session, 'send', return_value=response) as send:
+            assert fetch_reseller_token() == ('token', 3600)
+        assert not tokens.get.called
+        assert 'Authorization' not in send.call_args[0][0].headers
+
+    def test_refresh_fetches_token(self):
+        tokens = TokenManager(fetch_reseller_token)
+        response = MagicMock(status_code=200)
+        response.json.return_value = {'access_token': 'token', 'expires_in': 3600}
+        reseller = Reseller(None)
+        with patch('connector.client.reseller_tokens', tokens), \
+                patch('connector.client.reseller.reseller_tokens', tokens), \
+                patch.object(Session, 'send', return_value=response):
+            # a refresh waiting on its own token would never finish
+            thread = threading.Thread(target=reseller.refresh)
+            thread.daemon = True
+            thread.start()
+            thread.join(5)
+        tokens.clear()
+        assert not thread.is_alive()
+        assert reseller.token == 'token'
@@ -0,0 +1,99 @@
+import datetime
+import itertools
+from unittest import TestCase
+
+from connector.client.client import Client, client_schema, dump_client, load_client
+from connector.client.user import User, dump_user, load_user, user_schema
+
+
+def attributes(obj):
+    return {name: getattr(obj, name) for name in type(obj).__slots__}
+
+
+class TestClientSerializers(TestCase):
+    def clients(self):
+        admins = [None, {}, {'name': 'Admin', 'login': 'admin@example.com', 'user_id': '1'},
+                  {'name': 'Admin', 'login': 'admin@example.com', 'phone': None},
+                  User(name='Admin', login='admin@example.com', phone='123')]
+        for admin, trial, users_limit, name in itertools.product(
+                admins, [None, False, True, 'yes', datetime.time(1, 2)], [0, 10, '7', True],
+                ['Company', '', None, 42]):
+            yield Client(None, name=name, users_limit=users_limit, trial=trial, plan_code='plan',
+                         subdomain='sub', administered_by=admin, enterprise_id='5')
+        yield Client(None, name='Company', trial_end_at=datetime.time(10, 30),
+                     active_status='deactivated', billing_cycle=None)
+
+    def responses(self):
+        admins = [{'id': '1', 'name': 'Admin', 'login': 'admin@example.com', 'phone': '123'},
+                  {'name': 'Admin', 'login': 'admin@example.com'},
+                  {'id': '1', 'name': 'Admin'}, None, 'admin']
+        for admin, deal_status, seats, extra in itertools.product(
+                admins, ['trial', 'live_deal', None], [5, '5', None],
+                [{}, {'trial_end_at': None, 'subdomain': None}, {'billing_cycle': None},
+                 {'trial_end_at': '10:30:00'}, {'active_status': 'active', 'type': 'enterprise'}]):
+            response = {'id': '11', 'name': 'Company', 'seats': seats, 'seats_used': 3,
+                        'deal_status': deal_status, 'administered_by': admin}
+            response.update(extra)
+            yield response
+        yield {'name': 'Company', 'users_limit': 1, 'seats': 2, 'administered_by': admins[0]}
+
+    def test_dump(self):
+        for client in self.clients():
+            assert dump_client(client) == client_schema.dump(client).data, attributes(client)
+
+    def test_load(self):
+        for response in self.responses():
+            expected = client_schema.load(response).data
+            loaded = load_client(response)
+            if isinstance(expected, Client):
+                assert attributes(loaded) == attributes(expected), response
+            else:
+                assert loaded == expected, response
+
+    def test_load_into_existing(self):
+        client = Client(None, enterprise_id='11')
+        client.load({'name': 'Company', 'seats': 5, 'administered_by': {'name': 'A', 'login': 'a'}})
+        assert client.enterprise_id == '11'
+        assert client.users_limit == 5
+
+
+class TestUserSerializers(TestCase):
+    def users(self):
+        for enterprise_id, login, admin, space_amount in itertools.product(
+                [None, '5', 'SECOND'], ['user@example.com', 'not an email', None],
+                [True, False], [0, 1024, '1024']):
+            yield User(Client(enterprise_id=enterprise_id), name='User', login=login, admin=admin,
+                       space_amount=space_amount, phone='123', job_title=None, status='active',
+                       user_id='7')
+
+    def responses(self):
+        for login, space_amount, extra in itertools.product(
+                ['user@example.com', 'not an email', None], [1024, None, '1'],
+                [{}, {'role': 'coadmin'}, {'admin': 'coadmin'}, {'is_sync_enabled': True},
+                 {'can_see_managed_users': 'yes'}, {'phone': None, 'address': 'Street'},
+                 {'enterprise': {'id': '5'}, 'type': 'user'}]):
+            response = {'id': '7', 'name': 'User', 'login': login, 'space_amount': space_amount,
+                        'language': 'en', 'timezone': 'Europe/Berlin', 'status': 'active'}
+            response.update(extra)
+            yield response
+
+    def test_dump(self):
+        for user in self.users():
+            assert dump_user(user) == user_schema.dump(user).data, attributes(user)
+
+    def test_load(self):
+        for response in self.responses():
+            try:
+                expected = user_schema.load(response).data
+            except TypeError:
+                self.assertRaises(TypeError, load_user, response)
+                continue
+            loaded = load_user(response)
+            if isinstance(expected, User):
+                assert attributes(loaded) == attributes(expected), response
+            else:
+                assert loaded == expected, response
+
+    def test_slots(self):
+        assert not hasattr(User(), '__dict__')
+        assert not hasattr(Client(), '__dict__')
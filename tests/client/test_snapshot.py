@@ -0,0 +1,80 @@
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from connector.cache import LRUCache
+from connector.client.snapshot import FRESH, MISSING, STALE, EnterpriseSnapshots
+
+
+class SyncExecutor(object):
+    def submit(self, function, *args):
+        function(*args)
+
+
+class TestEnterpriseSnapshots(TestCase):
+    def setUp(self):
+        self.snapshots = EnterpriseSnapshots(LRUCache(ttl=1000), {'users_amount': 10},
+                                             stale_grace=100, executor=Mock())
+        self.response = {'id': '1', 'seats_used': 3}
+
+    def put(self, age):
+        with patch('connector.client.snapshot.time.time', return_value=1000 - age):
+            self.snapshots.put('1', self.response)
+
+    def lookup(self, field='users_amount'):
+        with patch('connector.client.snapshot.time.time', return_value=1000):
+            return self.snapshots.lookup('1', field)
+
+    def get(self, fetch):
+        with patch('connector.client.snapshot.time.time', return_value=1000):
+            return self.snapshots.get('1', 'users_amount', fetch)
+
+    def test_fresh(self):
+        self.put(age=5)
+        fetch = Mock()
+        assert self.get(fetch) == self.response
+        assert self.lookup()[1] == FRESH
+        fetch.assert_not_called()
+
+    def test_stale_is_served_and_refreshed_once(self):
+        self.put(age=50)
+        fetch = Mock(return_value={'id': '1', 'seats_used': 4})
+        assert self.get(fetch) == self.response
+        assert self.get(fetch) == self.response
+        assert self.snapshots.executor.submit.call_count == 1
+        assert self.snapshots.stats()['stale_served'] == 2
+
+        self.snapshots._refresh('1', fetch)
+        assert self.lookup() == ({'id': '1', 'seats_used': 4}, FRESH)
+        assert self.snapshots.stats()['refreshing'] == 0
+
+    def test_failed_refresh_keeps_snapshot(self):
+        self.put(age=50)
+        self.snapshots.executor = SyncExecutor()
+        assert self.get(Mock(side_effect=ValueError)) == self.response
+        assert self.lookup()[1] == STALE
+        assert self.snapshots.stats()['refreshing'] == 0
+
+    def test_too_old_is_fetched(self):
+        self.put(age=500)
+        fetch = Mock(return_value={'id': '1', 'seats_used': 4})
+        assert self.get(fetch) == {'id': '1', 'seats_used': 4}
+        fetch.assert_called_once_with()
+
+    def test_field_without_max_age(self):
+        self.put(age=0)
+        assert self.lookup('administered_by') == (None, MISSING)
+
+    def test_adjust_users(self):
+        self.put(age=5)
+        with patch('connector.client.snapshot.time.time', return_value=1000):
+            self.snapshots.adjust_users('1', 1)
+            assert self.snapshots.lookup('1', 'users_amount')[0]['seats_used'] == 4
+            self.snapshots.adjust_users('1', -10)
+            assert self.snapshots.lookup('1', 'users_amount')[0]['seats_used'] == 0
+            self.snapshots.adjust_users('2', 1)
+
+    def test_invalidate(self):
+        self.put(age=5)
+        self.snapshots.invalidate('1')
+        assert self.lookup() == (None, MISSING)
@@ -0,0 +1,70 @@
+import threading
+import time
+from unittest import TestCase
+
+from mock import MagicMock
+
+from connector.cache import LRUCache
+from connector.client.token import TokenManager
+
+
+class TestTokenManager(TestCase):
+    def test_token_is_cached(self):
+        fetch = MagicMock(return_value=('token', 3600))
+        manager = TokenManager(fetch)
+        assert manager.get() == 'token'
+        assert manager.get() == 'token'
+        assert fetch.call_count == 1
+        manager.clear()
+
+    def test_expired_token_is_refreshed(self):
+        fetch = MagicMock(side_effect=[('old', 3600), ('new', 3600)])
+        manager = TokenManager(fetch)
+        assert manager.get() == 'old'
+        manager._expires_at = time.time() - 1
+        assert manager.get() == 'new'
+        manager.clear()
+
+    def test_invalidate_refreshes_once(self):
+        fetch = MagicMock(side_effect=[('old', 3600), ('new', 3600)])
+        manager = TokenManager(fetch)
+        manager.get()
+        assert manager.invalidate('old') == 'new'
+        # a second 401 with the same stale token must not hit the token endpoint
+        assert manager.invalidate('old') == 'new'
+        assert fetch.call_count == 2
+        manager.clear()
+
+    def test_single_flight_refresh(self):
+        started = threading.Event()
+
+        def slow_fetch():
+            started.set()
+            time.sleep(0.1)
+            return 'token', 3600
+
+        fetch = MagicMock(side_effect=slow_fetch)
+        manager = TokenManager(fetch)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(manager.get()))
+                   for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert results == ['token'] * 10
+        assert fetch.call_count == 1
+        manager.clear()
+
+    def test_token_is_shared_through_store(self):
+        store = LRUCache()
+        first = TokenManager(MagicMock(return_value=('token', 3600)), store=store)
+        fetch = MagicMock(return_value=('other', 3600))
+        second = TokenManager(fetch, store=store)
+        assert first.get() == 'token'
+        assert second.get() == 'token'
+        assert fetch.call_count == 0
+        # a token rejected by Box is not taken from the store again
+        assert second.invalidate('token') == 'other'
+        first.clear()
+        second.clear()
@@ -0,0 +1,67 @@
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from connector.cache import LRUCache
+from connector.client.usage import UsageCollector
+
+
+def pages(*sizes):
+    total = sum(sizes)
+    offset = 0
+    result = []
+    for size in sizes:
+        result.append({'entries': [{'id': str(i), 'seats_used': i}
+                                   for i in range(offset, offset + size)],
+                       'total_count': total})
+        offset += size
+    return result
+
+
+@patch('connector.client.usage.time.sleep')
+class TestUsageCollector(TestCase):
+    def setUp(self):
+        self.fetch_page = Mock(side_effect=pages(2, 2, 1))
+        self.collector = UsageCollector(LRUCache(), LRUCache(), interval=60, page_size=2,
+                                        rate=10, max_age=600, fetch_page=self.fetch_page)
+
+    def test_walks_all_pages(self, sleep):
+        assert self.collector.collect()
+        assert [c[0] for c in self.fetch_page.call_args_list] == [(0, 2), (2, 2), (4, 2)]
+        assert self.collector.get('3') == 3
+        assert self.collector.get('unknown') is None
+        stats = self.collector.stats()
+        assert stats['enterprises'] == 5
+        assert stats['pages'] == 3
+        assert stats['snapshot_age'] >= 0
+
+    def test_one_walk_per_interval(self, sleep):
+        assert self.collector.collect()
+        assert not self.collector.collect()
+        assert self.fetch_page.call_count == 3
+
+    def test_resumes_after_error(self, sleep):
+        self.fetch_page.side_effect = [pages(2, 2, 1)[0], ValueError, pages(2, 2, 1)[1],
+                                       pages(2, 2, 1)[2]]
+        self.assertRaises(ValueError, self.collector.collect)
+        self.collector.state.delete('lease')
+        assert self.collector.collect()
+        assert [c[0][0] for c in self.fetch_page.call_args_list] == [0, 2, 2, 4]
+
+    def test_rate_limit(self, sleep):
+        with patch('connector.client.usage.time.time', return_value=100):
+            self.collector.collect()
+        assert [round(c[0][0], 3) for c in sleep.call_args_list] == [0, 0.1, 0.1]
+
+    def test_max_age(self, sleep):
+        self.collector.usage.set('1', [0, 5])
+        assert self.collector.get('1') is None
+
+    def test_adjust(self, sleep):
+        self.collector.collect()
+        self.collector.adjust('3', 1)
+        assert self.collector.get('3') == 4
+        self.collector.adjust('0', -1)
+        assert self.collector.get('0') == 0
+        self.collector.invalidate('3')
+        assert self.collector.get('3') is None
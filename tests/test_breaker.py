@@ -0,0 +1,112 @@
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+from connector.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from connector.config import Config
+from connector.v1.resources import make_unavailable_error
+from connector.validator import OAuthResult
+
+
+def response(status_code):
+    resp = MagicMock()
+    resp.status_code = status_code
+    return resp
+
+
+def is_failure(resp):
+    return resp.status_code >= 500
+
+
+class TestCircuitBreaker(TestCase):
+    def setUp(self):
+        now = patch('connector.breaker.time.time', return_value=1000.0)
+        self.time = now.start()
+        self.addCleanup(now.stop)
+
+    def fail(self, breaker, times):
+        for _ in range(times):
+            breaker.call(lambda: response(500), is_failure)
+
+    def test_opens_on_failure_rate(self):
+        breaker = CircuitBreaker('test_open', failure_rate=0.5, min_calls=4)
+        breaker.call(lambda: response(200), is_failure)
+        self.fail(breaker, 2)
+        assert breaker.state == CLOSED
+        self.fail(breaker, 1)
+        assert breaker.state == OPEN
+
+    def test_min_calls(self):
+        breaker = CircuitBreaker('test_min_calls', min_calls=10)
+        self.fail(breaker, 9)
+        assert breaker.state == CLOSED
+
+    def test_old_calls_leave_the_window(self):
+        breaker = CircuitBreaker('test_window', min_calls=4, window=10)
+        self.fail(breaker, 3)
+        self.time.return_value += 11
+        self.fail(breaker, 1)
+        assert breaker.state == CLOSED
+        assert breaker.stats()['calls'] == 1
+
+    def test_fails_fast_when_open(self):
+        breaker = CircuitBreaker('test_fast', min_calls=1, open_seconds=30)
+        self.fail(breaker, 1)
+        send = MagicMock()
+        with self.assertRaises(CircuitOpenError) as e:
+            breaker.call(send)
+        assert not send.called
+        assert e.exception.retry_after == 30
+
+    def test_half_open_probe_closes(self):
+        breaker = CircuitBreaker('test_probe_ok', min_calls=1, open_seconds=30)
+        self.fail(breaker, 1)
+        self.time.return_value += 30
+        breaker.allow()
+        assert breaker.state == HALF_OPEN
+        # only one probe at a time
+        self.assertRaises(CircuitOpenError, breaker.allow)
+        breaker.record(True)
+        assert breaker.state == CLOSED
+
+    def test_half_open_probe_reopens(self):
+        breaker = CircuitBreaker('test_probe_failed', min_calls=1, open_seconds=30)
+        self.fail(breaker, 1)
+        self.time.return_value += 30
+        self.assertRaises(ValueError, breaker.call, MagicMock(side_effect=ValueError()))
+        assert breaker.state == OPEN
+        assert breaker.opened_at == 1030
+
+
+class TestUnavailableError(TestCase):
+    def test_retry_after(self):
+        breaker = CircuitBreaker('test_error', min_calls=1, open_seconds=15)
+        breaker.record(False)
+        body, status, headers = make_unavailable_error(CircuitOpenError(breaker))
+        assert status == 503
+        assert headers['Retry-After'] in ('14', '15')
+        assert 'test_error' in body['message']
+
+
+def open_box_breaker(test):
+    """Open the breaker of the Box token endpoint and drop the reseller token for ``test``."""
+    from connector.client import box_sessions, reseller_tokens
+
+    breaker = box_sessions.session(Config().box_oauth_baseurl).breaker
+    for p in (patch.object(breaker, 'state', OPEN), patch.object(breaker, 'opened_at', 1e12),
+              patch.object(reseller_tokens, '_token', None),
+              patch.object(reseller_tokens, '_expires_at', 0)):
+        p.start()
+        test.addCleanup(p.stop)
+
+
+class TestColdTokenFetch(TestCase):
+    @patch('connector.v1.verify_request', return_value=OAuthResult(True, 'key'))
+    def test_open_breaker_is_unavailable(self, _):
+        from connector.app import app
+
+        open_box_breaker(self)
+        response = app.test_client().get('/v1/tenant/123',
+                                         headers={'aps-instance-id': '123-123-123'})
+        assert response.status_code == 503
+        assert int(response.headers['Retry-After']) > 0
@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+from mock import MagicMock
+
+from connector.cache import LRUCache, SQLiteCache, memoize
+
+
+class TestLRUCache(TestCase):
+    def test_lru_eviction(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        assert cache.get('a') == 1
+        cache.set('c', 3)
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+        assert cache.stats()['evictions'] == 1
+
+    def test_add(self):
+        cache = LRUCache()
+        assert cache.add('lease', 1, ttl=0.01)
+        assert not cache.add('lease', 2)
+        time.sleep(0.02)
+        assert cache.add('lease', 3)
+        assert cache.get('lease') == 3
+
+    def test_expiration(self):
+        cache = LRUCache(ttl=60, negative_ttl=0.01)
+        cache.set('positive', 'value')
+        cache.set('negative', None)
+        time.sleep(0.02)
+        assert cache.get('positive') == 'value'
+        assert cache.get('negative', 'expired') == 'expired'
+
+    def test_counters(self):
+        cache = LRUCache()
+        cache.get('a')
+        cache.set('a', 1)
+        cache.get('a')
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['size'] == 1
+
+
+class TestSQLiteCache(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_shared_between_instances(self):
+        first = SQLiteCache('tenants', path=self.path)
+        second = SQLiteCache('tenants', path=self.path)
+        first.set(('tenant',), 'enterprise')
+        first.set(('tbd',), None)
+        assert second.get(('tenant',)) == 'enterprise'
+        assert second.get(('tbd',), 'missing') is None
+        second.delete(('tenant',))
+        assert first.get(('tenant',)) is None
+
+    def test_private_file(self):
+        path = os.path.join(self.directory, 'state', 'cache.sqlite')
+        SQLiteCache('tenants', path=path).set('key', 1)
+        assert os.stat(path).st_mode & 0o777 == 0o600
+        assert os.stat(os.path.dirname(path)).st_mode & 0o777 == 0o700
+
+    def test_namespaces(self):
+        tenants = SQLiteCache('tenants', path=self.path)
+        tokens = SQLiteCache('tokens', path=self.path)
+        tenants.set('key', 1)
+        assert tokens.get('key') is None
+
+    def test_eviction(self):
+        cache = SQLiteCache('tenants', maxsize=2, path=self.path)
+        cache.set('a', 1, ttl=10)
+        cache.set('b', 2, ttl=20)
+        cache.set('c', 3, ttl=30)
+        assert len(cache) == 2
+        assert cache.get('a') is None
+        assert cache.stats()['evictions'] == 1
+
+    def test_add(self):
+        first = SQLiteCache('leases', path=self.path)
+        second = SQLiteCache('leases', path=self.path)
+        assert first.add('lease', 1, ttl=0.01)
+        assert not second.add('lease', 2)
+        time.sleep(0.02)
+        assert second.add('lease', 3)
+        assert first.get('lease') == 3
+
+
+class TestMemoize(TestCase):
+    def test_memoize_and_invalidate(self):
+        function = MagicMock(return_value='enterprise', __name__='get_enterprise')
+        cached = memoize(LRUCache())(function)
+        assert cached('tenant') == 'enterprise'
+        assert cached('tenant') == 'enterprise'
+        assert function.call_count == 1
+        cached.invalidate('tenant')
+        cached('tenant')
+        assert function.call_count == 2
+
+    def test_write_through(self):
+        function = MagicMock(return_value=None, __name__='get_enterprise')
+        cached = memoize(LRUCache())(function)
+        assert cached('tenant') is None
+        cached.set('enterprise', 'tenant')
+        assert cached('tenant') == 'enterprise'
+        assert function.call_count == 1
@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import Mock, patch
+
+from connector.jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue, QueueFullError
+
+
+class TestJobQueue(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.queue = JobQueue(os.path.join(self.directory, 'jobs.sqlite'), workers=0, maxsize=2)
+        self.handler = Mock(return_value='enterprise')
+        self.queue.handler('tenant')(self.handler)
+
+    def test_run(self):
+        job = self.queue.submit('tenant', 't-1', {'aps': 't-1'})
+        assert job['status'] == QUEUED
+        assert self.queue.run_one()
+        self.handler.assert_called_once_with({'aps': 't-1'})
+        job = self.queue.get(job['id'])
+        assert job['status'] == DONE
+        assert job['result'] == 'enterprise'
+        assert not self.queue.run_one()
+
+    def test_same_key(self):
+        first = self.queue.submit('tenant', 't-1', {})
+        assert self.queue.submit('tenant', 't-1', {})['id'] == first['id']
+
+    def test_failure(self):
+        self.handler.side_effect = ValueError('no admins')
+        job = self.queue.submit('tenant', 't-1', {})
+        self.queue.run_one()
+        job = self.queue.get(job['id'])
+        assert job['status'] == FAILED
+        assert job['error'] == 'no admins'
+        assert self.queue.stats()['failed'] == 1
+
+        self.queue.discard(job['id'])
+        assert self.queue.submit('tenant', 't-1', {})['id'] != job['id']
+
+    def test_full(self):
+        self.queue.submit('tenant', 't-1', {})
+        self.queue.submit('tenant', 't-2', {})
+        self.assertRaises(QueueFullError, self.queue.submit, 'tenant', 't-3', {})
+
+    def test_lost_job_runs_again(self):
+        job = self.queue.submit('tenant', 't-1', {})
+        assert self.queue.claim()[0] == job['id']
+        assert self.queue.get(job['id'])['status'] == RUNNING
+        assert self.queue.claim() is None
+        with patch('connector.jobs.time.time', return_value=job['created_at'] + 601):
+            assert self.queue.claim()[0] == job['id']
+
+    def test_durable(self):
+        job = self.queue.submit('tenant', 't-1', {})
+        restarted = JobQueue(self.queue.path, workers=0)
+        restarted.handler('tenant')(self.handler)
+        assert restarted.run_one()
+        assert self.queue.get(job['id'])['status'] == DONE
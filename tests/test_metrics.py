@@ -0,0 +1,116 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import patch
+
+from connector import metrics
+from connector.metrics import Registry, authorized_scrape, operation
+
+
+class TestRegistry(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.registry = Registry(self.directory)
+        self.requests = self.registry.histogram('requests_seconds', 'Requests.', ('route',),
+                                                buckets=(0.1, 1.0))
+        self.errors = self.registry.counter('errors_total', 'Errors.', ('kind',))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_render(self):
+        self.requests.observe(0.05, route='/tenant')
+        self.requests.observe(0.5, route='/tenant')
+        self.requests.observe(5, route='/tenant')
+        self.errors.inc(kind='timeout')
+        self.registry.collected('hits_total', 'Hits.', ('cache',), lambda: {'tenant': 3})
+        lines = self.registry.render().splitlines()
+        assert lines[:8] == ['# HELP requests_seconds Requests.',
+                             '# TYPE requests_seconds histogram',
+                             'requests_seconds_bucket{route="/tenant",le="0.1"} 1',
+                             'requests_seconds_bucket{route="/tenant",le="1.0"} 2',
+                             'requests_seconds_bucket{route="/tenant",le="+Inf"} 3',
+                             'requests_seconds_count{route="/tenant"} 3',
+                             'requests_seconds_sum{route="/tenant"} 5.55',
+                             '# HELP errors_total Errors.']
+        assert 'errors_total{kind="timeout"} 1' in lines
+        assert 'hits_total{cache="tenant"} 3' in lines
+
+    def write(self, name, samples):
+        with open(os.path.join(self.directory, name), 'w') as f:
+            json.dump(samples, f)
+
+    def test_workers_are_summed(self):
+        self.errors.inc(kind='timeout')
+        # the file of another worker process
+        self.write('1-1000.json', [['errors_total', [['kind', 'timeout']], 2],
+                                   ['errors_total', [['kind', 'reset']], 1]])
+        with open(os.path.join(self.directory, '2-1000.json'), 'w') as f:
+            f.write('{truncated')
+        with patch.object(metrics, 'pid_alive', return_value=True):
+            lines = self.registry.render().splitlines()
+        assert 'errors_total{kind="timeout"} 3' in lines
+        assert 'errors_total{kind="reset"} 1' in lines
+
+    def test_dead_workers_are_merged(self):
+        self.write('dead.json', [['errors_total', [['kind', 'timeout']], 4]])
+        self.write('101-1000.json', [['errors_total', [['kind', 'timeout']], 2]])
+        # pid 102 was reused, its older file belongs to an exited worker
+        self.write('102-1000.json', [['errors_total', [['kind', 'timeout']], 3]])
+        self.write('102-2000.json', [['errors_total', [['kind', 'timeout']], 1]])
+        with patch.object(metrics, 'pid_alive', lambda pid: pid != 101):
+            lines = self.registry.render().splitlines()
+        assert 'errors_total{kind="timeout"} 10' in lines
+        assert sorted(name for name in os.listdir(self.directory) if name.endswith('.json')) == \
+            sorted(['dead.json', '102-2000.json', os.path.basename(self.registry.path())])
+        with patch.object(metrics, 'pid_alive', lambda pid: pid != 101):
+            assert 'errors_total{kind="timeout"} 10' in self.registry.render().splitlines()
+
+    def test_clear(self):
+        self.registry.flush()
+        self.write('dead.json', [['errors_total', [['kind', 'timeout']], 4]])
+        self.registry.clear()
+        assert not [name for name in os.listdir(self.directory) if name.endswith('.json')]
+
+    def test_directory_is_private(self):
+        directory = os.path.join(self.directory, 'metrics')
+        Registry(directory).flush()
+        assert os.stat(directory).st_mode & 0o777 == 0o700
+
+    def test_without_directory(self):
+        registry = Registry()
+        registry.counter('errors_total', 'Errors.').inc()
+        assert 'errors_total 1' in registry.render().splitlines()
+
+    def test_label_values_are_escaped(self):
+        self.errors.inc(kind='say "hi"\n')
+        assert 'errors_total{kind="say \\"hi\\"\\n"} 1' in self.registry.render().splitlines()
+
+
+class TestAuthorizedScrape(TestCase):
+    def test_token(self):
+        with patch.object(metrics.config, 'metrics_token', 'secret'):
+            assert authorized_scrape('Bearer secret')
+            assert not authorized_scrape('Bearer other')
+            assert not authorized_scrape(None)
+
+    def test_without_token(self):
+        with patch.object(metrics.config, 'metrics_token', None):
+            assert not authorized_scrape('Bearer ')
+
+
+class TestOperation(TestCase):
+    def test_ids_are_replaced(self):
+        assert operation('https://oa:6308/aps/2/resources/a1b2-c3') == '/aps/2/resources/{id}'
+        assert operation('https://api.box.com/2.0/enterprises/123/users/?limit=100&offset=0') == \
+            '/2.0/enterprises/{id}/users'
+        assert operation('https://api.box.com/oauth2/token') == '/oauth2/token'
+
+    def test_rql_is_reduced_to_operators(self):
+        assert operation('https://oa:6308/aps/2/resources?in(aps.id,(a,b))') == \
+            '/aps/2/resources?in'
+        assert operation('https://oa:6308/aps/2/resources?implementing(http://box.com/t/1.0),'
+                         'limit(0,100)') == '/aps/2/resources?implementing,limit'
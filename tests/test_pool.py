@@ -0,0 +1,87 @@
+import threading
+from unittest import TestCase
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+from mock import patch
+
+from connector.metrics import registry
+from connector.pool import LazyExecutor, SessionPool
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'{}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSessionPool(TestCase):
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://127.0.0.1:{}'.format(self.server.server_port)
+        self.pool = SessionPool(pool_size=2)
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_one_session_per_base_url(self):
+        assert self.pool.session(self.url + '/a') is self.pool.session(self.url + '/b')
+
+    def test_connections_are_reused(self):
+        for path in ('/aps/2/resources/1', '/aps/2/resources/2', '/aps/2/application'):
+            assert self.pool.request('GET', self.url + path).status_code == 200
+        stats = self.pool.stats()[self.url]
+        assert stats['requests'] == 3
+        assert stats['connections'] == 1
+        assert stats['idle_connections'] == 1
+        assert stats['reuse_ratio'] > 0.6
+
+    def test_requests_are_measured(self):
+        pool = SessionPool(breaker_name='test-upstream')
+        pool.request('GET', self.url + '/aps/2/resources/1')
+        pool.request('GET', self.url + '/aps/2/resources/2')
+        self.assertRaises(Exception, pool.request, 'GET', 'http://127.0.0.1:1/aps/2/application')
+        samples = {(name, tuple(labels)): value for name, labels, value in registry.samples()}
+        labels = (('upstream', 'test-upstream'), ('method', 'GET'),
+                  ('operation', '/aps/2/resources/{id}'), ('status', '200'))
+        assert samples[('connector_upstream_request_duration_seconds_count', labels)] == 2
+        errors = [value for (name, sample_labels), value in samples.items()
+                  if name == 'connector_upstream_errors_total' and
+                  ('upstream', 'test-upstream') in sample_labels]
+        assert errors == [1]
+        pool.close()
+
+
+class TestLazyExecutor(TestCase):
+    def test_created_on_first_submit(self):
+        executor = LazyExecutor(2)
+        assert executor._executor is None
+        assert executor.submit(sum, [1, 2]).result() == 3
+        first = executor._executor
+        executor.submit(sum, [])
+        assert executor._executor is first
+
+    def test_recreated_after_fork(self):
+        executor = LazyExecutor(2)
+        executor.submit(sum, [])
+        first = executor._executor
+        with patch('connector.pool.os.getpid', return_value=-1):
+            assert executor.submit(sum, [1]).result() == 1
+        assert executor._executor is not first
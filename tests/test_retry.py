@@ -0,0 +1,56 @@
+from unittest import TestCase
+
+from mock import MagicMock, patch
+from requests.exceptions import ConnectTimeout, ReadTimeout
+
+from connector.retry import RetryBudget, RetryPolicy
+
+
+def response(status_code, headers=None):
+    resp = MagicMock()
+    resp.status_code = status_code
+    resp.headers = headers or {}
+    return resp
+
+
+class TestRetryPolicy(TestCase):
+    def setUp(self):
+        sleep = patch('connector.retry.time.sleep')
+        self.sleep = sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def test_retriable_status(self):
+        policy = RetryPolicy('test_status', max_attempts=3)
+        send = MagicMock(side_effect=[response(503), response(429), response(200)])
+        assert policy.call('POST', send).status_code == 200
+        assert send.call_count == 3
+        assert policy.stats()['attempts_per_call'] == {3: 1}
+
+    def test_non_idempotent_method_is_not_retried(self):
+        policy = RetryPolicy('test_method')
+        send = MagicMock(side_effect=ReadTimeout())
+        self.assertRaises(ReadTimeout, policy.call, 'POST', send)
+        assert send.call_count == 1
+
+    def test_connect_timeout_is_retried(self):
+        policy = RetryPolicy('test_exception', max_attempts=2)
+        send = MagicMock(side_effect=[ConnectTimeout(), response(200)])
+        assert policy.call('POST', send).status_code == 200
+
+    def test_max_attempts(self):
+        policy = RetryPolicy('test_attempts', max_attempts=2)
+        send = MagicMock(return_value=response(503))
+        assert policy.call('GET', send).status_code == 503
+        assert send.call_count == 2
+
+    def test_retry_after(self):
+        policy = RetryPolicy('test_retry_after', backoff=0, max_backoff=5)
+        assert policy.delay(1, response(429, {'Retry-After': '3'})) == 3
+
+    def test_budget(self):
+        policy = RetryPolicy('test_budget', max_attempts=5,
+                             budget=RetryBudget(ratio=0, min_per_second=0, capacity=1))
+        send = MagicMock(return_value=response(503))
+        policy.call('GET', send)
+        assert send.call_count == 2
+        assert policy.stats()['budget_exhausted'] == 1
@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import patch
+
+from connector.app import app
+from connector.backfill_tenants import backfill
+from connector.cache import LRUCache, memoize
+from connector.tenants import TenantStore
+
+
+class TestTenantStore(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.store = TenantStore(os.path.join(directory, 'tenants.sqlite'))
+
+    def test_set_get_delete(self):
+        assert self.store.get('t-1') is None
+        self.store.set('t-1', 'e-1')
+        self.store.set('t-2', None)
+        assert TenantStore(self.store.path).get('t-1') == 'e-1'
+        assert self.store.get('t-2') is None
+        self.store.delete('t-1')
+        assert self.store.get('t-1') is None
+        assert self.store.stats() == {'size': 0, 'hits': 0, 'misses': 3}
+
+    def test_lookup_reads_store_first(self):
+        from connector.v1.resources import tenant
+
+        lookup = memoize(LRUCache())(tenant.get_enterprise_id_for_tenant.__wrapped__)
+        self.store.set('t-1', 'e-1')
+        with patch.object(tenant, 'tenant_store', self.store), \
+                patch.object(tenant, 'OA') as oa:
+            oa.get_resource.return_value = {'tenantId': 'e-2'}
+            assert lookup('t-1') == 'e-1'
+            assert lookup('t-2') == 'e-2'
+        assert oa.get_resource.call_count == 1
+        assert self.store.get('t-2') == 'e-2'
+
+    def test_not_created_enterprise_is_not_stored(self):
+        from connector.v1.resources import tenant
+
+        lookup = memoize(LRUCache())(tenant.get_enterprise_id_for_tenant.__wrapped__)
+        with patch.object(tenant, 'tenant_store', self.store), \
+                patch.object(tenant, 'OA') as oa:
+            oa.get_resource.return_value = {'tenantId': 'TBD'}
+            assert lookup('t-1') is None
+            assert self.store.get('t-1') is None
+            # the negative TTL of the memo expires, OA has the enterprise by now
+            lookup.invalidate('t-1')
+            oa.get_resource.return_value = {'tenantId': 'e-1'}
+            assert lookup('t-1') == 'e-1'
+        assert self.store.get('t-1') == 'e-1'
+
+    def test_backfill(self):
+        tenants = [{'aps': {'id': 't-{}'.format(i)}, 'tenantId': 'e-{}'.format(i)}
+                   for i in range(7)]
+        tenants[3]['tenantId'] = 'TBD'
+
+        def fetch_tenants(tenant_type, offset, page_size):
+            return tenants[offset:offset + page_size]
+
+        with app.test_request_context(), \
+                patch('connector.backfill_tenants.tenant_store', self.store), \
+                patch('connector.backfill_tenants.fetch_tenants',
+                      side_effect=fetch_tenants) as fetch:
+            assert backfill('http://tenant', page_size=2, concurrency=2) == 6
+        assert sorted(c[0][1] for c in fetch.call_args_list) == [0, 2, 4, 6]
+        assert self.store.get('t-6') == 'e-6'
+        assert self.store.get('t-3') is None
@@ -0,0 +1,73 @@
+import logging
+from unittest import TestCase
+
+from flask import Flask, g
+from mock import MagicMock, patch
+
+from connector import utils
+from connector.utils import BackgroundHandler, Body, log_request, log_response
+
+
+class TestBody(TestCase):
+    def test_truncated(self):
+        assert str(Body(b'abcdef', 4)) == 'abcd...<2 bytes truncated>'
+
+    def test_short(self):
+        assert str(Body(b'abc', 4)) == 'abc'
+
+
+class TestBackgroundHandler(TestCase):
+    def record(self):
+        return logging.LogRecord('test', logging.INFO, __file__, 1, 'message', None, None)
+
+    def test_writes_from_thread(self):
+        target = MagicMock()
+        handler = BackgroundHandler(target)
+        record = self.record()
+        handler.emit(record)
+        handler.close()
+        target.handle.assert_called_once_with(record)
+
+    def test_drops_when_full(self):
+        handler = BackgroundHandler(MagicMock(), maxsize=1)
+        # the writer thread is not running, records stay in the queue
+        with patch.object(handler, '_ensure_thread'):
+            handler.emit(self.record())
+            handler.emit(self.record())
+        assert handler.stats() == {'queued': 1, 'dropped': 1}
+
+
+class TestLogRequest(TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        info = patch.object(utils.logger, 'info')
+        self.info = info.start()
+        self.addCleanup(info.stop)
+
+    def request(self):
+        request = MagicMock()
+        request.data = b'{}'
+        return request
+
+    def test_sampling_per_endpoint(self):
+        with self.app.app_context(), \
+                patch.object(utils.config, 'log_sample_rates', {'healthcheck': 0}):
+            g.endpoint = 'healthcheck'
+            g.enterprise_id = 'N/A'
+            log_request(self.request())
+            log_response(MagicMock())
+        assert not self.info.called
+
+    def test_disabled_level(self):
+        with self.app.app_context(), patch.object(utils.logger, 'isEnabledFor', return_value=False):
+            g.endpoint = 'tenant'
+            log_request(self.request())
+        assert not self.info.called
+
+    def test_logged(self):
+        with self.app.app_context():
+            g.endpoint = 'tenant'
+            log_request(self.request())
+        message = self.info.call_args[0][0]
+        assert message['type'] == 'request'
+        assert str(message['data']) == '{}'
@@ -0,0 +1,47 @@
+from collections import namedtuple
+from unittest import TestCase
+
+from mock import patch
+from oauthlib import oauth1
+
+from connector.config import Config
+from connector.validator import get_signer, signers, validator, verify_request
+
+config = Config()
+
+Request = namedtuple('Request', ['url', 'method', 'data', 'headers'])
+
+
+def signed_request(client_key, client_secret, url='http://connector/v1/tenant'):
+    client = oauth1.Client(client_key, client_secret=client_secret)
+    url, headers, _ = client.sign(url, 'GET')
+    return Request(url, 'GET', b'', headers)
+
+
+class TestVerifyRequest(TestCase):
+    def test_valid(self):
+        result = verify_request(signed_request(config.oauth_key, config.oauth_signature))
+        assert result.valid
+        assert result.client_key == config.oauth_key
+
+    def test_wrong_secret(self):
+        result = verify_request(signed_request(config.oauth_key, 'wrong'))
+        assert not result.valid
+        assert result.client_key == config.oauth_key
+
+    def test_unsigned(self):
+        assert verify_request(Request('http://connector/v1/', 'GET', b'', {})) == (False, None)
+
+    def test_validates_once(self):
+        request = signed_request(config.oauth_key, config.oauth_signature)
+        with patch.object(validator.endpoint, 'validate_request',
+                          wraps=validator.endpoint.validate_request) as validate:
+            verify_request(request)
+        assert validate.call_count == 1
+
+
+class TestGetSigner(TestCase):
+    def test_reused_per_client_key(self):
+        signers.clear()
+        assert get_signer('key') is get_signer('key')
+        assert get_signer('key') is not get_signer('other')
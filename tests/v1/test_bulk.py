@@ -0,0 +1,108 @@
+import json
+from unittest import TestCase
+
+from flask import g
+from mock import MagicMock, patch
+from slumber.exceptions import HttpClientError
+
+from connector.app import app
+from connector.v1.resources import OACommunicationException
+from connector.v1.resources.user import TenantUsersBulk
+
+
+def box_error(status_code, text):
+    response = MagicMock()
+    response.status_code = status_code
+    response.text = text
+    return HttpClientError(response=response, content=text)
+
+
+class TestTenantUsersBulk(TestCase):
+    def setUp(self):
+        patches = {
+            'enterprise': patch('connector.v1.resources.user.get_enterprise_id_for_tenant',
+                                return_value='enterprise-1'),
+            'client': patch('connector.v1.resources.user.Client'),
+            'oa': patch('connector.v1.resources.user.OA'),
+            'make_user': patch('connector.v1.resources.user.make_user'),
+            'box_user': patch('connector.v1.resources.user.BoxUser'),
+        }
+        self.mocks = {name: p.start() for name, p in patches.items()}
+        for p in patches.values():
+            self.addCleanup(p.stop)
+        client = self.mocks['client'].return_value
+        client.administered_by = {'login': 'admin@example.com', 'user_id': 'box-admin'}
+
+    def call(self, method, users):
+        with app.test_request_context('/v1/tenant/t-1/users/bulk', method=method,
+                                      data=json.dumps({'users': users}),
+                                      content_type='application/json'):
+            g.reseller = MagicMock()
+            return getattr(TenantUsersBulk(), method.lower())('t-1')
+
+    def test_create(self):
+        self.mocks['oa'].get_resources_by_ids.return_value = {
+            'u-1': {'email': 'admin@example.com'}, 'u-2': {'email': 'user@example.com'},
+            'u-3': {'email': 'broken@example.com'}}
+
+        def make_user(client, oa_user):
+            user = MagicMock(user_id='box-' + oa_user['email'])
+            if oa_user['email'] == 'broken@example.com':
+                user.create.side_effect = box_error(409, '"user_login_already_used"')
+            return user
+
+        self.mocks['make_user'].side_effect = make_user
+        result = self.call('POST', ['u-1', 'u-2', 'u-3'])
+
+        assert result == {'users': [
+            {'id': 'u-1', 'status': 201, 'userId': 'box-admin'},
+            {'id': 'u-2', 'status': 201, 'userId': 'box-user@example.com'},
+            {'id': 'u-3', 'status': 409, 'message': 'user_login_already_used'}]}
+        # the enterprise is resolved and refreshed once for all users
+        self.mocks['enterprise'].assert_called_once_with('t-1')
+        assert self.mocks['client'].return_value.refresh.call_count == 1
+        self.mocks['oa'].get_resources_by_ids.assert_called_once_with(['u-1', 'u-2', 'u-3'],
+                                                                      fetch_missing=False)
+
+    def test_failure_of_one_user(self):
+        self.mocks['oa'].get_resources_by_ids.return_value = {
+            'u-1': {'email': 'user@example.com'}, 'u-2': {'email': 'admin2@example.com'}}
+        self.mocks['oa'].get_resource.side_effect = OACommunicationException(
+            MagicMock(status_code=404, text='not found'))
+        self.mocks['make_user'].side_effect = lambda client, oa_user: (
+            MagicMock(user_id='box-1') if oa_user['email'] == 'user@example.com'
+            else oa_user['addressPostal'])
+
+        result = self.call('POST', ['u-1', 'u-2', 'u-3'])
+
+        assert [(user['id'], user['status']) for user in result['users']] == [
+            ('u-1', 201), ('u-2', 500), ('u-3', 500)]
+        assert 'addressPostal' in result['users'][1]['message']
+        assert 'OACommunicationException' in result['users'][2]['message']
+        self.mocks['oa'].get_resource.assert_called_once_with('u-3')
+
+    def test_duplicate_ids(self):
+        self.mocks['oa'].get_resources_by_ids.return_value = {
+            's-1': {'userId': 'box-1'}, 's-2': {'userId': 'box-2'}}
+        self.mocks['box_user'].side_effect = lambda client, user_id: MagicMock(user_id=user_id)
+
+        result = self.call('DELETE', ['s-1', 's-2', 's-1'])
+
+        assert result == {'users': [{'id': 's-1', 'status': 204}, {'id': 's-2', 'status': 204}]}
+        self.mocks['oa'].get_resources_by_ids.assert_called_once_with(['s-1', 's-2'],
+                                                                      fetch_missing=False)
+
+    def test_delete(self):
+        self.mocks['oa'].get_resources_by_ids.return_value = {
+            's-1': {'userId': 'box-admin'}, 's-2': {'userId': 'box-2'}}
+        self.mocks['box_user'].side_effect = lambda client, user_id: MagicMock(user_id=user_id)
+
+        result = self.call('DELETE', ['s-1', 's-2'])
+
+        assert result == {'users': [{'id': 's-1', 'status': 204}, {'id': 's-2', 'status': 204}]}
+
+    def test_second_subscription(self):
+        self.mocks['enterprise'].return_value = 'SECOND'
+        result = self.call('POST', ['u-1'])
+        assert result == {'users': [{'id': 'u-1', 'status': 201, 'userId': 'SECOND'}]}
+        self.mocks['oa'].get_resources_by_ids.assert_not_called()
@@ -0,0 +1,56 @@
+import threading
+import time
+from unittest import TestCase
+
+from flask import g, request
+
+from connector.app import app
+from connector.v1.resources import map_concurrently, run_concurrently
+
+
+class TestRunConcurrently(TestCase):
+    def test_results_in_order(self):
+        with app.test_request_context('/v1/tenant'):
+            assert run_concurrently(lambda: 1, lambda: 2, lambda: 3) == [1, 2, 3]
+
+    def test_request_context_is_propagated(self):
+        headers = {'aps-transaction-id': 'tx-1', 'aps-controller-uri': 'https://aps.com'}
+        with app.test_request_context('/v1/tenant', headers=headers):
+            g.auth = 'fake_auth'
+
+            def lookup():
+                return (threading.current_thread().name, g.auth,
+                        request.headers.get('aps-transaction-id'))
+
+            results = run_concurrently(lookup, lookup)
+        assert all(r[1:] == ('fake_auth', 'tx-1') for r in results)
+        assert all(r[0] != threading.current_thread().name for r in results)
+
+    def test_calls_overlap(self):
+        def slow():
+            time.sleep(0.1)
+
+        with app.test_request_context('/v1/tenant'):
+            started = time.time()
+            run_concurrently(slow, slow, slow, slow)
+        assert time.time() - started < 0.3
+
+    def test_exceptions_are_raised(self):
+        def broken():
+            raise KeyError('tenantId')
+
+        with app.test_request_context('/v1/tenant'):
+            self.assertRaises(KeyError, run_concurrently, lambda: 1, broken)
+
+
+class TestMapConcurrently(TestCase):
+    def test_calls_overlap(self):
+        def slow(item):
+            time.sleep(0.1)
+            return item, request.path
+
+        with app.test_request_context('/v1/tenant'):
+            started = time.time()
+            results = map_concurrently(slow, [1, 2, 3, 4])
+        assert results == [(i, '/v1/tenant') for i in [1, 2, 3, 4]]
+        assert time.time() - started < 0.3
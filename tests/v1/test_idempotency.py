@@ -0,0 +1,70 @@
+import json
+from unittest import TestCase
+
+from flask import g
+from mock import MagicMock, patch
+
+from connector import idempotency
+from connector.app import app
+from connector.cache import LRUCache
+from connector.v1.resources import ConnectorResource
+
+
+class Counter(ConnectorResource):
+    def __init__(self, result):
+        self.post = MagicMock(return_value=result)
+        self.get = self.post
+
+
+@patch('connector.idempotency.responses', new_callable=LRUCache)
+class TestIdempotency(TestCase):
+    def dispatch(self, resource, method='POST', body=None, transaction='tx-1'):
+        headers = {'aps-transaction-id': transaction} if transaction else {}
+        with app.test_request_context('/v1/tenant', method=method, headers=headers,
+                                      data=json.dumps(body or {'aps': {'id': 't-1'}}),
+                                      content_type='application/json'):
+            g.enterprise_id = 'N/A'
+            result = resource.dispatch_request()
+            return result, g.enterprise_id
+
+    def test_repeat_returns_stored_response(self, _):
+        resource = Counter(({'tenantId': 'e-1'}, 201))
+        assert self.dispatch(resource)[0] == ({'tenantId': 'e-1'}, 201)
+        assert self.dispatch(resource)[0] == ({'tenantId': 'e-1'}, 201, {})
+        assert resource.post.call_count == 1
+
+    def test_other_request_of_transaction(self, _):
+        resource = Counter(({'tenantId': 'e-1'}, 201))
+        self.dispatch(resource)
+        self.dispatch(resource, body={'aps': {'id': 't-2'}})
+        self.dispatch(resource, transaction='tx-2')
+        assert resource.post.call_count == 3
+
+    def test_not_stored(self, _):
+        for result in [({'message': 'conflict'}, 409), ({'jobId': '1'}, 202)]:
+            resource = Counter(result)
+            self.dispatch(resource)
+            self.dispatch(resource)
+            assert resource.post.call_count == 2
+        resource = Counter(({}, 200))
+        self.dispatch(resource, transaction=None)
+        self.dispatch(resource, transaction=None)
+        self.dispatch(resource, method='GET')
+        self.dispatch(resource, method='GET')
+        assert resource.post.call_count == 4
+
+    def test_enterprise_id_is_restored(self, _):
+        resource = Counter(({}, 204))
+
+        def delete():
+            g.enterprise_id = 'e-1'
+            return None, 204
+        resource.post.side_effect = delete
+        self.dispatch(resource)
+        assert self.dispatch(resource) == ((None, 204, {}), 'e-1')
+
+    def test_request_key(self, _):
+        assert idempotency.request_key('GET', '/v1/tenant', 'tx', b'') is None
+        assert idempotency.request_key('POST', '/v1/tenant', None, b'') is None
+        assert (idempotency.request_key('POST', '/v1/tenant', 'tx', b'{}') !=
+                idempotency.request_key('PUT', '/v1/tenant', 'tx', b'{}'))
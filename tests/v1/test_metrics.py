@@ -0,0 +1,36 @@
+from unittest import TestCase
+
+from mock import patch
+
+from connector.app import app
+from connector.metrics import config, registry
+
+
+class TestMetrics(TestCase):
+    def test_requires_authorization(self):
+        client = app.test_client()
+        assert client.get('/v1/metrics').status_code == 401
+        with patch.object(config, 'metrics_token', 'secret'):
+            response = client.get('/v1/metrics', headers={'Authorization': 'Bearer other'})
+        assert response.status_code == 401
+
+    def test_stats_do_not_accept_the_metrics_token(self):
+        with patch.object(config, 'metrics_token', 'secret'):
+            response = app.test_client().get('/v1/stats',
+                                             headers={'Authorization': 'Bearer secret'})
+        assert response.status_code == 401
+
+    @patch.object(registry, 'directory', None)
+    @patch.object(config, 'metrics_token', 'secret')
+    def test_metrics_token(self):
+        client = app.test_client()
+        client.get('/v1/tenant/t-1')
+        response = client.get('/v1/metrics', headers={'Authorization': 'Bearer secret'})
+        assert response.status_code == 200
+        assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+        lines = response.get_data(as_text=True).splitlines()
+        assert '# TYPE connector_request_duration_seconds histogram' in lines
+        assert any(line.startswith('connector_request_duration_seconds_count{'
+                                   'route="/v1/tenant/<tenant_id>",method="GET",status="401"}')
+                   for line in lines)
+        assert any(line.startswith('connector_cache_requests_total{') for line in lines)
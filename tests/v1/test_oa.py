@@ -0,0 +1,92 @@
+from unittest import TestCase
+
+from mock import patch
+
+from connector.app import app
+from connector.v1.resources import OA, discard_request_memo
+
+
+class TestGetResourcesByIds(TestCase):
+    def setUp(self):
+        self.context = app.test_request_context('/v1/tenant')
+        self.context.push()
+
+    def tearDown(self):
+        self.context.pop()
+
+    def test_single_query(self):
+        with patch.object(OA, 'send_request') as send_request:
+            send_request.return_value = [{'aps': {'id': 'b'}, 'name': 'B'},
+                                         {'aps': {'id': 'a'}, 'name': 'A'}]
+            resources = OA.get_resources_by_ids(['a', 'b', 'a'])
+        assert resources == {'a': {'aps': {'id': 'a'}, 'name': 'A'},
+                             'b': {'aps': {'id': 'b'}, 'name': 'B'}}
+        send_request.assert_called_once_with('get', 'aps/2/resources?in(aps.id,(a,b))',
+                                             transaction=True, retry_num=10)
+
+    def test_fallback_for_missing_ids(self):
+        with patch.object(OA, 'send_request') as send_request:
+            send_request.side_effect = [[{'aps': {'id': '1'}}], {'aps': {'id': '2'}, 'late': True}]
+            resources = OA.get_resources_by_ids([1, 2])
+        assert resources[2]['late']
+        assert send_request.call_args[0] == ('get', 'aps/2/resources/2')
+
+    def test_missing_ids_left_out(self):
+        with patch.object(OA, 'send_request') as send_request:
+            send_request.return_value = [{'aps': {'id': '1'}}]
+            resources = OA.get_resources_by_ids(['1', '2'], fetch_missing=False)
+        assert list(resources) == ['1']
+        assert send_request.call_count == 1
+
+    def test_batches(self):
+        ids = [str(i) for i in range(250)]
+        with patch.object(OA, 'send_request') as send_request:
+            send_request.side_effect = lambda method, path, **kwargs: [
+                {'aps': {'id': i}} for i in path[len('aps/2/resources?in(aps.id,('):-2].split(',')]
+            resources = OA.get_resources_by_ids(ids)
+        assert list(resources) == ids
+        assert send_request.call_count == 3
+
+    def test_no_ids(self):
+        with patch.object(OA, 'send_request') as send_request:
+            assert OA.get_resources_by_ids([]) == {}
+        send_request.assert_not_called()
+
+
+class TestRequestMemo(TestCase):
+    def setUp(self):
+        self.headers = {'aps-transaction-id': 'tx-1', 'aps-controller-uri': 'https://aps.com'}
+
+    def test_duplicate_fetch_is_saved(self):
+        with app.test_request_context('/v1/user', headers=self.headers), \
+                patch.object(OA, 'send_request') as send_request:
+            send_request.return_value = {'aps': {'id': 'a'}}
+            OA.get_resource('a')
+            OA.get_resource('a')
+            assert send_request.call_count == 1
+            assert discard_request_memo('user') == 1
+
+    def test_batch_populates_memo(self):
+        with app.test_request_context('/v1/tenant', headers=self.headers), \
+                patch.object(OA, 'send_request') as send_request:
+            send_request.return_value = [{'aps': {'id': 'a'}}, {'aps': {'id': 'b'}}]
+            OA.get_resources_by_ids(['a', 'b'])
+            assert OA.get_resource('b') == {'aps': {'id': 'b'}}
+            OA.get_resources_by_ids(['a'])
+            assert send_request.call_count == 1
+
+    def test_transaction_aware_keys(self):
+        with app.test_request_context('/v1/user', headers=self.headers), \
+                patch.object(OA, 'send_request') as send_request:
+            send_request.return_value = {'aps': {'id': 'a'}}
+            OA.get_resource('a')
+            OA.get_resource('a', transaction=False)
+            assert send_request.call_count == 2
+
+    def test_memo_is_per_request(self):
+        with patch.object(OA, 'send_request') as send_request:
+            send_request.return_value = {'aps': {'id': 'a'}}
+            for _ in range(2):
+                with app.test_request_context('/v1/user', headers=self.headers):
+                    OA.get_resource('a')
+            assert send_request.call_count == 2
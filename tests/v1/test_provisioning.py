@@ -0,0 +1,117 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from flask import g
+from mock import MagicMock, patch
+
+from connector.app import app
+from connector.jobs import JobQueue
+from connector.tenants import TenantStore
+from connector.validator import OAuthResult
+from connector.v1 import provision_tenant_job
+from connector.v1.resources import OACommunicationException
+from connector.v1.resources.tenant import TenantList, parse_tenant_args, provision_tenant
+
+
+class TestAsyncProvisioning(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.jobs = JobQueue(os.path.join(directory, 'jobs.sqlite'), workers=0)
+        self.jobs.handler('tenant')(provision_tenant_job)
+        patches = [patch('connector.v1.resources.tenant.jobs', self.jobs),
+                   patch('connector.v1.resources.tenant.config.async_provisioning', True)]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.body = {'aps': {'id': 'tenant-1'}, 'oaSubscription': {'aps': {'id': 'sub-1'}},
+                     'oaAccount': {'aps': {'id': 'acc-1'}}}
+
+    def post(self):
+        with app.test_request_context('/v1/tenant', method='POST', data=json.dumps(self.body),
+                                      content_type='application/json',
+                                      headers={'Aps-Controller-Uri': 'https://oa',
+                                               'Aps-Instance-Id': 'instance',
+                                               'Aps-Transaction-Id': 'transaction'}):
+            g.oauth = OAuthResult(True, 'key')
+            return TenantList().post()
+
+    @patch('connector.v1.Reseller')
+    @patch('connector.v1.provision_tenant', return_value='enterprise-1')
+    def test_accepted_then_created(self, provision_tenant, _):
+        body, status, headers = self.post()
+        assert status == 202
+        assert headers['Aps-Retry-Timeout']
+        assert headers['Location'] == '/v1/jobs/{}'.format(body['jobId'])
+        provision_tenant.assert_not_called()
+
+        assert self.post()[1] == 202
+        assert self.jobs.run_one()
+        args = provision_tenant.call_args[0][0]
+        assert args.aps_id == 'tenant-1'
+
+        assert self.post() == ({'tenantId': 'enterprise-1'}, 201)
+        assert provision_tenant.call_count == 1
+
+    @patch('connector.v1.Reseller')
+    @patch('connector.v1.provision_tenant', side_effect=KeyError('No admins'))
+    def test_failed(self, provision_tenant, _):
+        self.post()
+        self.jobs.run_one()
+        body, status = self.post()
+        assert status == 500
+        assert 'No admins' in body['message']
+        assert self.post()[1] == 202
+
+
+class TestProvisionTenant(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.store = TenantStore(os.path.join(directory, 'tenants.sqlite'))
+        patches = {'store': patch('connector.v1.resources.tenant.tenant_store', self.store),
+                   'cache': patch('connector.v1.resources.tenant.get_enterprise_id_for_tenant'),
+                   'oa': patch('connector.v1.resources.tenant.OA'),
+                   'client': patch('connector.v1.resources.tenant.Client'),
+                   'make_user': patch('connector.v1.resources.tenant.make_user')}
+        self.mocks = {name: p.start() for name, p in patches.items()}
+        for p in patches.values():
+            self.addCleanup(p.stop)
+        self.mocks['oa'].get_resources_by_ids.return_value = {
+            'acc-1': {'companyName': 'Company'}, 'sub-1': {'subscriptionId': 1}}
+        client = self.mocks['client'].return_value
+        client.enterprise_id = 'enterprise-1'
+        client.administered_by = {'user_id': 'box-admin'}
+        self.links = []
+
+    def send_request(self, method, path, body=None, **kwargs):
+        if method == 'POST':
+            self.links.append(body['userId'])
+            if len(self.links) == 1:
+                raise OACommunicationException(MagicMock(status_code=500, text='timeout'))
+            return {}
+        if 'admin-user' in path:
+            return [{'aps': {'id': 'admin-1'}}]
+        return {'user': {'type': 'http://box/user'}}
+
+    def provision(self):
+        body = {'aps': {'id': 'tenant-1'}, 'oaSubscription': {'aps': {'id': 'sub-1'}},
+                'oaAccount': {'aps': {'id': 'acc-1'}}}
+        with app.test_request_context('/v1/tenant', method='POST', data=json.dumps(body),
+                                      content_type='application/json'):
+            g.reseller = MagicMock()
+            return provision_tenant(parse_tenant_args())
+
+    def test_retry_after_failed_link_reuses_enterprise(self):
+        self.mocks['oa'].send_request.side_effect = self.send_request
+        self.assertRaises(OACommunicationException, self.provision)
+        assert self.store.get('tenant-1') == 'enterprise-1'
+
+        assert self.provision() == 'enterprise-1'
+        client = self.mocks['client'].return_value
+        assert client.create.call_count == 1
+        client.refresh.assert_called_once_with('administered_by')
+        assert self.links == ['box-admin', 'box-admin']
@@ -0,0 +1,21 @@
+import json
+from unittest import TestCase
+
+from mock import patch
+
+from connector.app import app
+from connector.validator import OAuthResult
+
+
+class TestStats(TestCase):
+    def test_unsigned_request(self):
+        response = app.test_client().get('/v1/stats')
+        assert response.status_code == 401
+
+    @patch('connector.v1.Reseller')
+    @patch('connector.v1.verify_request', return_value=OAuthResult(True, 'key'))
+    def test_signed_request(self, _, reseller):
+        response = app.test_client().get('/v1/stats')
+        assert response.status_code == 200
+        assert 'pools' in json.loads(response.get_data(as_text=True))
+        reseller.assert_not_called()
@@ -0,0 +1,35 @@
+import json
+from unittest import TestCase
+
+from flask import g
+from mock import MagicMock, patch
+
+from connector.app import app
+from connector.v1.resources.tenant import TenantUserCreated
+
+
+class TestTenantUsers(TestCase):
+    def call(self):
+        with app.test_request_context('/v1/tenant/t-1/users'):
+            g.reseller = MagicMock()
+            response = TenantUserCreated().get('t-1')
+            return response, [json.loads(line) for line in response.response]
+
+    @patch('connector.v1.resources.tenant.get_enterprise_id_for_tenant', return_value='e-1')
+    @patch('connector.v1.resources.tenant.Client')
+    def test_stream(self, client, _):
+        users = [MagicMock(user_id='1', login='a@example.com', status='active', admin=True),
+                 MagicMock(user_id='2', login='b@example.com', status='active', admin=False)]
+        for user in users:
+            user.name = 'User'
+        client.return_value.users.return_value = iter(users)
+        response, users = self.call()
+        assert response.mimetype == 'application/x-ndjson'
+        assert response.is_streamed
+        assert [user['userId'] for user in users] == ['1', '2']
+        assert users[0]['admin'] is True
+
+    @patch('connector.v1.resources.tenant.get_enterprise_id_for_tenant', return_value='SECOND')
+    def test_second_subscription(self, _):
+        _, users = self.call()
+        assert users == []
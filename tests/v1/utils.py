@@ -1,19 +1,18 @@
 from mock import patch
 
 from connector.config import Config
+from connector.validator import OAuthResult
 
 config = Config()
 
 
 def bypass_auth(fn):
     def test_wrapper(*args, **kwargs):
-        with patch('connector.v1.check_oauth_signature') as signature_mock, \
-                patch('connector.v1.get_client_key') as key_mock, \
+        with patch('connector.v1.verify_request') as verify_mock, \
                 patch('connector.v1.Reseller') as reseller_mock, \
                 patch('connector.v1.get_reseller_name') as reseller_name_mock:
-            signature_mock.return_value = True
+            verify_mock.return_value = OAuthResult(True, config.oauth_key)
             reseller_name_mock.return_value = 'strategize-back-end-technologies'
-            key_mock.return_value = config.oauth_key
             instance = reseller_mock.return_value
             instance.reseller_name = '123-123-123'
             fn(*args, **kwargs)